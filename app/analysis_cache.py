@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import numpy as np
+from dsp import fft_engine
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output', 'cache')
+
+# Total size of cached results on disk before the least recently used are evicted.
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+class AnalysisCache:
+    """
+    Persistent, content-addressed store for analysis results.
+
+    Each entry is an uncompressed .npz file named after a hash of the audio
+    content hash, the analysis name and its parameters, so results survive
+    reruns, sessions and reopening a file from history. Derived files (such
+    as encoded audio for download) are stored under the same kind of key. Hits refresh the
+    file's modification time; when the directory grows past max_bytes the
+    least recently used entries are deleted.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, content_hash, name, params):
+        """
+        Returns the cache key for an analysis of some content.
+
+        Args:
+            content_hash (str): Hash of the audio content.
+            name (str): Analysis name (e.g. 'fft', 'spectrogram').
+            params (dict): Parameters that affect the result.
+        """
+        entry = {'content': content_hash, 'name': name, 'params': params}
+        if fft_engine.get_settings()['single_precision']:
+            # Results differ (and are stored smaller) in float32 mode.
+            entry['precision'] = 'float32'
+        blob = json.dumps(entry, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, content_hash, name, params):
+        """
+        Looks up a cached result.
+
+        Returns:
+            tuple or None: The stored arrays (None entries preserved), or None on a miss.
+        """
+        path = self._path(self.key(content_hash, name, params))
+        try:
+            with np.load(path) as npz:
+                none_idx = set(npz['__none__'].tolist())
+                n = int(npz['__len__'])
+                result = tuple(None if i in none_idx else npz[f'arr_{i}'] for i in range(n))
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return result
+
+    def put(self, content_hash, name, params, arrays):
+        """
+        Stores a result and evicts old entries if the cache is over its size cap.
+
+        Args:
+            arrays (tuple): Arrays to store; None entries are allowed.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(self.key(content_hash, name, params))
+        none_idx = [i for i, a in enumerate(arrays) if a is None]
+        payload = {f'arr_{i}': np.asarray(a) for i, a in enumerate(arrays) if a is not None}
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, __none__=np.array(none_idx, dtype=int), __len__=len(arrays), **payload)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def get_or_compute(self, content_hash, name, params, compute):
+        """
+        Returns the cached result, computing and storing it on a miss.
+
+        Args:
+            compute (callable): Zero-argument function returning a tuple of arrays.
+        """
+        result = self.get(content_hash, name, params)
+        if result is None:
+            result = tuple(compute())
+            self.put(content_hash, name, params, result)
+        return result
+
+    def get_or_write_file(self, content_hash, name, params, extension, write):
+        """
+        Returns the path of a cached file, writing it on a miss.
+
+        Args:
+            extension (str): File extension, e.g. 'flac'.
+            write (callable): Function writing the file to the path it is given.
+
+        Returns:
+            str: Path of the cached file.
+        """
+        path = os.path.join(self.directory, f"{self.key(content_hash, name, params)}.{extension}")
+        if os.path.exists(path):
+            os.utime(path)
+            self.hits += 1
+            return path
+        self.misses += 1
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def size(self):
+        """
+        Returns the total size in bytes of the cached entries.
+        """
+        return sum(os.path.getsize(p) for p, _ in self._entries())
+
+    def clear(self):
+        """
+        Deletes every cached entry.
+        """
+        for path, _ in self._entries():
+            os.remove(path)
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.tmp'):
+                path = os.path.join(self.directory, name)
+                entries.append((path, os.stat(path)))
+        return entries
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        for path, st in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= st.st_size
+
+_default_cache = None
+
+def get_cache():
+    """
+    Returns the shared cache in output/cache.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
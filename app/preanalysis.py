@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+import numpy as np
+from app.analysis_cache import AnalysisCache
+from app.recent_files import get_recent_store
+from dsp.analysis import SpectralAnalysis
+from dsp.fft_processor import compute_fft
+from dsp.spectral_stats import StreamingSpectralStats
+from dsp.spectrogram import compute_spectrogram_db
+from dsp.waveform import WaveformPyramid
+
+# Files longer than this get an averaged (Welch) spectrum in the analysis views,
+# with bins no wider than LONG_SIGNAL_RESOLUTION_HZ.
+LONG_SIGNAL_SECONDS = 600
+LONG_SIGNAL_RESOLUTION_HZ = 3.0
+SPECTROGRAM_NPERSEG = 256
+
+def channel_signal(source, channel=None):
+    """
+    Returns a source's samples for one channel, or the mono mix for None.
+    """
+    if channel is None:
+        return source.samples()
+    return source.samples(mono=False)[:, channel]
+
+def channels_of(source):
+    """
+    Channel keys the views offer: None (mix) plus every channel of a multichannel file.
+    """
+    return [None] + (list(range(source.channels)) if source.channels > 1 else [])
+
+def spectrum_request(source):
+    """
+    Cache name, parameters and compute function of a file's Hann spectrum.
+
+    The mono mix and every channel come from one vectorized compute_fft
+    call; files longer than LONG_SIGNAL_SECONDS are streamed from disk
+    through StreamingSpectralStats, so the cutoff, f_max and SNR the tabs
+    read come from its one-pass averaged spectrum.
+
+    Returns:
+        str: Analysis name.
+        dict: Parameters.
+        callable: Returns (freqs, magnitude) with magnitude shape (bins,) or
+        (bins, 1 + channels), the mix in column 0.
+    """
+    multichannel = source.channels > 1
+
+    def with_mix(block):
+        # Mix in column 0, then one column per channel.
+        return np.column_stack((block.mean(axis=1), block)) if multichannel else block[:, 0]
+
+    if source.duration > LONG_SIGNAL_SECONDS:
+        stats = StreamingSpectralStats(source.samplerate, LONG_SIGNAL_RESOLUTION_HZ, 'Hann')
+        params = {'window_type': 'Hann', 'scale': 'Linear', 'method': 'welch', 'nperseg': stats.nperseg}
+
+        def compute():
+            for block in source.blocks(mono=False):
+                stats.update(with_mix(block))
+            return stats.spectrum()
+    else:
+        # Zero-padded to a fast size; the FFT tab notes it for awkward lengths.
+        params = {'window_type': 'Hann', 'scale': 'Linear', 'fast_len': True}
+        compute = lambda: compute_fft(with_mix(source.samples(mono=False)), source.samplerate,
+                                      window_type='Hann', scale='Linear', fast_len=True)[:2]
+    if multichannel:
+        params['channels'] = 'mix+all'
+    return 'fft', params, compute
+
+def spectral_analyses(source, freqs, magnitude, method):
+    """
+    Wraps a spectrum_request result into a SpectralAnalysis per channel key.
+    """
+    n = source.frames
+    if source.channels > 1:
+        analyses = {None: SpectralAnalysis(freqs, magnitude[:, 0], method, n)}
+        for c in range(source.channels):
+            analyses[c] = SpectralAnalysis(freqs, magnitude[:, c + 1], method, n)
+    else:
+        analyses = {None: SpectralAnalysis(freqs, magnitude, method, n)}
+        analyses[0] = analyses[None]
+    return analyses
+
+def spectrogram_request(source, channel=None, nperseg=SPECTROGRAM_NPERSEG):
+    """
+    Cache name, parameters and compute function of one channel's dB spectrogram.
+    """
+    params = {'nperseg': nperseg, 'channel': channel}
+    compute = lambda: compute_spectrogram_db(channel_signal(source, channel), source.samplerate, nperseg=nperseg)
+    return 'spectrogram_db', params, compute
+
+def waveform_request(source, channel=None):
+    """
+    Cache name, parameters and compute function of one channel's waveform pyramid.
+    """
+    params = {'channel': channel, 'base_block': 64, 'factor': 4}
+    compute = lambda: WaveformPyramid(channel_signal(source, channel), base_block=64, factor=4).to_arrays()
+    return 'waveform_pyramid', params, compute
+
+def sidecar_dir(content_hash):
+    """
+    Directory of pre-computed results next to a recent-files entry.
+    """
+    return get_recent_store().sidecar_dir(content_hash)
+
+def sidecar_cache(content_hash):
+    """
+    Returns the sidecar of a file as an AnalysisCache, or None if there is none.
+    """
+    directory = sidecar_dir(content_hash)
+    if not os.path.isdir(directory):
+        return None
+    return AnalysisCache(directory, max_bytes=float('inf'))
+
+def read_status(content_hash):
+    """
+    Returns the sidecar's status.json (state, progress, stage, summary), or None.
+    """
+    try:
+        with open(os.path.join(sidecar_dir(content_hash), 'status.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def summarize_spectrum(analyses):
+    """
+    Scalar statistics shown without opening the analysis tabs.
+    """
+    summary = {}
+    for channel, analysis in analyses.items():
+        summary['mix' if channel is None else str(channel)] = {
+            'energy_cutoff_95': float(analysis.energy_cutoff(0.95)),
+            'f_max': float(analysis.f_max()),
+            'nyquist_rate': float(analysis.nyquist_rate()),
+            'snr_db': float(analysis.snr()),
+        }
+    return summary
+
+def _key(name, params):
+    return name, json.dumps(params, sort_keys=True, default=str)
+
+class PreanalysisJob:
+    """
+    Background thread that fills a file's sidecar with the common analyses.
+
+    Steps run in the order the tabs usually need them (waveform envelope,
+    spectrum and its statistics, spectrograms). Progress and the finished
+    steps are readable from any thread; status.json in the sidecar records
+    the outcome so a completed file is never analysed twice.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.content_hash = source.content_hash()
+        self.directory = sidecar_dir(self.content_hash)
+        self.cache = AnalysisCache(self.directory, max_bytes=float('inf'))
+        self.requests = ([waveform_request(source, c) for c in channels_of(source)]
+                         + [spectrum_request(source)]
+                         + [spectrogram_request(source, c) for c in channels_of(source)])
+        self.planned = {_key(name, params) for name, params, _ in self.requests}
+        self.done = set()
+        self.progress = 0.0
+        self.stage = 'queued'
+        self.state = 'running'
+        self.error = None
+        self.summary = None
+        self._thread = threading.Thread(target=self._run, name=f'preanalysis-{self.content_hash[:8]}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def finished(self):
+        return self.state != 'running'
+
+    def is_pending(self, name, params):
+        """
+        Whether this job will produce (name, params) but has not yet.
+        """
+        key = _key(name, params)
+        return not self.finished and key in self.planned and key not in self.done
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _write_status(self):
+        os.makedirs(self.directory, exist_ok=True)
+        status = {'state': self.state, 'progress': self.progress, 'stage': self.stage,
+                  'summary': self.summary, 'error': self.error}
+        tmp_path = os.path.join(self.directory, 'status.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, os.path.join(self.directory, 'status.json'))
+
+    def _run(self):
+        try:
+            self._write_status()
+            for i, (name, params, compute) in enumerate(self.requests):
+                channel = params.get('channel')
+                self.stage = name.replace('_', ' ') + ('' if channel is None else f' (channel {channel + 1})')
+                result = self.cache.get_or_compute(self.content_hash, name, params, compute)
+                if name == 'fft':
+                    analyses = spectral_analyses(self.source, *result, params.get('method', 'fft'))
+                    self.summary = summarize_spectrum(analyses)
+                self.done.add(_key(name, params))
+                self.progress = (i + 1) / len(self.requests)
+                self._write_status()
+            self.stage = 'done'
+            self.state = 'done'
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self.state = 'error'
+        self._write_status()
+        # The outcome is in status.json now; drop the job and its reference to the samples.
+        self.requests = []
+        self.source = None
+        with _jobs_lock:
+            if _jobs.get(self.content_hash) is self:
+                del _jobs[self.content_hash]
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def start_preanalysis(source):
+    """
+    Starts pre-analysis of a file from the recent-files store, unless its
+    sidecar is already complete or a job for the same content is running.
+
+    Returns:
+        PreanalysisJob or None: The running (or finished) job, or None if the
+        sidecar was already complete.
+    """
+    content_hash = source.content_hash()
+    with _jobs_lock:
+        job = _jobs.get(content_hash)
+        if job is not None and job.state != 'error':
+            return job
+        status = read_status(content_hash)
+        if status is not None and status.get('state') == 'done':
+            return None
+        job = _jobs[content_hash] = PreanalysisJob(source).start()
+    return job
+
+def get_job(content_hash):
+    """
+    Returns the running job for this content in this process, if any.
+    """
+    return _jobs.get(content_hash)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import soundfile as sf
+
+RECENT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output', 'recent')
+
+# Limits on what is kept; the most recent file is kept even if it alone is larger.
+DEFAULT_MAX_FILES = 5
+DEFAULT_MAX_BYTES = 1024 * 2**20
+
+def content_hash(data):
+    """
+    Hex digest of a bytes-like object, identical to AudioSource.content_hash of the same bytes.
+    """
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+class RecentFiles:
+    """
+    Content-addressed store of recently opened audio files.
+
+    Files are stored as <content hash><extension>, so uploading the same bytes
+    again (under any name) writes nothing, and two different files with the
+    same name never overwrite each other. index.json lists the entries newest
+    first together with their name and audio metadata, so listing them never
+    opens the audio. Entries beyond max_files or max_bytes are evicted and
+    their files (and sidecar directories of derived results) deleted.
+    """
+
+    def __init__(self, directory=RECENT_DIR, max_files=DEFAULT_MAX_FILES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, 'index.json')
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _write_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def entries(self):
+        """
+        Returns the stored entries, newest first.
+
+        Each entry is a dict with hash, name, path, size, frames, samplerate,
+        channels, duration and added (a timestamp).
+        """
+        return [e for e in self._read_index() if os.path.exists(e['path'])]
+
+    def get(self, content_hash):
+        """
+        Returns the entry for a content hash, or None.
+        """
+        for entry in self.entries():
+            if entry['hash'] == content_hash:
+                return entry
+        return None
+
+    def add(self, name, data):
+        """
+        Stores file contents (if new) and makes them the most recent entry.
+
+        Args:
+            name (str): Original file name, shown in the sidebar.
+            data (bytes-like): File contents, e.g. an UploadedFile's getbuffer().
+
+        Returns:
+            dict: The entry.
+        """
+        digest = content_hash(data)
+        index = self._read_index()
+        if index and index[0]['hash'] == digest and index[0]['name'] == name and os.path.exists(index[0]['path']):
+            return index[0]
+
+        extension = os.path.splitext(name)[1].lower() or '.wav'
+        path = os.path.join(self.directory, digest + extension)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        previous = next((e for e in index if e['hash'] == digest), None)
+        if previous is not None:
+            entry = dict(previous, name=name, added=time.time())
+        else:
+            info = sf.info(path)
+            entry = {
+                'hash': digest,
+                'name': name,
+                'path': path,
+                'size': os.path.getsize(path),
+                'frames': info.frames,
+                'samplerate': info.samplerate,
+                'channels': info.channels,
+                'duration': info.frames / info.samplerate,
+                'added': time.time(),
+            }
+        index = [entry] + [e for e in index if e['hash'] != digest]
+        self._write_index(self._evict(index))
+        return entry
+
+    def touch(self, content_hash):
+        """
+        Moves an existing entry to the front (e.g. when it is reopened).
+        """
+        index = self._read_index()
+        if not index or index[0]['hash'] == content_hash:
+            return
+        entry = next((e for e in index if e['hash'] == content_hash), None)
+        if entry is not None:
+            self._write_index([entry] + [e for e in index if e is not entry])
+
+    def sidecar_dir(self, content_hash):
+        """
+        Directory for results derived from a stored file; deleted with the file.
+        """
+        return os.path.join(self.directory, content_hash + '.analysis')
+
+    def size(self):
+        """
+        Total size in bytes of the stored files.
+        """
+        return sum(e['size'] for e in self.entries())
+
+    def _evict(self, index):
+        keep, total = [], 0
+        for entry in index:
+            if not os.path.exists(entry['path']):
+                continue
+            if keep and (len(keep) >= self.max_files or total + entry['size'] > self.max_bytes):
+                os.remove(entry['path'])
+                shutil.rmtree(self.sidecar_dir(entry['hash']), ignore_errors=True)
+                continue
+            keep.append(entry)
+            total += entry['size']
+        return keep
+
+_default_store = None
+
+def get_recent_store():
+    """
+    Returns the shared store in output/recent.
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = RecentFiles()
+    return _default_store
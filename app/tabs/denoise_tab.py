@@ -1,20 +1,22 @@
 import streamlit as st
-import numpy as np
 import plotly.graph_objects as go
-from scipy.signal import spectrogram
+from dsp import profiler
 from dsp.filter_processor import apply_lowpass, apply_spectral_subtraction, apply_wiener_filter
+from dsp.fir import apply_fir_lowpass
 from dsp.fft_processor import compute_fft
-from app.utils import render_header, get_audio_download_link
+from app.utils import render_header, get_download_file, render_download_button, DOWNLOAD_FORMATS, cached_analysis, get_spectral_analysis, get_spectrogram_pyramid, get_processed_audio, get_signal, get_channel
 
 def render():
     render_header("Noise Cancellation", "")
     
-    if 'audio_data' not in st.session_state:
+    if 'audio_source' not in st.session_state:
         st.warning("Please upload an audio file in the Home tab first.")
         return
 
-    data = st.session_state['audio_data']
-    fs = st.session_state['fs']
+    source = st.session_state['audio_source']
+    channel = get_channel()
+    data = get_signal(channel)
+    fs = source.samplerate
     
     st.markdown("### 📘 Filter Analysis")
     st.markdown("""
@@ -24,6 +26,8 @@ def render():
     st.latex(r"|H(j\omega)| = \frac{1}{\sqrt{1 + (\frac{\omega}{\omega_c})^{2n}}}")
     
     st.markdown("""
+    The **FIR** option uses a long linear-phase filter instead (Kaiser window, 80 dB stop-band, transition band of 10% of the cutoff): a much steeper roll-off without phase distortion, computed by FFT convolution.
+    
     In audio processing, they are commonly used for **denoising** by removing high-frequency hiss or static noise while preserving the core audio content (voice, music) which typically resides in lower frequencies.
     
     The recommended cutoff frequency $f_{c}$ is determined such that 95% of the total spectral energy is contained below it:
@@ -39,12 +43,8 @@ def render():
     
     method = "Low-pass Filter"
     
-    from dsp.fft_processor import compute_fft
-    f_spec, mag_spec, _ = compute_fft(data, fs, window_type='Hann', scale='Linear')
-    total_energy = np.sum(mag_spec**2)
-    cumulative_energy = np.cumsum(mag_spec**2)
-    idx_95 = np.searchsorted(cumulative_energy, 0.95 * total_energy)
-    effective_cutoff = f_spec[idx_95]
+    analysis = get_spectral_analysis()
+    effective_cutoff = analysis.energy_cutoff(0.95)
     
     st.info(f"💡 Recommended Cutoff Frequency (95% Energy): **{effective_cutoff:.0f} Hz**")
     
@@ -55,26 +55,72 @@ def render():
         value=int(effective_cutoff) if 100 < effective_cutoff < (fs/2)-100 else 3000,
         step=100
     )
-    processed_data = apply_lowpass(data, fs, cutoff)
+    design = st.radio("Filter Design", ["IIR (Butterworth)", "FIR (linear phase)"], horizontal=True)
+    order = 5
+    # All channels are filtered in one call, once per filter setting; the
+    # views below pick from the result.
+    if design.startswith("FIR"):
+        filter_name = 'fir_lowpass'
+        filter_all = lambda: apply_fir_lowpass(source.samples(mono=False), fs, cutoff)
+    else:
+        filter_name = 'lowpass'
+        filter_all = lambda: apply_lowpass(source.samples(mono=False), fs, cutoff, order)
+    filter_params = {'filter': filter_name, 'cutoff': cutoff}
+    if filter_name == 'lowpass':
+        # The FIR design does not depend on the order.
+        filter_params['order'] = order
+    processed_all = get_processed_audio(filter_params, filter_all)
+    if channel is not None:
+        processed_data = processed_all[:, channel]
+    elif source.channels > 1:
+        processed_data = processed_all.mean(axis=1)
+    else:
+        processed_data = processed_all[:, 0]
             
     st.markdown("### 🎧 Audio Preview")
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("**Original**")
-        st.audio(data, sample_rate=fs)
+        with profiler.section('render.audio'):
+            st.audio(data, sample_rate=fs)
     with col2:
         st.markdown(f"**Processed**")
-        st.audio(processed_data, sample_rate=fs)
+        with profiler.section('render.audio'):
+            st.audio(processed_data, sample_rate=fs)
         
-    st.markdown(get_audio_download_link(processed_data, fs, f"cleaned_{method.lower().replace(' ', '_')}.wav"), unsafe_allow_html=True)
+    lowpass_params = dict(filter_params, channel=channel)
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        download_format = st.selectbox("Download Format", list(DOWNLOAD_FORMATS))
+    with col2:
+        # Encoded once per (file, filter, format); reruns reuse the file on disk.
+        download_path = get_download_file(
+            'lowpass_audio', filter_params,
+            lambda: processed_all, fs, download_format
+        )
+        st.markdown("<br>", unsafe_allow_html=True)
+        render_download_button(download_path, f"cleaned_{method.lower().replace(' ', '_')}", download_format)
     
     st.markdown("### 📊 Spectrogram Comparison")
     
-    f_orig, t_orig, Sxx_orig = spectrogram(data, fs)
-    f_proc, t_proc, Sxx_proc = spectrogram(processed_data, fs)
+    nperseg = 256
     
-    Sxx_orig_log = 10 * np.log10(Sxx_orig + 1e-10)
-    Sxx_proc_log = 10 * np.log10(Sxx_proc + 1e-10)
+    duration = len(data) / fs
+    t_range = st.slider(
+        "Time Range (s)",
+        min_value=0.0,
+        max_value=float(duration),
+        value=(0.0, float(duration)),
+        step=max(0.01, round(duration / 1000, 2))
+    )
+    
+    pyramid_orig = get_spectrogram_pyramid({'nperseg': nperseg, 'channel': channel}, lambda: data)
+    pyramid_proc = get_spectrogram_pyramid(dict(lowpass_params, nperseg=nperseg), lambda: processed_data)
+    
+    # Heatmaps are served at bounded resolution, max-pooled in dB.
+    f_orig, t_orig, Sxx_orig_log = pyramid_orig.query(t_range)
+    f_proc, t_proc, Sxx_proc_log = pyramid_proc.query(t_range)
     
     col1, col2 = st.columns(2)
     
@@ -92,7 +138,8 @@ def render():
             template="plotly_dark",
             height=400
         )
-        st.plotly_chart(fig1, use_container_width=True)
+        with profiler.section('render.plotly_chart'):
+            st.plotly_chart(fig1, use_container_width=True)
         
     with col2:
         fig2 = go.Figure(data=go.Heatmap(
@@ -108,12 +155,17 @@ def render():
             template="plotly_dark",
             height=400
         )
-        st.plotly_chart(fig2, use_container_width=True)
+        with profiler.section('render.plotly_chart'):
+            st.plotly_chart(fig2, use_container_width=True)
         
     st.markdown("### 📉 Frequency Spectrum Comparison")
     
-    freqs_orig, mag_orig, _ = compute_fft(data, fs, window_type='Hann', scale='Log')
-    freqs_proc, mag_proc, _ = compute_fft(processed_data, fs, window_type='Hann', scale='Log')
+    freqs_orig, mag_orig = analysis.freqs, analysis.log_magnitude
+    freqs_proc, mag_proc, _ = cached_analysis(
+        'fft', dict(lowpass_params, window_type='Hann', scale='Log', fast_len=True, method=analysis.method),
+        lambda: compute_fft(processed_data, fs, window_type='Hann', scale='Log', fast_len=True,
+                            method=analysis.method, nperseg=len(analysis.freqs) * 2 - 2)
+    )
     
     fig_spec = go.Figure()
     
@@ -150,4 +202,5 @@ def render():
         )
     )
     
-    st.plotly_chart(fig_spec, use_container_width=True)
+    with profiler.section('render.plotly_chart'):
+        st.plotly_chart(fig_spec, use_container_width=True)
@@ -1,18 +1,18 @@
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
-from dsp.fft_processor import compute_fft
-from app.utils import render_header
+from dsp import profiler
+from dsp.fft_engine import describe_size
+from app.utils import render_header, get_spectral_analysis, get_spectral_analyses, get_channel, get_peak_tracks
+
+MAX_TRACK_POINTS = 50000
 
 def render():
     render_header("FFT Analysis", "")
     
-    if 'audio_data' not in st.session_state:
+    if 'audio_source' not in st.session_state:
         st.warning("Please upload an audio file in the Home tab first.")
         return
-
-    data = st.session_state['audio_data']
-    fs = st.session_state['fs']
     
     st.markdown("### 🔍 Analysis")
     
@@ -49,27 +49,28 @@ def render():
             label_visibility="collapsed"
         )
         
-    freqs, magnitude_linear, phase = compute_fft(data, fs, window_type='Hann', scale='Linear')
+    analysis = get_spectral_analysis()
+    freqs = analysis.freqs
+    
+    source = st.session_state['audio_source']
+    overlay = []
+    if source.channels > 1:
+        others = [c for c in range(source.channels) if c != get_channel()]
+        overlay = st.multiselect(
+            "Overlay Channels",
+            others,
+            format_func=lambda c: f"Channel {c + 1}"
+        )
 
     with col2:
-        peak_idx = np.argmax(magnitude_linear)
-        p_signal = magnitude_linear[peak_idx]**2
-        
-        mask = np.ones(len(magnitude_linear), dtype=bool)
-        mask[max(0, peak_idx-2):min(len(magnitude_linear), peak_idx+3)] = False
-        
-        if np.any(mask):
-            p_noise = np.mean(magnitude_linear[mask]**2)
-            snr = 10 * np.log10(p_signal / p_noise) if p_noise > 0 else float('inf')
-        else:
-            snr = float('inf')
+        snr = analysis.snr()
             
         st.metric("Signal-to-Noise Ratio (SNR)", f"{snr:.2f} dB")
         
     if scale == "Log":
-        magnitude = 20 * np.log10(magnitude_linear + 1e-10)
+        magnitude = analysis.log_magnitude
     else:
-        magnitude = magnitude_linear
+        magnitude = analysis.magnitude
     
     st.markdown("### 📊 Spectrum")
     
@@ -85,6 +86,17 @@ def render():
         fillcolor='rgba(139, 92, 246, 0.2)'
     ))
     
+    for c in overlay:
+        other = get_spectral_analyses()[c]
+        fig_mag.add_trace(go.Scatter(
+            x=other.freqs,
+            y=other.log_magnitude if scale == "Log" else other.magnitude,
+            mode='lines',
+            name=f'Channel {c + 1}',
+            line=dict(width=1),
+            opacity=0.7
+        ))
+    
     fig_mag.update_layout(
         title="Magnitude Spectrum",
         xaxis_title="Frequency (Hz)",
@@ -93,17 +105,23 @@ def render():
         height=500
     )
     
-    st.plotly_chart(fig_mag, use_container_width=True)
+    with profiler.section('render.plotly_chart'):
+        st.plotly_chart(fig_mag, use_container_width=True)
+    
+    if analysis.method == 'welch':
+        st.caption("ℹ️ Long recording: showing an averaged (Welch) spectrum of overlapping segments.")
+    else:
+        size = describe_size(len(source))
+        if not size['is_fast']:
+            st.caption(f"ℹ️ Signal length {size['n']} (largest prime factor {size['largest_prime_factor']}) "
+                       f"was zero-padded to the fast FFT size {size['fast_n']}.")
     
     st.markdown("### 🏔️ Peak Frequencies")
     
     if len(magnitude) > 1:
-        mag_no_dc = magnitude[1:]
-        freqs_no_dc = freqs[1:]
-        
-        top_indices = np.argsort(mag_no_dc)[-5:][::-1]
-        top_freqs = freqs_no_dc[top_indices]
-        top_mags = mag_no_dc[top_indices]
+        top_freqs, top_mags = analysis.peaks(5)
+        if scale == "Log":
+            top_mags = 20 * np.log10(top_mags + 1e-10)
         
         cols = st.columns(5)
         for i, (f, m) in enumerate(zip(top_freqs, top_mags)):
@@ -121,3 +139,48 @@ def render():
                 </div>
                 """, unsafe_allow_html=True)
 
+    st.markdown("### 🎼 Peak Tracks")
+    
+    st.markdown("""
+    The strongest peaks of every short-time spectrum are linked into **tracks**:
+    each peak continues the track closest in frequency in the previous frames,
+    showing how the dominant frequencies change over the recording.
+    """)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        frame_size = st.selectbox("Frame Size", [1024, 2048, 4096, 8192], index=2,
+                                  help="Longer frames resolve closer frequencies but follow changes more slowly.")
+    with col2:
+        n_peaks = st.slider("Peaks per Frame", 1, 10, 5)
+    with col3:
+        floor_db = st.slider("Floor (dB)", -100, -20, -60, step=5,
+                             help="Peaks below this level (relative to a full-scale sine) are ignored.")
+    
+    tracks = get_peak_tracks(frame_size, n_peaks, float(floor_db))
+    if len(tracks) == 0:
+        st.info("No peaks above the floor lasted long enough to form a track.")
+        return
+    
+    # Plot every k-th point so long recordings stay responsive.
+    step = max(1, len(tracks) // MAX_TRACK_POINTS)
+    fig_tracks = go.Figure(go.Scattergl(
+        x=tracks.time[::step],
+        y=tracks.frequency[::step],
+        mode='markers',
+        marker=dict(size=3, color=tracks.magnitude_db[::step], colorscale='Viridis',
+                    colorbar=dict(title='dB')),
+        customdata=tracks.track[::step],
+        hovertemplate="Track %{customdata}<br>%{x:.2f} s<br>%{y:.1f} Hz<extra></extra>"
+    ))
+    fig_tracks.update_layout(
+        title=f"{tracks.n_tracks} Peak Tracks",
+        xaxis_title="Time (s)",
+        yaxis_title="Frequency (Hz)",
+        template="plotly_dark",
+        height=450
+    )
+    with profiler.section('render.plotly_chart'):
+        st.plotly_chart(fig_tracks, use_container_width=True)
+    
+    st.dataframe(tracks.summary(), hide_index=True, use_container_width=True)
@@ -1,29 +1,28 @@
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
-from dsp.sampler import sample_signal, quantize_signal
-from app.utils import render_header
+from dsp import profiler
+from dsp.sampler import sample_signal
+from dsp.quantizer import Quantizer
+from dsp.waveform import minmax_envelope
+from app.utils import render_header, get_spectral_analysis, get_waveform_pyramid, get_signal, get_channel
 
 def render():
     render_header("Sampling & Quantization", "")
     
-    if 'audio_data' not in st.session_state:
+    if 'audio_source' not in st.session_state:
         st.warning("Please upload an audio file in the Home tab first.")
         return
 
-    data = st.session_state['audio_data']
-    fs = st.session_state['fs']
+    source = st.session_state['audio_source']
+    data = get_signal(get_channel())
+    fs = source.samplerate
     
     st.markdown("### 🎛️ Controls")
     
     col1, col2 = st.columns(2)
     
-    from dsp.fft_processor import compute_fft
-    f_orig, mag_orig, _ = compute_fft(data, fs, window_type='Hann', scale='Linear')
-    threshold = 0.01 * np.max(mag_orig)
-    significant_freqs = f_orig[mag_orig > threshold]
-    f_max = np.max(significant_freqs) if len(significant_freqs) > 0 else 0
-    nyquist_rate = 2 * f_max
+    nyquist_rate = get_spectral_analysis().nyquist_rate()
     
     with col1:
         new_fs = st.slider(
@@ -48,14 +47,32 @@ def render():
             value=8,
             help="Higher bits = Less quantization noise"
         )
+        dither = st.selectbox(
+            "Dither",
+            ["None", "TPDF"],
+            help="Triangular dither of ±1 step decorrelates the error from the signal (no distortion harmonics) at the cost of a higher noise floor."
+        )
+        noise_shaping = st.selectbox(
+            "Noise Shaping",
+            ["None", "First-order", "Second-order"],
+            help="Feeds the quantization error back to push the noise towards high frequencies."
+        )
         
     resampled_signal, t_resampled = sample_signal(data, fs, new_fs)
     
-    quantized_signal, error = quantize_signal(resampled_signal, n_bits)
+    # Integer codes for the whole signal; floats only for the samples on screen.
+    quantizer = Quantizer(
+        n_bits,
+        full_scale=np.max(np.abs(resampled_signal), initial=0),
+        dither=None if dither == "None" else dither.lower(),
+        noise_shaping=None if noise_shaping == "None" else noise_shaping.lower(),
+        seed=0
+    )
+    codes = quantizer.quantize(resampled_signal)
     
     st.markdown("### 📊 Visualization")
     
-    zoom_range = st.slider("Zoom (Samples)", 0, len(data), (0, 1000))
+    zoom_range = st.slider("Zoom (Samples)", 0, len(source), (0, 1000))
     start_idx, end_idx = zoom_range
     
     ratio = new_fs / fs
@@ -64,18 +81,11 @@ def render():
     
     fig = go.Figure()
     
-    t_orig = np.arange(start_idx, end_idx) / fs
-    y_orig = data[start_idx:end_idx]
-    
     max_plot_points = 5000
-    if len(t_orig) > max_plot_points:
-        step = int(np.ceil(len(t_orig) / max_plot_points))
-        t_plot = t_orig[::step]
-        y_plot = y_orig[::step]
-        st.caption(f"⚠️ Visualizing 1 out of every {step} samples for performance.")
-    else:
-        t_plot = t_orig
-        y_plot = y_orig
+    x_orig, y_plot, block = get_waveform_pyramid().query(start_idx, end_idx, max_plot_points)
+    t_plot = x_orig / fs
+    if block > 1:
+        st.caption(f"⚠️ Showing the min/max envelope of every {block} samples for performance.")
 
     fig.add_trace(go.Scatter(
         x=t_plot, 
@@ -86,16 +96,8 @@ def render():
         opacity=0.7
     ))
     
-    t_new = t_resampled[start_res:end_res]
-    y_new = quantized_signal[start_res:end_res]
-    
-    if len(t_new) > max_plot_points:
-        step_new = int(np.ceil(len(t_new) / max_plot_points))
-        t_new_plot = t_new[::step_new]
-        y_new_plot = y_new[::step_new]
-    else:
-        t_new_plot = t_new
-        y_new_plot = y_new
+    idx_new, y_new_plot = minmax_envelope(quantizer.dequantize(codes[start_res:end_res]), max_plot_points)
+    t_new_plot = t_resampled[start_res:end_res][idx_new]
     
     fig.add_trace(go.Scatter(
         x=t_new_plot, 
@@ -121,14 +123,18 @@ def render():
         )
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    with profiler.section('render.plotly_chart'):
+        st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("### 📉 Quantization Error", help="Quantization error is the difference between the analog signal and the closest available digital value at each sampling instant. It introduces noise, often called quantization noise.")
     
+    error = quantizer.error(resampled_signal[start_res:end_res], codes[start_res:end_res])
+    idx_err, y_err = minmax_envelope(error, max_plot_points)
+    
     fig_err = go.Figure()
     fig_err.add_trace(go.Scatter(
-        x=t_new,
-        y=error[start_res:end_res],
+        x=t_resampled[start_res:end_res][idx_err],
+        y=y_err,
         mode='lines',
         name='Error',
         line=dict(color='#F59E0B')
@@ -142,7 +148,8 @@ def render():
         height=300
     )
     
-    st.plotly_chart(fig_err, use_container_width=True)
+    with profiler.section('render.plotly_chart'):
+        st.plotly_chart(fig_err, use_container_width=True)
     
     st.markdown("### 📝 Metrics")
     col1, col2 = st.columns(2)
@@ -158,10 +165,7 @@ def render():
         """, unsafe_allow_html=True)
         
     with col2:
-        p_signal = np.mean(resampled_signal**2)
-        p_noise = np.mean(error**2)
-        
-        snr = 10 * np.log10(p_signal / p_noise) if p_noise > 0 else float('inf')
+        snr = quantizer.snr()
         
         st.markdown(f"""
         <div class="metric-container">
@@ -1,5 +1,14 @@
 import streamlit as st
-import base64
+import time
+from dsp.audio_source import AudioSource
+from app.analysis_cache import get_cache
+from app.recent_files import get_recent_store
+from app.preanalysis import (channel_signal, spectrum_request, spectral_analyses, waveform_request,
+                              sidecar_cache, get_job, read_status)
+from dsp.waveform import WaveformPyramid
+from dsp.spectrogram import SpectrogramPyramid, compute_spectrogram_db
+from dsp.peak_tracking import PeakTracks, track_peaks
+from dsp import profiler
 
 def load_css():
     """
@@ -70,64 +79,314 @@ def render_header(title, subtitle=""):
         </div>
     """, unsafe_allow_html=True)
 
-def get_audio_download_link(audio_data, fs, filename="processed_audio.wav"):
+# Label -> (extension, soundfile subtype, MIME type) of the download formats.
+DOWNLOAD_FORMATS = {
+    'FLAC (16-bit)': ('flac', 'PCM_16', 'audio/flac'),
+    'WAV (16-bit PCM)': ('wav', 'PCM_16', 'audio/wav'),
+    'WAV (32-bit float)': ('wav', 'FLOAT', 'audio/wav'),
+}
+
+def get_download_file(name, params, get_audio, fs, download_format='FLAC (16-bit)'):
+    """
+    Encodes processed audio to a file in the analysis cache, once per parameter set.
+    
+    Args:
+        name (str): Name of the processing (part of the cache key).
+        params (dict): Every parameter the processed audio depends on.
+        get_audio (callable): Zero-argument function returning the samples;
+            only called when the file does not exist yet.
+        fs (int): Sampling rate.
+        download_format (str): Key of DOWNLOAD_FORMATS.
+        
+    Returns:
+        str: Path of the encoded file.
+    """
     import soundfile as sf
-    import io
     
-    buffer = io.BytesIO()
-    sf.write(buffer, audio_data, fs, format='WAV')
-    buffer.seek(0)
-    b64 = base64.b64encode(buffer.read()).decode()
+    extension, subtype, _ = DOWNLOAD_FORMATS[download_format]
+    source = st.session_state['audio_source']
+    
+    def write(path):
+        with profiler.section('app.audio_encode'):
+            sf.write(path, get_audio(), fs, format=extension.upper(), subtype=subtype)
+    
+    return get_cache().get_or_write_file(source.content_hash(), name, dict(params, subtype=subtype),
+                                         extension, write)
+
+def render_download_button(path, file_name, download_format='FLAC (16-bit)', label="Download Processed Audio"):
+    """
+    Download button for a file on disk.
+    
+    The file is read only when the button is clicked and is served as a
+    regular HTTP download, not embedded in the page.
+    """
+    extension, _, mime = DOWNLOAD_FORMATS[download_format]
+    
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
     
-    href = f'<a href="data:audio/wav;base64,{b64}" download="{filename}" style="text-decoration: none;"><button style="background: #10B981; color: white; border: none; padding: 10px 20px; border-radius: 5px; cursor: pointer; font-weight: bold;">Download Processed Audio</button></a>'
-    return href
+    st.download_button(label, data=read, file_name=f"{file_name}.{extension}", mime=mime, icon="⬇️")
 
 import json
 import os
 
-RECENT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output', 'recent')
-HISTORY_FILE = os.path.join(RECENT_DIR, 'history.json')
+TRACE_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'output', 'traces', 'profile.jsonl')
 
-def save_to_history(uploaded_file):
+def save_upload(uploaded_file):
     """
-    Saves the uploaded file to the recent directory and updates history.json.
+    Adds an uploaded file to the recent-files store.
+    
+    Returns:
+        dict: The store entry (path, hash, name and audio metadata).
     """
-    if not os.path.exists(RECENT_DIR):
-        os.makedirs(RECENT_DIR)
-        
-    file_path = os.path.join(RECENT_DIR, uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-        
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'r') as f:
-            try:
-                history = json.load(f)
-            except:
-                history = []
-    
-    if file_path in history:
-        history.remove(file_path)
-        
-    history.insert(0, file_path)
+    return get_recent_store().add(uploaded_file.name, uploaded_file.getbuffer())
+
+def load_audio_source(file_path, name, content_hash=None):
+    """
+    Makes file_path the current signal without decoding it.
     
-    history = history[:5]
+    Only the header is read here; tabs pull samples from the AudioSource
+    stored in session_state when they need them.
+    """
+    source = AudioSource(file_path, content_hash)
+    st.session_state['audio_source'] = source
+    st.session_state.pop('spectral_analysis', None)
+    st.session_state.pop('waveform_pyramid', None)
+    st.session_state.pop('spectrogram_pyramids', None)
+    st.session_state.pop('processed_audio', None)
+    st.session_state.pop('channel', None)
+    st.session_state['fs'] = source.samplerate
+    st.session_state['current_file'] = name
+    return source
+
+def cached_analysis(name, params, compute):
+    """
+    Runs an analysis of the current file through the on-disk analysis cache.
     
-    with open(HISTORY_FILE, 'w') as f:
-        json.dump(history, f)
+    Results pre-computed at upload time are read from the file's sidecar; if
+    the background job is still working on this result, a progress bar is
+    shown until it is ready instead of computing it a second time.
+    
+    Args:
+        name (str): Analysis name.
+        params (dict): Every parameter the result depends on.
+        compute (callable): Zero-argument function returning a tuple of arrays.
         
-    return file_path
+    Returns:
+        tuple: The cached or freshly computed arrays.
+    """
+    source = st.session_state['audio_source']
+    content_hash = source.content_hash()
+    with profiler.section(f'cache.{name}'):
+        wait_for_preanalysis(name, params)
+        sidecar = sidecar_cache(content_hash)
+        if sidecar is not None:
+            result = sidecar.get(content_hash, name, params)
+            if result is not None:
+                return result
+        return get_cache().get_or_compute(content_hash, name, params, compute)
 
-def get_recent_files():
+def wait_for_preanalysis(name, params):
     """
-    Returns a list of recent file paths.
+    Blocks with a progress bar while the background job is producing (name, params).
     """
-    if not os.path.exists(HISTORY_FILE):
-        return []
-        
-    with open(HISTORY_FILE, 'r') as f:
-        try:
-            return json.load(f)
-        except:
-            return []
+    job = get_job(st.session_state['audio_source'].content_hash())
+    if job is None or not job.is_pending(name, params):
+        return
+    placeholder = st.empty()
+    while job.is_pending(name, params):
+        placeholder.progress(job.progress, text=f"⏳ Pre-analysis running: {job.stage}…")
+        time.sleep(0.1)
+    placeholder.empty()
+
+def render_preanalysis_status():
+    """
+    Shows the progress of the current file's pre-analysis, then its summary.
+    """
+    source = st.session_state.get('audio_source')
+    if source is None:
+        return
+    job = get_job(source.content_hash())
+    if job is not None:
+        @st.fragment(run_every=0.5)
+        def progress():
+            if job.finished:
+                st.rerun()
+            st.progress(job.progress, text=f"⏳ Pre-analysis running: {job.stage}…")
+        progress()
+        return
+    
+    status = read_status(source.content_hash())
+    if status is None:
+        return
+    if status['state'] == 'error':
+        st.warning(f"Pre-analysis failed ({status['error']}); tabs will compute on demand.")
+    elif status['state'] == 'done' and status.get('summary'):
+        mix = status['summary']['mix']
+        st.caption(f"✅ Pre-analysed: 95% of the energy below **{mix['energy_cutoff_95']:.0f} Hz**, "
+                   f"f_max **{mix['f_max']:.0f} Hz** (Nyquist rate {mix['nyquist_rate']:.0f} Hz), "
+                   f"SNR **{mix['snr_db']:.1f} dB**.")
+
+def get_channel():
+    """
+    Returns the channel picked in the sidebar (None for the mono mix).
+    """
+    return st.session_state.get('channel')
+
+def get_signal(channel=None):
+    """
+    Returns the current file's samples for one channel, or the mono mix for None.
+    
+    All channels are decoded once; picking another channel is just a view.
+    """
+    return channel_signal(st.session_state['audio_source'], channel)
+
+def get_spectral_analyses():
+    """
+    Returns the SpectralAnalysis of every channel of the current file.
+    
+    The Hann-windowed spectra of the mono mix and of all channels come from
+    one vectorized compute_fft call (through the analysis cache) once per
+    loaded file; everything derived from them is memoized on the objects.
+    Files longer than LONG_SIGNAL_SECONDS use an averaged (Welch) spectrum
+    streamed from disk instead of one FFT of the whole signal.
+    
+    Returns:
+        dict: SpectralAnalysis per channel index, with None for the mono mix.
+    """
+    analyses = st.session_state.get('spectral_analysis')
+    if analyses is None:
+        source = st.session_state['audio_source']
+        name, params, compute = spectrum_request(source)
+        freqs, magnitude = cached_analysis(name, params, compute)
+        analyses = spectral_analyses(source, freqs, magnitude, params.get('method', 'fft'))
+        st.session_state['spectral_analysis'] = analyses
+    return analyses
+
+def get_spectral_analysis():
+    """
+    Returns the SpectralAnalysis of the channel picked in the sidebar.
+    """
+    return get_spectral_analyses()[get_channel()]
+
+def get_waveform_pyramid():
+    """
+    Returns the min/max WaveformPyramid of the picked channel, built once per channel.
+    
+    The pyramid levels go through the analysis cache (and the sidecar).
+    """
+    pyramids = st.session_state.setdefault('waveform_pyramid', {})
+    channel = get_channel()
+    if channel not in pyramids:
+        name, params, compute = waveform_request(st.session_state['audio_source'], channel)
+        pyramids[channel] = WaveformPyramid.from_arrays(get_signal(channel), *cached_analysis(name, params, compute))
+    return pyramids[channel]
+
+def get_spectrogram_pyramid(params, get_signal, max_pyramids=4):
+    """
+    Returns a SpectrogramPyramid of the current file or a processed version of it.
+    
+    The dB spectrogram goes through the analysis cache; pyramids are kept in
+    session_state for the last few parameter sets.
+    
+    Args:
+        params (dict): 'nperseg' plus any processing parameters of the signal.
+        get_signal (callable): Zero-argument function returning the signal.
+        max_pyramids (int): Number of pyramids kept in session_state.
+    """
+    key = json.dumps(params, sort_keys=True)
+    pyramids = st.session_state.setdefault('spectrogram_pyramids', {})
+    if key not in pyramids:
+        fs = st.session_state['audio_source'].samplerate
+        f, t, z = cached_analysis(
+            'spectrogram_db', params,
+            lambda: compute_spectrogram_db(get_signal(), fs, nperseg=params['nperseg'])
+        )
+        pyramids[key] = SpectrogramPyramid(f, t, z)
+        while len(pyramids) > max_pyramids:
+            pyramids.pop(next(iter(pyramids)))
+    return pyramids[key]
+
+def get_processed_audio(params, compute, max_results=2):
+    """
+    Returns a processed version of the current file, all channels, memoized in session_state.
+    
+    Reruns that only change the view (channel, time range, download format)
+    reuse the result instead of processing the whole file again.
+    
+    Args:
+        params (dict): Every processing parameter the result depends on.
+        compute (callable): Zero-argument function returning the processed samples.
+        max_results (int): Number of results kept in session_state.
+    """
+    key = json.dumps([st.session_state['audio_source'].content_hash(), params], sort_keys=True)
+    results = st.session_state.setdefault('processed_audio', {})
+    if key not in results:
+        results[key] = compute()
+        while len(results) > max_results:
+            results.pop(next(iter(results)))
+    return results[key]
+
+def get_peak_tracks(frame_size=4096, n_peaks=5, floor_db=-60.0):
+    """
+    Returns the PeakTracks of the picked channel, through the analysis cache.
+    
+    Args:
+        frame_size (int): STFT frame size (the hop is half of it).
+        n_peaks (int): Peaks picked per frame.
+        floor_db (float): Level (dB re. a full-scale sine) peaks must exceed.
+    """
+    channel = get_channel()
+    fs = st.session_state['audio_source'].samplerate
+    params = {'frame_size': frame_size, 'n_peaks': n_peaks, 'floor_db': floor_db, 'channel': channel}
+    arrays = cached_analysis(
+        'peak_tracks', params,
+        lambda: track_peaks(get_signal(channel), fs, frame_size=frame_size, n_peaks=n_peaks,
+                            floor_db=floor_db).to_arrays()
+    )
+    return PeakTracks.from_arrays(*arrays)
+
+def start_profiling():
+    """
+    Turns the profiler on or off for this rerun from the sidebar settings.
+    
+    Profiling is off unless the performance panel is enabled; while off,
+    instrumented calls cost one attribute lookup. Every rerun runs on a new
+    thread, so whether this session holds the process-wide allocation
+    tracking is kept in session_state and handed to the profiler.
+    """
+    was_memory = st.session_state.get('_profiler_memory', False)
+    if st.session_state.get('profiling'):
+        trace = TRACE_FILE if st.session_state.get('profile_trace') else None
+        memory = bool(st.session_state.get('profile_memory', False))
+        profiler.enable(memory=memory, trace_path=trace, was_memory=was_memory)
+        st.session_state['_profiler_memory'] = memory
+    elif was_memory or profiler.is_enabled():
+        profiler.disable(was_memory=was_memory)
+        st.session_state['_profiler_memory'] = False
+
+def render_performance_panel(records):
+    """
+    Shows the per-rerun timing (and allocation) breakdown of the profiler.
+    
+    Args:
+        records (list): Sections returned by profiler.finish_run().
+    """
+    if not records:
+        st.caption("No instrumented calls in this rerun.")
+        return
+    total = sum(r['time_s'] for r in records if r['depth'] == 0)
+    st.caption(f"Instrumented time this rerun: **{total * 1000:.1f} ms**")
+    rows = []
+    for entry in profiler.summarize(records):
+        row = {
+            'section': '· ' * entry['depth'] + entry['name'],
+            'calls': entry['calls'],
+            'total ms': round(entry['total_s'] * 1000, 2),
+            'max ms': round(entry['max_s'] * 1000, 2),
+        }
+        if 'peak_bytes' in entry:
+            row['peak MiB'] = round(entry['peak_bytes'] / 2**20, 2)
+        rows.append(row)
+    st.dataframe(rows, hide_index=True, use_container_width=True)
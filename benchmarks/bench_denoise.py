@@ -0,0 +1,82 @@
+"""
+Benchmark: STFT overlap-add denoisers vs the previous whole-signal FFT versions.
+
+Reports wall time and peak traced memory (tracemalloc, which includes NumPy
+buffers) for 10-minute and 1-hour signals by default. The whole-signal
+reference needs several complex128 copies of the input, so pass
+--legacy-max to skip it above a given duration on small machines.
+
+Run from the repository root:
+    python benchmarks/bench_denoise.py
+    python benchmarks/bench_denoise.py --fs 16000 --durations 600 3600 --legacy-max 600
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dsp.filter_processor import apply_spectral_subtraction, apply_wiener_filter
+
+def legacy_spectral_subtraction(signal, fs, noise_estimation_duration=0.5):
+    noise_samples = int(noise_estimation_duration * fs)
+    if noise_samples >= len(signal):
+        noise_samples = len(signal) // 10
+    N = len(signal)
+    noise_mag = np.abs(np.fft.fft(signal[:noise_samples], n=N))
+    signal_fft = np.fft.fft(signal)
+    clean_mag = np.maximum(np.abs(signal_fft) - noise_mag, 0)
+    clean_fft = clean_mag * np.exp(1j * np.angle(signal_fft))
+    return np.real(np.fft.ifft(clean_fft))
+
+def legacy_wiener_filter(signal, fs):
+    noise_samples = int(0.5 * fs)
+    if noise_samples >= len(signal):
+        noise_samples = len(signal) // 10
+    N = len(signal)
+    noise_psd = np.abs(np.fft.fft(signal[:noise_samples], n=N)) ** 2
+    signal_fft = np.fft.fft(signal)
+    signal_psd = np.abs(signal_fft) ** 2
+    H = np.maximum(signal_psd - noise_psd, 0) / (signal_psd + 1e-10)
+    return np.real(np.fft.ifft(H * signal_fft))
+
+def measure(func, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fs', type=int, default=44100)
+    parser.add_argument('--durations', type=float, nargs='+', default=[600, 3600])
+    parser.add_argument('--legacy-max', type=float, default=float('inf'),
+                        help='Skip the whole-signal reference for durations above this (seconds).')
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    cases = [
+        ('spectral subtraction', apply_spectral_subtraction, legacy_spectral_subtraction),
+        ('wiener', apply_wiener_filter, legacy_wiener_filter),
+    ]
+    
+    print(f"{'method':<22} {'duration':>9} {'impl':>8} {'time (s)':>9} {'peak (MiB)':>11}")
+    for duration in args.durations:
+        signal = rng.standard_normal(int(duration * args.fs))
+        for name, stft_func, legacy_func in cases:
+            runs = [('stft', stft_func)]
+            if duration <= args.legacy_max:
+                runs.append(('legacy', legacy_func))
+            for impl, func in runs:
+                elapsed, peak = measure(func, signal, args.fs)
+                print(f"{name:<22} {duration:>8.0f}s {impl:>8} {elapsed:>9.2f} {peak:>11.1f}")
+        del signal
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: direct vs overlap-save FFT convolution in dsp.fir.StreamingFIR.
+
+For each block size, filters the same signal block by block with both
+methods over a range of filter lengths, and reports the measured crossover
+(shortest filter for which FFT wins) next to the one fir_method predicts.
+
+Run from the repository root:
+    python benchmarks/bench_fir.py
+    python benchmarks/bench_fir.py --samples 4000000 --single-precision
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dsp import fft_engine
+from dsp.fir import StreamingFIR, fir_method
+
+BLOCK_SIZES = [64, 256, 1024, 4096, 16384, 2**20]
+TAPS = [8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+def _time(fir, signal, block_size, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        fir.reset()
+        t0 = time.perf_counter()
+        for start in range(0, len(signal), block_size):
+            fir.process(signal[start:start + block_size])
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=2**20, help='Signal length.')
+    parser.add_argument('--single-precision', action='store_true')
+    args = parser.parse_args()
+    if args.single_precision:
+        fft_engine.configure(single_precision=True)
+
+    rng = np.random.default_rng(0)
+    signal = fft_engine.as_real(rng.standard_normal(args.samples))
+    print(f"{'block':>8} {'taps':>6} {'direct (s)':>11} {'fft (s)':>9} {'auto':>7}")
+    for block_size in BLOCK_SIZES:
+        measured = predicted = None
+        for n_taps in TAPS:
+            taps = rng.standard_normal(n_taps)
+            t_direct = _time(StreamingFIR(taps, 'direct'), signal, block_size)
+            t_fft = _time(StreamingFIR(taps, 'fft'), signal, block_size)
+            choice = fir_method(n_taps, min(block_size, args.samples))
+            if measured is None and t_fft < t_direct:
+                measured = n_taps
+            if predicted is None and choice == 'fft':
+                predicted = n_taps
+            print(f"{block_size:>8} {n_taps:>6} {t_direct:>11.4f} {t_fft:>9.4f} {choice:>7}")
+        print(f"{block_size:>8} crossover: measured {measured} taps, predicted {predicted} taps\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: polyphase vs FFT resampling in dsp.sampler.sample_signal.
+
+Run from the repository root:
+    python benchmarks/bench_resample.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dsp.sampler import sample_signal
+
+CASES = [
+    # (original_fs, new_fs, duration in seconds, extra samples to make N awkward)
+    (44100, 8000, 10, 0),
+    (44100, 22000, 60, 7),
+    (48000, 41000, 60, 13),
+    (44100, 16000, 300, 1),
+]
+
+def _time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'fs':>7} {'new_fs':>7} {'N':>10} {'fft (s)':>9} " +
+          " ".join(f"{q + ' (s)':>12}" for q in ('low', 'medium', 'high')))
+    
+    for fs, new_fs, duration, extra in CASES:
+        N = fs * duration + extra
+        signal = rng.standard_normal(N)
+        
+        t_fft = _time(lambda: sample_signal(signal, fs, new_fs, method='fft'), repeat=1)
+        t_poly = [
+            _time(lambda q=q: sample_signal(signal, fs, new_fs, method='polyphase', quality=q))
+            for q in ('low', 'medium', 'high')
+        ]
+        
+        print(f"{fs:>7} {new_fs:>7} {N:>10} {t_fft:>9.3f} " +
+              " ".join(f"{t:>12.3f}" for t in t_poly))
+
+if __name__ == '__main__':
+    main()
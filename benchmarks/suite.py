@@ -0,0 +1,229 @@
+"""
+Benchmark suite for the dsp package.
+
+Times sample_signal, quantize_signal, compute_fft, apply_lowpass, apply_fir_lowpass,
+apply_spectral_subtraction, apply_wiener_filter and track_peaks on synthetic signals
+(seconds to hours, common sample rates, optionally prime lengths) and records
+wall time, throughput and peak traced memory. Results are written as JSON;
+--compare checks them against an earlier run and exits with status 1 if any
+case got slower or bigger by more than --threshold.
+
+Run from the repository root:
+    python benchmarks/suite.py --preset quick --output bench.json
+    python benchmarks/suite.py --preset quick --compare bench.json --threshold 0.25
+    python benchmarks/suite.py --preset full --output bench_full.json
+    python benchmarks/suite.py --preset quick --single-precision --output bench_f32.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import scipy
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dsp import fft_engine
+from dsp.sampler import sample_signal, quantize_signal
+from dsp.fft_processor import compute_fft
+from dsp.filter_processor import apply_lowpass, apply_spectral_subtraction, apply_wiener_filter
+from dsp.fir import apply_fir_lowpass
+from dsp.peak_tracking import track_peaks
+
+# name -> function(signal, fs)
+CASES = {
+    'sample_signal': lambda x, fs: sample_signal(x, fs, fs // 2),
+    'quantize_signal': lambda x, fs: quantize_signal(x, 8),
+    'compute_fft': lambda x, fs: compute_fft(x, fs, window_type='Hann', fast_len=True),
+    'apply_lowpass': lambda x, fs: apply_lowpass(x, fs, fs / 8),
+    'apply_fir_lowpass': lambda x, fs: apply_fir_lowpass(x, fs, fs / 8),
+    'apply_spectral_subtraction': lambda x, fs: apply_spectral_subtraction(x, fs),
+    'apply_wiener_filter': lambda x, fs: apply_wiener_filter(x, fs),
+    'track_peaks': lambda x, fs: track_peaks(x, fs),
+}
+
+# preset -> (sample rates, durations in seconds, include prime lengths)
+PRESETS = {
+    'quick': ([16000, 44100], [1, 10, 60], True),
+    'standard': ([8000, 16000, 44100, 48000], [1, 10, 60, 600], True),
+    'full': ([16000, 44100, 48000], [1, 60, 600, 3600], True),
+}
+
+def next_prime(n):
+    """
+    Smallest prime >= n.
+    """
+    def is_prime(k):
+        if k < 2:
+            return False
+        if k % 2 == 0:
+            return k == 2
+        d = 3
+        while d * d <= k:
+            if k % d == 0:
+                return False
+            d += 2
+        return True
+    while not is_prime(n):
+        n += 1
+    return n
+
+def synthetic_signal(n, fs, seed=0):
+    """
+    A few tones plus white noise, roughly in [-1, 1], in the package precision.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    tones = sum(a * np.sin(2 * np.pi * f * t) for a, f in ((0.5, 440), (0.2, 1250), (0.1, fs / 5)))
+    return fft_engine.as_real(tones + 0.05 * rng.standard_normal(n))
+
+def measure(func, signal, fs, repeat):
+    """
+    Returns (best wall time in s, peak traced memory in MiB) of func(signal, fs).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(signal, fs)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    func(signal, fs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+def run(sample_rates, durations, primes, cases, repeat, max_samples):
+    results = []
+    for fs in sample_rates:
+        for duration in durations:
+            lengths = [(int(fs * duration), False)]
+            if primes:
+                lengths.append((next_prime(int(fs * duration)), True))
+            for n, prime in lengths:
+                if n > max_samples:
+                    continue
+                signal = synthetic_signal(n, fs)
+                for name in cases:
+                    reps = repeat if n <= 10 * fs else 1
+                    elapsed, peak = measure(CASES[name], signal, fs, reps)
+                    result = {
+                        'case': name,
+                        'fs': fs,
+                        'duration': duration,
+                        'n': n,
+                        'prime': prime,
+                        'time_s': elapsed,
+                        'throughput': n / elapsed if elapsed > 0 else float('inf'),
+                        'peak_mib': peak,
+                    }
+                    results.append(result)
+                    print(f"{name:<28} fs={fs:<6} n={n:<10} {'prime' if prime else '     '} "
+                          f"{elapsed:>8.3f} s {result['throughput'] / 1e6:>8.2f} MS/s {peak:>9.1f} MiB")
+                del signal
+    return results
+
+def _key(result):
+    return (result['case'], result['fs'], result['n'])
+
+def check_precision(baseline):
+    """
+    Raises ValueError if the baseline was run at another precision than the current one.
+    """
+    # Baselines written before the precision mode existed ran in float64.
+    baseline_single = baseline.get('environment', {}).get('single_precision', False)
+    if baseline_single != fft_engine.get_settings()['single_precision']:
+        raise ValueError(f"The baseline was run in {'float32' if baseline_single else 'float64'}; "
+                         f"rerun with{'' if baseline_single else 'out'} --single-precision to compare.")
+
+def compare(results, baseline, threshold, min_time=0.005):
+    """
+    Lists cases whose time or peak memory grew by more than threshold (a fraction).
+
+    Timings below min_time seconds are too noisy to compare and are skipped.
+
+    Returns:
+        list: (case key, metric, baseline value, new value) per regression.
+
+    Raises:
+        ValueError: If the baseline was run at another precision than the current one.
+    """
+    check_precision(baseline)
+    old = {_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = old.get(_key(result))
+        if previous is None:
+            continue
+        for metric in ('time_s', 'peak_mib'):
+            if metric == 'time_s' and max(result[metric], previous[metric]) < min_time:
+                continue
+            if result[metric] > previous[metric] * (1 + threshold):
+                regressions.append((_key(result), metric, previous[metric], result[metric]))
+    return regressions
+
+def environment():
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'single_precision': fft_engine.get_settings()['single_precision'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--no-primes', action='store_true', help='Skip the prime-length variants.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repeats for short signals.')
+    parser.add_argument('--max-samples', type=int, default=10**9,
+                        help='Skip signals longer than this (to fit small machines).')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--compare', help='Baseline JSON file to check for regressions.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative increase in time or memory (default 0.2 = 20%%).')
+    parser.add_argument('--min-time', type=float, default=0.005,
+                        help='Ignore timing changes of cases faster than this (seconds).')
+    parser.add_argument('--single-precision', action='store_true', help='Run every case in float32.')
+    args = parser.parse_args()
+    if args.single_precision:
+        fft_engine.configure(single_precision=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        try:
+            check_precision(baseline)
+        except ValueError as e:
+            parser.error(str(e))
+
+    sample_rates, durations, primes = PRESETS[args.preset]
+    results = run(sample_rates, durations, primes and not args.no_primes, args.cases,
+                  args.repeat, args.max_samples)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'preset': args.preset, 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.min_time)
+        for key, metric, before, after in regressions:
+            # A zero baseline has no relative change; show the absolute one.
+            change = f"+{(after / before - 1) * 100:.0f}%" if before else f"+{after - before:.4g}"
+            print(f"REGRESSION {key} {metric}: {before:.4g} -> {after:.4g} ({change})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold * 100:.0f}%.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import numpy as np
+from functools import cached_property
+from dsp.fft_processor import compute_fft
+from dsp.peak_tracking import pick_peaks
+from dsp.profiler import profiled
+
+class SpectralAnalysis:
+    """
+    Spectrum of one signal plus everything the tabs derive from it.
+
+    The linear magnitude spectrum is computed (or supplied) once; log
+    magnitude, cumulative energy, the energy cutoff, f_max, SNR and peaks are
+    derived from it lazily and memoized, so asking for them again never
+    triggers another FFT.
+    """
+
+    def __init__(self, freqs, magnitude, method='fft', n_samples=None):
+        """
+        Args:
+            freqs (np.array): Frequency axis (positive half).
+            magnitude (np.array): Linear magnitude spectrum (positive half).
+            method (str): How the spectrum was computed ('fft' or 'welch').
+            n_samples (int): Length of the analysed signal; lets snr() of a
+                Welch spectrum report what a full-length FFT would show.
+        """
+        self.freqs = freqs
+        self.magnitude = magnitude
+        self.method = method
+        self.n_samples = n_samples
+        self._memo = {}
+
+    @classmethod
+    @profiled()
+    def from_signal(cls, signal, fs, window_type='Hann', method='fft', nperseg=4096):
+        """
+        Computes the spectrum of a signal (or, for 'welch', an iterable of chunks) and wraps it.
+        """
+        freqs, magnitude, _ = compute_fft(signal, fs, window_type=window_type, scale='Linear',
+                                          method=method, nperseg=nperseg)
+        n_samples = len(signal) if isinstance(signal, np.ndarray) else None
+        return cls(freqs, magnitude, method, n_samples)
+
+    def _memoize(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    @cached_property
+    def log_magnitude(self):
+        """
+        Magnitude in dB, as compute_fft(scale='Log') returns it.
+        """
+        return 20 * np.log10(self.magnitude + 1e-10)
+
+    @cached_property
+    def cumulative_energy(self):
+        """
+        Running sum of |X(f)|^2 over the frequency axis.
+        """
+        return np.cumsum(self.magnitude ** 2, dtype=np.float64)
+
+    def energy_cutoff(self, fraction=0.95):
+        """
+        Lowest frequency below which `fraction` of the spectral energy lies.
+
+        Runs over the spectrum in blocks, so no cumulative array the size of
+        the spectrum is built (unless cumulative_energy already exists).
+        """
+        def compute():
+            if 'cumulative_energy' in self.__dict__:
+                total_energy = self.cumulative_energy[-1]
+                return self.freqs[np.searchsorted(self.cumulative_energy, fraction * total_energy)]
+            return self.freqs[_cumulative_search(self.magnitude, fraction)]
+        return self._memoize(('energy_cutoff', fraction), compute)
+
+    def f_max(self, threshold_ratio=0.01):
+        """
+        Highest frequency whose magnitude exceeds threshold_ratio * peak magnitude.
+        """
+        def compute():
+            threshold = threshold_ratio * np.max(self.magnitude)
+            significant_freqs = self.freqs[self.magnitude > threshold]
+            return np.max(significant_freqs) if len(significant_freqs) > 0 else 0
+        return self._memoize(('f_max', threshold_ratio), compute)
+
+    def nyquist_rate(self, threshold_ratio=0.01):
+        """
+        Minimum sampling rate (2 * f_max) that avoids aliasing.
+        """
+        return 2 * self.f_max(threshold_ratio)
+
+    def snr(self, guard_bins=2):
+        """
+        Peak power over the mean power of the rest of the spectrum, in dB.
+
+        For a Welch spectrum of known length whose peak is a spectral line
+        (see is_tonal), the processing gain 10 * log10(n_samples / nperseg)
+        of a full-length FFT is added: a sinusoid keeps its bin level at any
+        transform length while a broadband floor drops, so the figure stays
+        comparable with the 'fft' method.
+
+        Args:
+            guard_bins (int): Bins on each side of the peak excluded from the noise.
+        """
+        def compute():
+            magnitude = self.magnitude
+            peak_idx = np.argmax(magnitude)
+            p_signal = magnitude[peak_idx] ** 2
+
+            mask = np.ones(len(magnitude), dtype=bool)
+            mask[max(0, peak_idx - guard_bins):min(len(magnitude), peak_idx + guard_bins + 1)] = False
+
+            if np.any(mask):
+                p_noise = np.mean(magnitude[mask] ** 2)
+                if p_noise <= 0:
+                    return float('inf')
+                snr = 10 * np.log10(p_signal / p_noise)
+                nperseg = 2 * (len(magnitude) - 1)
+                if self.method == 'welch' and (self.n_samples or 0) > nperseg and self.is_tonal(guard_bins):
+                    snr += 10 * np.log10(self.n_samples / nperseg)
+                return snr
+            return float('inf')
+        return self._memoize(('snr', guard_bins), compute)
+
+    def is_tonal(self, guard_bins=2, prominence_db=10, context_bins=64):
+        """
+        Whether the strongest bin is a spectral line rather than the top of a noise band.
+
+        Args:
+            guard_bins (int): Bins on each side of the peak that belong to it.
+            prominence_db (float): How far the peak must rise above the median
+                of its neighbourhood.
+            context_bins (int): Bins on each side (beyond the guard) forming the neighbourhood.
+        """
+        def compute():
+            power = self.magnitude ** 2
+            peak_idx = int(np.argmax(power))
+            left = power[max(0, peak_idx - guard_bins - context_bins):max(0, peak_idx - guard_bins)]
+            right = power[peak_idx + guard_bins + 1:peak_idx + guard_bins + context_bins + 1]
+            context = np.concatenate((left, right))
+            if len(context) == 0:
+                return False
+            floor = np.median(context)
+            return bool(floor == 0 or power[peak_idx] > floor * 10 ** (prominence_db / 10))
+        return self._memoize(('is_tonal', guard_bins, prominence_db, context_bins), compute)
+
+    def peaks(self, n=5):
+        """
+        The n strongest spectral peaks, strongest first.
+
+        Peaks are local maxima (so neighbouring bins of one peak are never
+        listed twice), refined to sub-bin accuracy; see pick_peaks.
+
+        Returns:
+            np.array: Peak frequencies.
+            np.array: Peak linear magnitudes.
+        """
+        def compute():
+            position, level_db = pick_peaks(self.magnitude ** 2, n)
+            found = ~np.isnan(position)
+            freqs = np.interp(position[found], np.arange(len(self.freqs)), self.freqs)
+            return freqs, 10 ** (level_db[found] / 20)
+        return self._memoize(('peaks', n), compute)
+
+def _cumulative_search(magnitude, fraction, block_size=65536):
+    """
+    Same as np.searchsorted(np.cumsum(magnitude ** 2), fraction * total), but
+    only one block of the running energy exists at a time.
+    """
+    total = 0.0
+    for start in range(0, len(magnitude), block_size):
+        total += np.sum(magnitude[start:start + block_size] ** 2, dtype=np.float64)
+    target = fraction * total
+    running = 0.0
+    for start in range(0, len(magnitude), block_size):
+        block = np.cumsum(magnitude[start:start + block_size] ** 2, dtype=np.float64)
+        block += running
+        if block[-1] >= target:
+            return start + int(np.searchsorted(block, target))
+        running = block[-1]
+    return len(magnitude) - 1
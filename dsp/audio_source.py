@@ -0,0 +1,169 @@
+import hashlib
+import struct
+import numpy as np
+import soundfile as sf
+from dsp.fft_engine import real_dtype
+from dsp.profiler import profiled
+
+# WAV subtypes that can be memory-mapped directly: (numpy dtype, offset, scale)
+# so that float sample = (raw - offset) / scale, matching soundfile's conversion.
+_MEMMAP_SUBTYPES = {
+    'PCM_U8': ('u1', 128, 128.0),
+    'PCM_16': ('<i2', 0, 32768.0),
+    'PCM_32': ('<i4', 0, 2147483648.0),
+    'FLOAT': ('<f4', 0, 1.0),
+    'DOUBLE': ('<f8', 0, 1.0),
+}
+
+def _wav_data_offset(path):
+    """
+    Returns the byte offset of the sample data in a RIFF/WAVE file, or None.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack('<4sI', chunk)
+            if chunk_id == b'data':
+                return f.tell()
+            f.seek(size + (size & 1), 1)
+
+class AudioSource:
+    """
+    Lazy handle on an audio file.
+
+    Opening a source only reads the header: length, sample rate and channel
+    count are available without decoding any samples. Samples are read on
+    demand by frame range, through a memory map for plain PCM/float WAV files
+    and through soundfile otherwise.
+    """
+
+    def __init__(self, path, content_hash=None):
+        """
+        Args:
+            path (str): Path to an audio file readable by soundfile.
+            content_hash (str): Known content_hash() of the file, if the caller
+                already has it (saves hashing the file again).
+        """
+        self.path = path
+        info = sf.info(path)
+        self.frames = info.frames
+        self.samplerate = info.samplerate
+        self.channels = info.channels
+        self.format = info.format
+        self.subtype = info.subtype
+        self._memmap = None
+        self._samples = None
+        self._mono = None
+        self._content_hash = content_hash
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def duration(self):
+        """
+        Length in seconds.
+        """
+        return self.frames / self.samplerate
+
+    @profiled()
+    def content_hash(self):
+        """
+        Returns a hex digest of the file's bytes, computed once and memoized.
+        """
+        if self._content_hash is None:
+            h = hashlib.blake2b(digest_size=20)
+            with open(self.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(2**20), b''):
+                    h.update(chunk)
+            self._content_hash = h.hexdigest()
+        return self._content_hash
+
+    def memmap(self):
+        """
+        Returns the raw sample data as a read-only memory map, if possible.
+
+        Returns:
+            np.memmap or None: Array of shape (frames, channels) in the file's
+            native dtype, or None if the file is not an uncompressed WAV.
+        """
+        if self._memmap is None and self.format == 'WAV' and self.subtype in _MEMMAP_SUBTYPES:
+            offset = _wav_data_offset(self.path)
+            if offset is not None:
+                dtype = _MEMMAP_SUBTYPES[self.subtype][0]
+                self._memmap = np.memmap(self.path, dtype=dtype, mode='r', offset=offset,
+                                         shape=(self.frames, self.channels))
+        return self._memmap
+
+    @profiled()
+    def read(self, start=0, stop=None, mono=True):
+        """
+        Reads a range of frames as floats of the package precision (fft_engine.real_dtype).
+
+        Args:
+            start (int): First frame.
+            stop (int): Frame after the last one (None for end of file).
+            mono (bool): Average the channels into one.
+
+        Returns:
+            np.array: Shape (n,) if mono else (n, channels).
+        """
+        start, stop, _ = slice(start, stop).indices(self.frames)
+        stop = max(start, stop)
+
+        dtype = real_dtype()
+        raw = self.memmap()
+        if raw is not None:
+            _, offset, scale = _MEMMAP_SUBTYPES[self.subtype]
+            data = raw[start:stop].astype(dtype)
+            if offset:
+                data -= offset
+            if scale != 1.0:
+                data /= scale
+        else:
+            data = sf.read(self.path, start=start, stop=stop, dtype=np.dtype(dtype).name, always_2d=True)[0]
+
+        if mono:
+            return data.mean(axis=1) if self.channels > 1 else data[:, 0]
+        return data
+
+    def blocks(self, blocksize=65536, start=0, stop=None, mono=True):
+        """
+        Iterates over the file in consecutive blocks.
+
+        Args:
+            blocksize (int): Frames per block.
+            start (int): First frame.
+            stop (int): Frame after the last one (None for end of file).
+            mono (bool): Average the channels into one.
+
+        Yields:
+            np.array: Blocks of samples, as returned by read().
+        """
+        start, stop, _ = slice(start, stop).indices(self.frames)
+        for block_start in range(start, stop, blocksize):
+            yield self.read(block_start, min(block_start + blocksize, stop), mono=mono)
+
+    @profiled()
+    def samples(self, mono=True):
+        """
+        Returns the whole file as floats of the package precision, decoded
+        once on first use (and again if the precision setting changes).
+
+        Args:
+            mono (bool): Average the channels into one; otherwise return
+                shape (frames, channels).
+        """
+        if self._samples is None or self._samples.dtype != real_dtype():
+            self._samples = self.read(mono=False)
+            self._mono = None
+        if not mono:
+            return self._samples
+        if self._mono is None:
+            self._mono = self._samples.mean(axis=1) if self.channels > 1 else self._samples[:, 0]
+        return self._mono
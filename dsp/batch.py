@@ -0,0 +1,314 @@
+"""
+Headless batch processing of audio files.
+
+Runs one processing recipe (resample, quantize, low-pass, denoise) over every
+matching file, streaming each file in blocks through a Pipeline and fanning
+files out over a process pool. One JSON line per finished file is appended to
+a manifest, so an interrupted run can be resumed with --resume.
+
+Examples (from the repository root):
+    python -m dsp.batch recordings/ -o cleaned/ --lowpass 4000
+    python -m dsp.batch "data/**/*.wav" -o out/ --resample 16000 --denoise subtraction --workers 8
+    python -m dsp.batch recordings/ -o cleaned/ --lowpass 4000 --resume
+    python -m dsp.batch recordings/ -o cleaned/ --lowpass 4000 --single-precision
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from dsp import fft_engine
+from dsp.audio_source import AudioSource
+from dsp.pipeline import Pipeline
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.aiff', '.aif')
+MANIFEST_NAME = 'manifest.jsonl'
+
+# Recipe keys and their Pipeline.build defaults.
+RECIPE_DEFAULTS = {
+    'new_fs': None,
+    'n_bits': None,
+    'full_scale': 1.0,
+    'cutoff': None,
+    'order': 5,
+    'lowpass': 'iir',
+    'denoise': None,
+    'noise_estimation_duration': 0.5,
+    'quality': 'medium',
+}
+
+# Keys added after manifests were first written; at their default they are
+# left out of the recipe hash, so earlier runs still resume.
+LATER_DEFAULTS = {
+    'lowpass': 'iir',
+}
+
+def recipe_hash(recipe):
+    """
+    Short stable hash of a recipe, stored in the manifest to detect changed settings.
+
+    Outputs differ in float32 mode, so the precision is part of the identity
+    (only when set, like in AnalysisCache.key, so existing hashes stay valid).
+    """
+    full = dict(RECIPE_DEFAULTS, **recipe)
+    for key, default in LATER_DEFAULTS.items():
+        if full[key] == default:
+            del full[key]
+    if fft_engine.get_settings()['single_precision']:
+        full['single_precision'] = True
+    text = json.dumps(full, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+def _glob_base(pattern):
+    # Leading path components without wildcards ('data' for 'data/**/*.wav').
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep):
+        if glob.has_magic(part):
+            return os.sep.join(parts) or os.curdir
+        parts.append(part)
+    return os.path.dirname(pattern) or os.curdir
+
+def find_inputs(patterns):
+    """
+    Expands directories (recursively) and glob patterns into (path, relative path) pairs.
+
+    The relative path decides where the output goes inside the output directory:
+    it is taken from the directory itself, or from the part of a glob pattern
+    before the first wildcard.
+    """
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in files:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        found[os.path.abspath(path)] = os.path.relpath(path, pattern)
+        else:
+            base = _glob_base(pattern)
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    found.setdefault(os.path.abspath(path), os.path.relpath(path, base))
+    return sorted(found.items())
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def load_manifest(path):
+    """
+    Returns the last manifest entry per input path (an empty dict if there is no manifest).
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line.
+                continue
+            entries[entry['input']] = entry
+    return entries
+
+def is_done(entry, input_path, output_path, recipe_id):
+    """
+    Whether a manifest entry shows input_path was already processed into output_path with this recipe.
+    """
+    if entry is None or entry.get('status') != 'ok' or entry.get('recipe') != recipe_id:
+        return False
+    if entry.get('output') != output_path or not os.path.exists(output_path):
+        return False
+    return entry.get('stamp') == _file_stamp(input_path)
+
+def process_one(input_path, output_path, recipe, blocksize=65536, mono=False, subtype=None):
+    """
+    Streams one file through the recipe's pipeline and returns its manifest entry.
+
+    The output is written to a temporary file and renamed when complete, so
+    an interrupted run never leaves a truncated output that looks finished.
+    """
+    entry = {'input': input_path, 'output': output_path, 'recipe': recipe_hash(recipe)}
+    if fft_engine.get_settings()['single_precision']:
+        entry['single_precision'] = True
+    t0 = time.perf_counter()
+    try:
+        entry['stamp'] = _file_stamp(input_path)
+        source = AudioSource(input_path)
+        pipeline = Pipeline.build(source.samplerate, **recipe)
+        out_fs = int(round(pipeline.out_fs))
+        channels = 1 if mono else source.channels
+
+        stats = {'in_energy': 0.0, 'in_peak': 0.0, 'out_energy': 0.0, 'out_peak': 0.0}
+
+        def measure(prefix):
+            def update(block):
+                stats[prefix + '_energy'] += float(np.sum(block ** 2))
+                stats[prefix + '_peak'] = max(stats[prefix + '_peak'], float(np.max(np.abs(block), initial=0)))
+            return update
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        ext = os.path.splitext(output_path)[1]
+        partial = output_path + '.partial' + ext
+        stats['out_frames'] = pipeline.process_file(input_path, partial, blocksize, mono, subtype,
+                                                    on_input=measure('in'), on_output=measure('out'))
+        os.replace(partial, output_path)
+
+        elapsed = time.perf_counter() - t0
+        n_in = max(1, source.frames * channels)
+        n_out = max(1, stats['out_frames'] * channels)
+        entry.update({
+            'status': 'ok',
+            'samplerate': source.samplerate,
+            'out_samplerate': out_fs,
+            'channels': channels,
+            'frames': source.frames,
+            'out_frames': stats['out_frames'],
+            'duration_s': source.duration,
+            'time_s': elapsed,
+            'realtime_factor': source.duration / elapsed if elapsed > 0 else float('inf'),
+            'in_rms': float(np.sqrt(stats['in_energy'] / n_in)),
+            'out_rms': float(np.sqrt(stats['out_energy'] / n_out)),
+            'in_peak': stats['in_peak'],
+            'out_peak': stats['out_peak'],
+        })
+    except Exception as exc:
+        entry.update({'status': 'error', 'error': f"{type(exc).__name__}: {exc}",
+                      'time_s': time.perf_counter() - t0})
+    return entry
+
+def _init_worker(single_precision=False):
+    # Parallelism comes from the pool; one FFT thread per process avoids oversubscription.
+    fft_engine.configure(workers=1, single_precision=single_precision)
+
+def run_batch(inputs, output_dir, recipe, workers=None, blocksize=65536, mono=False, subtype=None,
+              output_format=None, resume=False, manifest_path=None, progress=None):
+    """
+    Processes every input file with one recipe.
+
+    Args:
+        inputs (list): Directories and/or glob patterns.
+        output_dir (str): Outputs mirror the input layout under this directory.
+        recipe (dict): Keyword arguments for Pipeline.build (see RECIPE_DEFAULTS).
+        workers (int): Processes to use (None for all cores; 1 runs in-process).
+        blocksize (int): Frames read per block.
+        mono (bool): Mix each file down to one channel.
+        subtype (str): soundfile subtype of the outputs (None for the format default).
+        output_format (str): Output extension such as 'flac' (None keeps the input's).
+        resume (bool): Skip files the manifest shows as already done with this recipe.
+        manifest_path (str): Manifest location (default output_dir/manifest.jsonl).
+        progress (callable): Called with each finished entry.
+
+    Returns:
+        list: Manifest entries of the files processed in this run.
+    """
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    recipe_id = recipe_hash(recipe)
+    done = load_manifest(manifest_path) if resume else {}
+
+    out_root = os.path.join(os.path.abspath(output_dir), '')
+    jobs = []
+    sources = {}
+    for path, rel in find_inputs(inputs):
+        if path.startswith(out_root):
+            # Never pick up our own outputs when output_dir is inside an input directory.
+            continue
+        if output_format:
+            rel = os.path.splitext(rel)[0] + '.' + output_format.lstrip('.')
+        out = os.path.abspath(os.path.join(output_dir, rel))
+        if out in sources:
+            raise ValueError(f"{sources[out]} and {path} would both be written to {out}.")
+        sources[out] = path
+        if resume and is_done(done.get(path), path, out, recipe_id):
+            continue
+        jobs.append((path, out))
+
+    results = []
+    with open(manifest_path, 'a') as manifest:
+        def record(entry):
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            results.append(entry)
+            if progress:
+                progress(entry)
+
+        if workers == 1 or len(jobs) <= 1:
+            for path, out in jobs:
+                record(process_one(path, out, recipe, blocksize, mono, subtype))
+        else:
+            # Workers use the precision of this process, however they are started.
+            initargs = (fft_engine.get_settings()['single_precision'],)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+                futures = [pool.submit(process_one, path, out, recipe, blocksize, mono, subtype)
+                           for path, out in jobs]
+                for future in as_completed(futures):
+                    record(future.result())
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='Directories and/or glob patterns of audio files.')
+    parser.add_argument('-o', '--output-dir', required=True)
+    parser.add_argument('--recipe', help='JSON file with Pipeline.build arguments (flags below override it).')
+    parser.add_argument('--resample', type=int, dest='new_fs', help='Target sampling rate in Hz.')
+    parser.add_argument('--bits', type=int, dest='n_bits', help='Quantize to this many bits.')
+    parser.add_argument('--full-scale', type=float, help='Quantizer full scale (default 1.0).')
+    parser.add_argument('--lowpass', type=float, dest='cutoff', help='Low-pass cutoff in Hz.')
+    parser.add_argument('--order', type=int, help='Low-pass filter order (default 5).')
+    parser.add_argument('--fir', action='store_const', const='fir', dest='lowpass',
+                        help='Use a linear-phase FIR low-pass instead of the Butterworth filter.')
+    parser.add_argument('--denoise', choices=['subtraction', 'wiener'])
+    parser.add_argument('--noise-duration', type=float, dest='noise_estimation_duration',
+                        help='Seconds of leading noise used by the denoiser (default 0.5).')
+    parser.add_argument('--quality', choices=['low', 'medium', 'high'], help='Resampling filter quality.')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores).')
+    parser.add_argument('--blocksize', type=int, default=65536, help='Frames per block.')
+    parser.add_argument('--mono', action='store_true', help='Mix each file down to mono.')
+    parser.add_argument('--format', dest='output_format', help="Output format extension, e.g. 'flac'.")
+    parser.add_argument('--subtype', help="Output subtype, e.g. 'PCM_16' or 'FLOAT'.")
+    parser.add_argument('--manifest', help='Manifest path (default OUTPUT_DIR/manifest.jsonl).')
+    parser.add_argument('--resume', action='store_true', help='Skip files already processed with this recipe.')
+    parser.add_argument('--single-precision', action='store_true',
+                        help='Process in float32 (faster, about 1e-6 relative error).')
+    args = parser.parse_args(argv)
+    if args.single_precision:
+        fft_engine.configure(single_precision=True)
+
+    recipe = {}
+    if args.recipe:
+        with open(args.recipe) as f:
+            recipe = json.load(f)
+    for key in RECIPE_DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            recipe[key] = value
+    unknown = set(recipe) - set(RECIPE_DEFAULTS)
+    if unknown:
+        parser.error(f"Unknown recipe keys: {sorted(unknown)}")
+
+    counts = {'ok': 0, 'error': 0}
+
+    def progress(entry):
+        counts[entry['status']] += 1
+        if entry['status'] == 'ok':
+            print(f"ok     {entry['input']} ({entry['duration_s']:.1f} s in {entry['time_s']:.2f} s)")
+        else:
+            print(f"error  {entry['input']}: {entry['error']}", file=sys.stderr)
+
+    try:
+        run_batch(args.inputs, args.output_dir, recipe, workers=args.workers, blocksize=args.blocksize,
+                  mono=args.mono, subtype=args.subtype, output_format=args.output_format,
+                  resume=args.resume, manifest_path=args.manifest, progress=progress)
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(f"{counts['ok']} processed, {counts['error']} failed.")
+    return 1 if counts['error'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
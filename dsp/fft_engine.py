@@ -0,0 +1,168 @@
+import os
+from collections import deque, namedtuple
+import numpy as np
+import scipy.fft
+
+# One entry per transform: what was asked for and what was actually run.
+FFTPlan = namedtuple('FFTPlan', ['kind', 'n_input', 'n_fft', 'dtype', 'workers', 'is_fast'])
+
+def _available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+_settings = {
+    'workers': _available_cores(),
+    # DSP_SINGLE_PRECISION=1 in the environment starts the package in float32 mode.
+    'single_precision': os.environ.get('DSP_SINGLE_PRECISION', '0') not in ('', '0'),
+}
+_plans = deque(maxlen=64)
+
+def configure(workers=None, single_precision=None):
+    """
+    Changes the settings used by every transform in the dsp package.
+
+    Args:
+        workers (int): Threads per transform (None leaves it unchanged, -1
+            uses all cores available to the process, which is the default).
+        single_precision (bool): Keep signals, filter states, spectra and
+            spectrograms in float32/complex64 throughout the package (see
+            real_dtype); transforms run in single precision.
+    """
+    if workers is not None:
+        _settings['workers'] = _available_cores() if workers == -1 else max(1, int(workers))
+    if single_precision is not None:
+        _settings['single_precision'] = bool(single_precision)
+
+def get_settings():
+    """
+    Returns a copy of the current settings.
+    """
+    return dict(_settings)
+
+def real_dtype():
+    """
+    Float type of signals and spectra under the current precision setting.
+    """
+    return np.float32 if _settings['single_precision'] else np.float64
+
+def as_real(x):
+    """
+    Returns x as an array of real_dtype(), without a copy if it already is one.
+    """
+    return np.asarray(x, dtype=real_dtype())
+
+def largest_prime_factor(n):
+    """
+    Returns the largest prime factor of n (1 for n <= 1).
+    """
+    n = int(n)
+    largest = 1
+    p = 2
+    while p * p <= n:
+        while n % p == 0:
+            largest, n = p, n // p
+        p += 1 if p == 2 else 2
+    return max(largest, n) if n > 1 else largest
+
+def fast_size(n, real=True):
+    """
+    Smallest transform size >= n that scipy.fft handles efficiently.
+    """
+    return scipy.fft.next_fast_len(int(n), real=real)
+
+def describe_size(n, real=True):
+    """
+    Reports whether a transform of length n hits a fast or a slow path.
+
+    Returns:
+        dict: n, fast_n (next fast size), is_fast, largest_prime_factor.
+    """
+    fast_n = fast_size(n, real)
+    return {
+        'n': int(n),
+        'fast_n': fast_n,
+        'is_fast': fast_n == n,
+        'largest_prime_factor': largest_prime_factor(n),
+    }
+
+def recent_plans():
+    """
+    Returns the most recent transforms run through this module, oldest first.
+    """
+    return list(_plans)
+
+def _prepare(x, complex_input=False):
+    x = np.asarray(x)
+    if _settings['single_precision']:
+        return x.astype(np.complex64 if complex_input or np.iscomplexobj(x) else np.float32, copy=False)
+    return x
+
+def _record(kind, n_input, n_fft, x, real):
+    _plans.append(FFTPlan(kind, int(n_input), int(n_fft), str(x.dtype), _settings['workers'],
+                          fast_size(n_fft, real) == n_fft))
+
+def rfft(x, n=None, axis=-1, fast=False):
+    """
+    Real-input FFT along an axis.
+
+    Args:
+        x (np.array): Real input.
+        n (int): Transform length (input is cropped or zero-padded).
+        axis (int): Axis to transform.
+        fast (bool): Zero-pad further, to the next fast size.
+
+    Returns:
+        np.array: Positive-frequency spectrum, length n_fft // 2 + 1 along axis.
+    """
+    x = _prepare(x)
+    n_input = x.shape[axis]
+    n_fft = n_input if n is None else n
+    if fast:
+        n_fft = fast_size(n_fft)
+    _record('rfft', n_input, n_fft, x, True)
+    return scipy.fft.rfft(x, n=n_fft, axis=axis, workers=_settings['workers'])
+
+def irfft(X, n, axis=-1, crop=None):
+    """
+    Inverse of rfft.
+
+    Args:
+        X (np.array): Positive-frequency spectrum.
+        n (int): Transform length used by the forward transform.
+        axis (int): Axis to transform.
+        crop (int): Keep only the first `crop` output samples along axis.
+
+    Returns:
+        np.array: Real signal.
+    """
+    X = _prepare(X, complex_input=True)
+    _record('irfft', n, n, X, True)
+    y = scipy.fft.irfft(X, n=n, axis=axis, workers=_settings['workers'])
+    if crop is not None:
+        y = np.moveaxis(np.moveaxis(y, axis, 0)[:crop], 0, axis)
+    return y
+
+def fft(x, n=None, axis=-1, fast=False):
+    """
+    Complex FFT along an axis (see rfft for the arguments).
+    """
+    x = _prepare(x, complex_input=True)
+    n_input = x.shape[axis]
+    n_fft = n_input if n is None else n
+    if fast:
+        n_fft = fast_size(n_fft, real=False)
+    _record('fft', n_input, n_fft, x, False)
+    return scipy.fft.fft(x, n=n_fft, axis=axis, workers=_settings['workers'])
+
+def ifft(X, n=None, axis=-1, crop=None):
+    """
+    Inverse complex FFT (see irfft for the arguments).
+    """
+    X = _prepare(X, complex_input=True)
+    n_fft = X.shape[axis] if n is None else n
+    _record('ifft', n_fft, n_fft, X, False)
+    y = scipy.fft.ifft(X, n=n_fft, axis=axis, workers=_settings['workers'])
+    if crop is not None:
+        y = np.moveaxis(np.moveaxis(y, axis, 0)[:crop], 0, axis)
+    return y
@@ -1,32 +1,172 @@
 import numpy as np
-from scipy.fft import rfft, rfftfreq
+from functools import lru_cache
+from scipy.fft import rfftfreq
+from dsp.fft_engine import rfft, fast_size, real_dtype, as_real
+from dsp.stft import iter_blocks
+from dsp.profiler import profiled
 
-def compute_fft(signal, fs, window_type='None', scale='Linear'):
+@lru_cache(maxsize=32)
+def _cached_window(window_type, N, dtype=np.float64):
+    if window_type == 'Hann':
+        window = np.hanning(N)
+    elif window_type == 'Hamming':
+        window = np.hamming(N)
+    else:
+        return None
+    window = window.astype(dtype, copy=False)
+    window.setflags(write=False)
+    return window
+
+@lru_cache(maxsize=32)
+def _cached_freqs(n_fft, fs):
+    freqs = rfftfreq(n_fft, 1/fs)
+    freqs.setflags(write=False)
+    return freqs
+
+def _window(window_type, N, ndim=1):
+    window = _cached_window(window_type, N, real_dtype())
+    if window is None:
+        return None
+    # Shaped to broadcast along axis 0 of a (samples, channels) array.
+    return window.reshape((N,) + (1,) * (ndim - 1))
+
+class WelchAccumulator:
+    """
+    Incremental Welch (averaged periodogram) magnitude spectrum.
+    
+    Chunks of any size are fed through update(); overlapping segments are
+    transformed as soon as they are complete and only their running power sum
+    is kept, so the full signal never has to be in memory. Chunks may be
+    (samples, channels) arrays, in which case every channel is averaged
+    independently in the same vectorized transform.
+    """
+    
+    def __init__(self, fs, window_type='Hann', nperseg=4096, noverlap=None):
+        """
+        Args:
+            fs (int): Sampling rate.
+            window_type (str): Window function ('None', 'Hann', 'Hamming').
+            nperseg (int): Samples per segment.
+            noverlap (int): Overlap between segments (default nperseg // 2).
+        """
+        if noverlap is None:
+            noverlap = nperseg // 2
+        if not 0 <= noverlap < nperseg:
+            raise ValueError("noverlap must be in [0, nperseg).")
+        self.fs = fs
+        self.window_type = window_type
+        self.nperseg = nperseg
+        self.hop = nperseg - noverlap
+        self.window = _window(window_type, nperseg)
+        self.power_sum = 0
+        self.n_segments = 0
+        self._buffer = None
+        
+    def update(self, chunk):
+        """
+        Adds the next block of the signal.
+        """
+        chunk = as_real(chunk)
+        if self._buffer is None:
+            self._buffer = np.zeros((0,) + chunk.shape[1:], dtype=chunk.dtype)
+        self._buffer = np.concatenate((self._buffer, chunk))
+        n = (len(self._buffer) - self.nperseg) // self.hop + 1
+        if n <= 0:
+            return
+        # Segments have shape (n, ..., nperseg); the transform runs on the last axis.
+        segments = np.lib.stride_tricks.sliding_window_view(self._buffer, self.nperseg, axis=0)[::self.hop][:n]
+        if self.window is not None:
+            segments = segments * self.window.ravel()
+        self.power_sum = self.power_sum + np.sum(np.abs(rfft(segments, axis=-1)) ** 2, axis=0)
+        self.n_segments += n
+        self._buffer = self._buffer[n * self.hop:]
+        
+    def result(self, scale='Linear'):
+        """
+        Returns the averaged spectrum of everything fed so far.
+        
+        A signal shorter than one segment is analysed as a single zero-padded segment.
+        
+        Returns:
+            np.array: Frequency axis (positive half).
+            np.array: Magnitude spectrum (positive half), normalised like compute_fft;
+                shape (bins, channels) for multichannel input.
+            None: Phase is not defined for an averaged spectrum.
+        """
+        power_sum, n_segments = self.power_sum, self.n_segments
+        if n_segments == 0:
+            buffer = self._buffer if self._buffer is not None else np.zeros(0, dtype=real_dtype())
+            pad = [(0, self.nperseg - len(buffer))] + [(0, 0)] * (buffer.ndim - 1)
+            segment = np.pad(buffer, pad)
+            if self.window is not None:
+                segment = segment * _window(self.window_type, self.nperseg, segment.ndim)
+            power_sum = np.moveaxis(np.abs(rfft(segment, axis=0)) ** 2, 0, -1)
+            n_segments = 1
+            
+        freqs = _cached_freqs(self.nperseg, self.fs)
+        # Accumulated as (..., bins); returned with frequency on axis 0.
+        magnitude = np.moveaxis(np.sqrt(power_sum / n_segments) / self.nperseg, -1, 0)
+        
+        if scale == 'Log':
+            magnitude = 20 * np.log10(magnitude + 1e-10)
+            
+        return freqs, magnitude, None
+
+@profiled()
+def compute_fft(signal, fs, window_type='None', scale='Linear', method='fft', nperseg=4096, noverlap=None,
+                fast_len=False):
     """
     Computes the FFT of the signal.
     
+    A (samples, channels) array is transformed along axis 0 for all channels
+    in one call, and the spectra come back as (bins, channels).
+    
     Args:
-        signal (np.array): Input signal.
+        signal (np.array or iterable): Input signal; with method='welch' this may
+            also be an iterable of consecutive chunks.
         fs (int): Sampling rate.
         window_type (str): Window function ('None', 'Hann', 'Hamming').
         scale (str): Magnitude scale ('Linear', 'Log').
+        method (str): 'fft' for one transform of the whole signal, 'welch' for
+            an averaged spectrum of overlapping segments.
+        nperseg (int): Welch segment length.
+        noverlap (int): Welch segment overlap (default nperseg // 2).
+        fast_len (bool): Zero-pad the single FFT to the next fast transform size,
+            so awkward (e.g. prime) lengths don't hit a slow path. Off by default
+            because the spectrum is then sampled on a different, slightly finer
+            frequency grid (more bins, tones between bins).
         
     Returns:
         np.array: Frequency axis (positive half).
         np.array: Magnitude spectrum (positive half).
-        np.array: Phase spectrum (positive half).
+        np.array: Phase spectrum (positive half), or None for method='welch'.
     """
+    if method == 'welch':
+        if isinstance(signal, np.ndarray):
+            nperseg = max(1, min(nperseg, len(signal)))
+            if noverlap is not None:
+                noverlap = min(noverlap, nperseg - 1)
+            chunks = iter_blocks(signal, 64 * nperseg)
+        else:
+            chunks = signal
+        accumulator = WelchAccumulator(fs, window_type, nperseg, noverlap)
+        for chunk in chunks:
+            accumulator.update(chunk)
+        return accumulator.result(scale)
+    elif method != 'fft':
+        raise ValueError(f"Unknown spectrum method '{method}'. Use 'fft' or 'welch'.")
+    
+    signal = as_real(signal)
     N = len(signal)
     
-    if window_type == 'Hann':
-        window = np.hanning(N)
-        signal = signal * window
-    elif window_type == 'Hamming':
-        window = np.hamming(N)
+    window = _window(window_type, N, np.ndim(signal))
+    if window is not None:
         signal = signal * window
         
-    yf = rfft(signal)
-    xf = rfftfreq(N, 1/fs)
+    n_fft = fast_size(N) if fast_len and N > 0 else N
+        
+    yf = rfft(signal, n=n_fft, axis=0)
+    xf = _cached_freqs(n_fft, fs)
     
     freqs = xf
     
@@ -40,3 +180,65 @@ def compute_fft(signal, fs, window_type='None', scale='Linear'):
     phase = np.angle(yf)
     
     return freqs, magnitude, phase
+
+def _batches(frames, batch_size):
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield np.asarray(batch)
+            batch = []
+    if batch:
+        yield np.asarray(batch)
+
+@profiled()
+def compute_fft_batch(frames, fs, window_type='None', scale='Linear', fast_len=False, batch_size=256):
+    """
+    Computes the FFT of many equal-length frames in vectorized transforms.
+    
+    Each frame is treated exactly as compute_fft treats a 1-D signal; the
+    window and frequency axis are built once per (N, type) and cached.
+    
+    Args:
+        frames (np.array or iterable): 2-D array of shape (n_frames, N), or an
+            iterable of length-N frames (grouped into batch_size transforms).
+        fs (int): Sampling rate.
+        window_type (str): Window function ('None', 'Hann', 'Hamming').
+        scale (str): Magnitude scale ('Linear', 'Log').
+        fast_len (bool): Zero-pad each frame to the next fast transform size (see compute_fft).
+        batch_size (int): Frames per transform when frames is an iterable.
+        
+    Returns:
+        np.array: Frequency axis (positive half).
+        np.array: Magnitude spectra, shape (n_frames, bins).
+        np.array: Phase spectra, shape (n_frames, bins).
+    """
+    batches = [np.asarray(frames)] if isinstance(frames, np.ndarray) else _batches(frames, batch_size)
+    
+    magnitudes, phases = [], []
+    N = None
+    for batch in batches:
+        if batch.ndim != 2 or (N is not None and batch.shape[1] != N):
+            raise ValueError("Frames must all have the same length.")
+        N = batch.shape[1]
+        n_fft = fast_size(N) if fast_len else N
+        
+        batch = as_real(batch)
+        window = _cached_window(window_type, N, batch.dtype.type)
+        if window is not None:
+            batch = batch * window
+            
+        yf = rfft(batch, n=n_fft, axis=-1)
+        magnitudes.append(np.abs(yf) / N)
+        phases.append(np.angle(yf))
+        
+    if N is None:
+        raise ValueError("No frames given.")
+        
+    magnitude = np.concatenate(magnitudes) if len(magnitudes) > 1 else magnitudes[0]
+    phase = np.concatenate(phases) if len(phases) > 1 else phases[0]
+    
+    if scale == 'Log':
+        magnitude = 20 * np.log10(magnitude + 1e-10)
+        
+    return _cached_freqs(n_fft, fs), magnitude, phase
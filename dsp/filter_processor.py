@@ -1,92 +1,330 @@
 import numpy as np
-from scipy.signal import butter, lfilter
+from functools import lru_cache
+from scipy.signal import butter, sosfilt, sosfilt_zi
+from dsp.stft import StreamingSTFT, stft, iter_blocks
+from dsp.fft_engine import real_dtype, as_real
+from dsp.profiler import profiled
 
-def apply_lowpass(signal, fs, cutoff, order=5):
+# Maximum number of distinct filter designs kept in memory.
+FILTER_CACHE_SIZE = 64
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def _design_butter(btype, order, normal_cutoff, fs, output):
+    coeffs = butter(order, normal_cutoff, btype=btype, analog=False, output=output)
+    if output == 'sos':
+        coeffs = (coeffs,)
+    for c in coeffs:
+        c.setflags(write=False)
+    return coeffs[0] if output == 'sos' else coeffs
+
+@profiled()
+def design_filter(btype, order, cutoff, fs, output='sos'):
     """
-    Applies a low-pass Butterworth filter.
+    Designs a Butterworth filter, reusing a cached design when possible.
+    
+    Designs are memoized on (type, order, normalized cutoff, fs, output form)
+    in a bounded LRU cache shared by every function in this module. The
+    returned arrays are read-only because they are shared between callers.
     
     Args:
-        signal (np.array): Input signal.
-        fs (int): Sampling rate.
-        cutoff (float): Cutoff frequency in Hz.
+        btype (str): Filter type ('low', 'high', 'bandpass', 'bandstop').
         order (int): Filter order.
+        cutoff (float or tuple): Cutoff frequency (or band edges) in Hz.
+        fs (int): Sampling rate.
+        output (str): 'sos' for second-order sections or 'ba' for (b, a).
         
     Returns:
-        np.array: Filtered signal.
+        np.array or tuple: Second-order sections, or (b, a) coefficients.
     """
     nyquist = 0.5 * fs
-    normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    y = lfilter(b, a, signal)
-    return y
+    normal_cutoff = tuple(float(c) / nyquist for c in np.atleast_1d(cutoff))
+    if len(normal_cutoff) == 1:
+        normal_cutoff = normal_cutoff[0]
+    return _design_butter(btype, int(order), normal_cutoff, fs, output)
 
-def apply_spectral_subtraction(signal, fs, noise_estimation_duration=0.5):
+def filter_cache_info():
     """
-    Applies spectral subtraction for noise reduction.
-    Assumes the first 'noise_estimation_duration' seconds are noise.
+    Returns hit/miss statistics of the filter-design cache.
+    
+    Returns:
+        CacheInfo: Named tuple with hits, misses, maxsize and currsize.
+    """
+    return _design_butter.cache_info()
+
+def clear_filter_cache():
+    """
+    Empties the filter-design cache and resets its counters.
+    """
+    _design_butter.cache_clear()
+
+def design_lowpass(fs, cutoff, order=5):
+    """
+    Designs a low-pass Butterworth filter as second-order sections.
     
     Args:
-        signal (np.array): Input signal.
         fs (int): Sampling rate.
-        noise_estimation_duration (float): Duration in seconds to estimate noise profile.
+        cutoff (float): Cutoff frequency in Hz.
+        order (int): Filter order.
         
     Returns:
-        np.array: Denoised signal.
+        np.array: Second-order sections, shape (n_sections, 6).
     """
+    return design_filter('low', order, cutoff, fs, output='sos')
+
+class StreamingFilter:
+    """
+    IIR filter in second-order sections that carries its state between blocks.
     
-    noise_samples = int(noise_estimation_duration * fs)
-    if noise_samples >= len(signal):
-        noise_samples = len(signal) // 10 # Fallback
-        
-    noise_segment = signal[:noise_samples]
-    
-    N = len(signal)
-    noise_fft = np.fft.fft(noise_segment, n=N)
-    noise_mag = np.abs(noise_fft)
+    Feeding a signal through process() chunk by chunk gives exactly the same
+    samples as one sosfilt call on the concatenated input, so arbitrarily long
+    recordings can be filtered in constant memory. Blocks may be
+    (samples, channels) arrays; all channels are filtered along axis 0 in one
+    call with a separate state per channel. Coefficients, state and output
+    follow the package precision (fft_engine.real_dtype) of the first block.
+    """
     
-    signal_fft = np.fft.fft(signal)
-    signal_mag = np.abs(signal_fft)
-    signal_phase = np.angle(signal_fft)
+    def __init__(self, sos):
+        self.sos = np.array(sos, dtype=np.float64)
+        self.reset()
+        
+    @classmethod
+    def lowpass(cls, fs, cutoff, order=5):
+        """
+        Creates a streaming low-pass Butterworth filter.
+        """
+        return cls(design_lowpass(fs, cutoff, order))
     
-    clean_mag = np.maximum(signal_mag - noise_mag, 0)
+    def reset(self, initial_value=None):
+        """
+        Clears the filter state.
+        
+        Args:
+            initial_value (float or np.array): If given, starts in the steady
+                state for a constant input of this value (one per channel)
+                instead of from rest.
+        """
+        self.zi = None
+        self._sos = None
+        self._initial_value = initial_value
+        
+    def _initial_state(self, chunk):
+        shape = (self.sos.shape[0], 2) + chunk.shape[1:]
+        if self._initial_value is None:
+            return np.zeros(shape, dtype=chunk.dtype)
+        zi = sosfilt_zi(self.sos).reshape((self.sos.shape[0], 2) + (1,) * (chunk.ndim - 1))
+        return np.broadcast_to(zi * np.asarray(self._initial_value), shape).astype(chunk.dtype)
+            
+    def process(self, chunk):
+        """
+        Filters one block and updates the internal state.
+        
+        Args:
+            chunk (np.array): Next block of the input signal, shape (samples,)
+                or (samples, channels).
+            
+        Returns:
+            np.array: Filtered block, same shape as the input.
+        """
+        chunk = as_real(chunk)
+        if self.zi is None:
+            self._sos = self.sos.astype(chunk.dtype)
+            self.zi = self._initial_state(chunk)
+        y, self.zi = sosfilt(self._sos, chunk, axis=0, zi=self.zi)
+        return y
     
-    clean_fft = clean_mag * np.exp(1j * signal_phase)
-    clean_signal = np.fft.ifft(clean_fft)
+    def flush(self):
+        """
+        An IIR filter holds no samples back, so there is nothing left to return.
+        """
+        return np.zeros(0)
     
-    return np.real(clean_signal)
+    def filter_chunks(self, chunks):
+        """
+        Filters an iterable of blocks (e.g. a generator or soundfile.blocks reader).
+        
+        Args:
+            chunks (iterable): Blocks of the input signal, in order.
+            
+        Yields:
+            np.array: Filtered blocks.
+        """
+        for chunk in chunks:
+            yield self.process(chunk)
 
-def apply_wiener_filter(signal, fs):
+@profiled()
+def apply_lowpass(signal, fs, cutoff, order=5):
     """
-    Applies a Wiener filter.
+    Applies a low-pass Butterworth filter.
     
     Args:
-        signal (np.array): Input signal.
+        signal (np.array): Input signal, shape (samples,) or (samples, channels).
         fs (int): Sampling rate.
+        cutoff (float): Cutoff frequency in Hz.
+        order (int): Filter order.
         
     Returns:
         np.array: Filtered signal.
     """
+    return StreamingFilter.lowpass(fs, cutoff, order).process(signal)
+
+class SpectralDenoiser:
+    """
+    Streaming STFT denoiser (spectral subtraction or Wiener gain).
     
+    The noise profile is the mean per-bin magnitude of the STFT frames in the
+    first noise_estimation_duration seconds of the stream. Input is held back
+    until that much has arrived, after which every block is processed through
+    a StreamingSTFT with bounded per-frame memory.
+    """
     
-    
-    noise_samples = int(0.5 * fs) # Assume 0.5s noise
-    if noise_samples >= len(signal):
-        noise_samples = len(signal) // 10
+    def __init__(self, fs, method='subtraction', noise_estimation_duration=0.5,
+                 frame_size=2048, hop=512, window='hann'):
+        """
+        Args:
+            fs (int): Sampling rate.
+            method (str): 'subtraction' or 'wiener'.
+            noise_estimation_duration (float): Duration in seconds to estimate noise profile.
+            frame_size (int): STFT frame length in samples.
+            hop (int): STFT hop in samples; must divide frame_size.
+            window (str or tuple): STFT window.
+        """
+        if method not in ('subtraction', 'wiener'):
+            raise ValueError(f"Unknown denoising method '{method}'. Use 'subtraction' or 'wiener'.")
+        self.method = method
+        self.noise_samples = int(noise_estimation_duration * fs)
+        self.frame_size = frame_size
+        self.hop = hop
+        self.window = window
+        self._engine = StreamingSTFT(self._modify, frame_size, hop, window)
+        self.reset()
+        
+    def reset(self):
+        """
+        Forgets the noise profile and all buffered input.
+        """
+        self.noise_mag = None
+        self._engine.reset()
+        self._held = []
+        self._held_len = 0
+        
+    def estimate_noise(self, noise_segment):
+        """
+        Sets the noise profile from a noise-only segment.
+        """
+        spec = stft(noise_segment, self.frame_size, self.hop, self.window)
+        self.noise_mag = np.mean(np.abs(spec), axis=0)
         
-    noise_segment = signal[:noise_samples]
-    N = len(signal)
+    def _modify(self, spec):
+        mag = np.abs(spec)
+        if self.method == 'subtraction':
+            gain = np.maximum(mag - self.noise_mag, 0) / (mag + 1e-10)
+        else:
+            psd = mag ** 2
+            gain = np.maximum(psd - self.noise_mag ** 2, 0) / (psd + 1e-10)
+        return spec * gain
     
-    noise_fft = np.fft.fft(noise_segment, n=N)
-    noise_psd = np.abs(noise_fft) ** 2
+    def process(self, chunk):
+        """
+        Feeds one block of input.
+        
+        Args:
+            chunk (np.array): Next block of the input signal.
+            
+        Returns:
+            np.array: Denoised samples available so far (may be empty).
+        """
+        if self.noise_mag is not None:
+            return self._engine.process(chunk)
+        
+        self._held.append(as_real(chunk))
+        self._held_len += len(chunk)
+        if self._held_len < self.noise_samples:
+            return np.zeros(0)
+        return self._release(self.noise_samples)
     
-    signal_fft = np.fft.fft(signal)
-    signal_psd = np.abs(signal_fft) ** 2
+    def flush(self):
+        """
+        Processes all remaining input and returns the final samples.
+        """
+        parts = []
+        if self.noise_mag is None and self._held:
+            # Stream ended before a full noise segment arrived.
+            parts.append(self._release(min(self.noise_samples, self._held_len // 10)))
+        parts.append(self._engine.flush())
+        return np.concatenate([p for p in parts if len(p)] or [parts[-1]])
     
-    clean_psd_est = np.maximum(signal_psd - noise_psd, 0)
+    def filter_chunks(self, chunks):
+        """
+        Denoises an iterable of blocks.
+        
+        Yields:
+            np.array: Denoised blocks.
+        """
+        for chunk in chunks:
+            out = self.process(chunk)
+            if len(out):
+                yield out
+        out = self.flush()
+        if len(out):
+            yield out
+            
+    def _release(self, noise_samples):
+        held = np.concatenate(self._held)
+        self._held, self._held_len = [], 0
+        self.estimate_noise(held[:noise_samples])
+        return self._engine.process(held)
+
+def _denoise(signal, fs, method, noise_estimation_duration, frame_size, hop, window):
+    noise_samples = int(noise_estimation_duration * fs)
+    if noise_samples >= len(signal):
+        noise_samples = len(signal) // 10 # Fallback
+        
+    denoiser = SpectralDenoiser(fs, method, noise_estimation_duration, frame_size, hop, window)
+    denoiser.estimate_noise(signal[:noise_samples])
     
-    H = clean_psd_est / (signal_psd + 1e-10)
+    out = np.empty(np.shape(signal), dtype=real_dtype())
+    pos = 0
+    for block in denoiser.filter_chunks(iter_blocks(signal, 256 * hop)):
+        out[pos:pos + len(block)] = block
+        pos += len(block)
+    return out
+
+@profiled()
+def apply_spectral_subtraction(signal, fs, noise_estimation_duration=0.5,
+                               frame_size=2048, hop=512, window='hann'):
+    """
+    Applies spectral subtraction for noise reduction.
+    Assumes the first 'noise_estimation_duration' seconds are noise.
     
-    clean_fft = H * signal_fft
-    clean_signal = np.fft.ifft(clean_fft)
+    Args:
+        signal (np.array): Input signal.
+        fs (int): Sampling rate.
+        noise_estimation_duration (float): Duration in seconds to estimate noise profile.
+        frame_size (int): STFT frame length in samples.
+        hop (int): STFT hop in samples; must divide frame_size.
+        window (str or tuple): STFT window.
+        
+    Returns:
+        np.array: Denoised signal.
+    """
+    return _denoise(signal, fs, 'subtraction', noise_estimation_duration, frame_size, hop, window)
+
+@profiled()
+def apply_wiener_filter(signal, fs, noise_estimation_duration=0.5,
+                        frame_size=2048, hop=512, window='hann'):
+    """
+    Applies a Wiener filter.
+    Assumes the first 'noise_estimation_duration' seconds are noise.
     
-    return np.real(clean_signal)
+    Args:
+        signal (np.array): Input signal.
+        fs (int): Sampling rate.
+        noise_estimation_duration (float): Duration in seconds to estimate noise profile.
+        frame_size (int): STFT frame length in samples.
+        hop (int): STFT hop in samples; must divide frame_size.
+        window (str or tuple): STFT window.
+        
+    Returns:
+        np.array: Filtered signal.
+    """
+    return _denoise(signal, fs, 'wiener', noise_estimation_duration, frame_size, hop, window)
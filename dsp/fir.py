@@ -0,0 +1,314 @@
+import numpy as np
+from functools import lru_cache
+from scipy.signal import firwin, kaiserord
+from dsp import fft_engine
+from dsp.fft_engine import as_real
+from dsp.stft import iter_blocks
+from dsp.profiler import profiled
+
+# Maximum number of FIR designs and filter spectra kept in memory.
+FIR_CACHE_SIZE = 64
+
+# Cost model of fir_method, in nanoseconds, fitted to benchmarks/bench_fir.py
+# (float64, one core). Direct convolution: per tap and output sample, and per
+# output sample.
+DIRECT_NS_PER_TAP = 0.1
+DIRECT_NS_PER_SAMPLE = 8.0
+# Overlap-save: per output sample (copies), per nfft * log2(nfft) of every
+# segment (forward and inverse rFFT, spectral product), per segment, and a
+# fixed cost per block.
+FFT_NS_PER_SAMPLE = 15.0
+FFT_NS = 1.0
+FFT_SEGMENT_NS = 500.0
+FFT_CALL_NS = 40000.0
+
+# Output samples transformed per batch of segments (bounds the temporaries).
+BATCH_SAMPLES = 2**18
+
+@lru_cache(maxsize=FIR_CACHE_SIZE)
+def _design_fir(fs, cutoff, transition_hz, attenuation_db):
+    n_taps, beta = kaiserord(attenuation_db, transition_hz / (0.5 * fs))
+    n_taps |= 1  # odd length: linear phase with an integer delay
+    h = firwin(n_taps, cutoff, window=('kaiser', beta), fs=fs)
+    h.setflags(write=False)
+    return h
+
+def design_fir_lowpass(fs, cutoff, transition_hz=None, attenuation_db=80):
+    """
+    Designs a linear-phase low-pass FIR filter (Kaiser window), reusing a cached design.
+
+    Args:
+        fs (int): Sampling rate.
+        cutoff (float): Cutoff frequency in Hz (-6 dB point, the middle of the transition band).
+        transition_hz (float): Width of the transition band (default 10% of the cutoff).
+        attenuation_db (float): Stop-band attenuation.
+
+    Returns:
+        np.array: Taps (odd length, read-only).
+    """
+    if transition_hz is None:
+        transition_hz = 0.1 * cutoff
+    transition_hz = min(transition_hz, 2 * cutoff, fs - 2 * cutoff)
+    if transition_hz <= 0:
+        raise ValueError("cutoff must lie between 0 and fs / 2.")
+    return _design_fir(float(fs), float(cutoff), float(transition_hz), float(attenuation_db))
+
+@lru_cache(maxsize=4096)
+def _plan(n_taps, block_size):
+    # Cheapest power-of-two FFT size for block_size outputs, and its cost.
+    best = None
+    nfft = 1 << max(int(np.ceil(np.log2(max(n_taps, 2)))) + 1, 1)
+    while True:
+        step = nfft - n_taps + 1
+        cost = -(-block_size // step) * (FFT_NS * nfft * np.log2(nfft) + FFT_SEGMENT_NS)
+        if best is None or cost < best[1]:
+            best = (nfft, cost)
+        if step >= block_size:
+            return best
+        nfft *= 2
+
+def fft_size(n_taps, block_size):
+    """
+    FFT length used by overlap-save for a block of block_size samples.
+
+    The smallest per-output cost over power-of-two sizes: about 4-8 times
+    the filter length for long blocks, and one segment covering the whole
+    block for short ones.
+    """
+    return _plan(int(n_taps), int(block_size))[0]
+
+def fir_method(n_taps, block_size):
+    """
+    Chooses direct or FFT (overlap-save) convolution for one block.
+
+    Direct convolution time grows with n_taps per output; overlap-save
+    pays nfft * log2(nfft) per segment of nfft - n_taps + 1 outputs plus a
+    fixed cost per block, so short blocks favour direct convolution. The
+    constants above give these crossovers (measured ones from
+    benchmarks/bench_fir.py in brackets; near them both take about as long):
+
+    - whole signals and blocks of 16384 samples or more: FFT from 256 taps (128-256);
+    - 4096-sample blocks: FFT from 512 taps (512);
+    - 1024-sample blocks: FFT from 1024 taps (1024);
+    - 256-sample blocks and shorter: direct up to 4096 taps and beyond (4096).
+
+    Args:
+        n_taps (int): Filter length.
+        block_size (int): Output samples computed at once.
+
+    Returns:
+        str: 'direct' or 'fft'.
+    """
+    if n_taps <= 1 or block_size <= 0:
+        return 'direct'
+    fft_ns = _plan(int(n_taps), int(block_size))[1] + block_size * FFT_NS_PER_SAMPLE + FFT_CALL_NS
+    direct_ns = block_size * (DIRECT_NS_PER_TAP * n_taps + DIRECT_NS_PER_SAMPLE)
+    return 'fft' if fft_ns < direct_ns else 'direct'
+
+@lru_cache(maxsize=FIR_CACHE_SIZE)
+def _filter_spectrum(taps, nfft, dtype):
+    H = fft_engine.rfft(np.frombuffer(taps, dtype=np.float64).astype(dtype), nfft)
+    H.setflags(write=False)
+    return H
+
+def fir_cache_info():
+    """
+    Returns hit/miss statistics of the filter-spectrum cache.
+
+    Returns:
+        CacheInfo: Named tuple with hits, misses, maxsize and currsize.
+    """
+    return _filter_spectrum.cache_info()
+
+def clear_fir_cache():
+    """
+    Empties the FIR design and filter-spectrum caches.
+    """
+    _design_fir.cache_clear()
+    _filter_spectrum.cache_clear()
+
+class StreamingFIR:
+    """
+    FIR filter that carries its input history between blocks.
+
+    Every block is convolved either directly or by overlap-save FFT
+    convolution, whichever fir_method predicts is faster for the filter
+    length and block size; both share the same state (the last
+    n_taps - 1 input samples), so the output is that of one causal
+    convolution over the whole stream whatever the chunking. The spectra of
+    the taps are cached per FFT size and precision. Blocks may be
+    (samples, channels) arrays; data and output follow the package
+    precision (fft_engine.real_dtype).
+
+    With compensate_delay the (n_taps - 1) // 2 samples of group delay of a
+    linear-phase filter are removed: the first outputs are dropped and
+    flush() returns the tail, so the output lines up with the input.
+    """
+
+    def __init__(self, taps, method='auto', compensate_delay=False):
+        """
+        Args:
+            taps (np.array): Filter coefficients.
+            method (str): 'auto', 'direct' or 'fft'.
+            compensate_delay (bool): Align the output with the input (see above).
+        """
+        if method not in ('auto', 'direct', 'fft'):
+            raise ValueError(f"Unknown convolution method '{method}'. Use 'auto', 'direct' or 'fft'.")
+        self.taps = np.array(taps, dtype=np.float64).reshape(-1)
+        if len(self.taps) == 0:
+            raise ValueError("taps must not be empty.")
+        self.method = method
+        self.compensate_delay = compensate_delay
+        self._key = self.taps.tobytes()
+        self.reset()
+
+    @classmethod
+    def lowpass(cls, fs, cutoff, transition_hz=None, attenuation_db=80, method='auto'):
+        """
+        Creates a delay-compensated streaming linear-phase low-pass filter.
+        """
+        return cls(design_fir_lowpass(fs, cutoff, transition_hz, attenuation_db), method, compensate_delay=True)
+
+    @property
+    def delay(self):
+        """
+        Group delay in samples removed when compensate_delay is set.
+        """
+        return (len(self.taps) - 1) // 2
+
+    def reset(self):
+        """
+        Clears the input history.
+        """
+        self._history = None
+        self._skip = self.delay if self.compensate_delay else 0
+
+    def process(self, chunk):
+        """
+        Filters one block.
+
+        Args:
+            chunk (np.array): Next block of the input signal, shape (samples,)
+                or (samples, channels).
+
+        Returns:
+            np.array: Filtered block, as long as the input (shorter only at
+            the start of a delay-compensated stream).
+        """
+        chunk = as_real(chunk)
+        n_taps = len(self.taps)
+        if self._history is None:
+            self._h = self.taps.astype(chunk.dtype)
+            self._history = np.zeros((n_taps - 1,) + chunk.shape[1:], dtype=chunk.dtype)
+        if len(chunk) == 0:
+            return chunk.copy()
+        x = np.concatenate((self._history, chunk))
+        method = self.method if self.method != 'auto' else fir_method(n_taps, len(chunk))
+        y = self._direct(x) if method == 'direct' else self._overlap_save(x, len(chunk))
+        self._history = x[len(x) - (n_taps - 1):].copy()
+        if self._skip:
+            dropped = min(self._skip, len(y))
+            self._skip -= dropped
+            y = y[dropped:]
+        return y
+
+    def _direct(self, x):
+        if x.ndim == 1:
+            return np.convolve(x, self._h, 'valid')
+        return np.stack([np.convolve(x[:, c], self._h, 'valid') for c in range(x.shape[1])], axis=1)
+
+    def _overlap_save(self, x, n):
+        # Segment k covers x[k*step : k*step + nfft]; after circular convolution
+        # with the taps its last `step` samples are outputs k*step ... (k+1)*step - 1.
+        n_taps = len(self.taps)
+        nfft = fft_size(n_taps, n)
+        step = nfft - n_taps + 1
+        H = _filter_spectrum(self._key, nfft, self._h.dtype.name)
+        if x.ndim > 1:
+            H = H[:, None]
+        n_segments = -(-n // step)
+        if n_segments == 1:
+            # Short block: one transform, zero-padded by rfft.
+            spec = fft_engine.rfft(x, nfft, axis=0)
+            spec *= H
+            return fft_engine.irfft(spec, nfft, axis=0)[n_taps - 1:n_taps - 1 + n]
+        out = np.empty((n_segments * step,) + x.shape[1:], dtype=x.dtype)
+        x = np.concatenate((x, np.zeros((n_segments * step + n_taps - 1 - len(x),) + x.shape[1:], dtype=x.dtype)))
+        per_batch = max(1, BATCH_SAMPLES // step)
+        for first in range(0, n_segments, per_batch):
+            count = min(per_batch, n_segments - first)
+            span = x[first * step:(first + count) * step + n_taps - 1]
+            # (count, nfft, channels...) views, one per segment.
+            frames = np.lib.stride_tricks.sliding_window_view(span, nfft, axis=0)[::step]
+            frames = np.moveaxis(frames, -1, 1)
+            spec = fft_engine.rfft(frames, nfft, axis=1)
+            spec *= H
+            y = fft_engine.irfft(spec, nfft, axis=1)[:, n_taps - 1:]
+            out[first * step:(first + count) * step] = y.reshape((count * step,) + y.shape[2:])
+        return out[:n]
+
+    def flush(self):
+        """
+        Returns the delayed tail of a delay-compensated stream (empty otherwise).
+        """
+        if self._history is None or not self.compensate_delay:
+            return np.zeros(0)
+        # delay zeros push the last inputs out; any outputs still to be
+        # skipped come off the front, so the total length equals the input's.
+        return self.process(np.zeros((self.delay,) + self._history.shape[1:], dtype=self._history.dtype))
+
+    def filter_chunks(self, chunks):
+        """
+        Filters an iterable of blocks, flushing at the end.
+
+        Yields:
+            np.array: Filtered blocks.
+        """
+        for chunk in chunks:
+            out = self.process(chunk)
+            if len(out):
+                yield out
+        out = self.flush()
+        if len(out):
+            yield out
+
+@profiled()
+def apply_fir(signal, taps, method='auto', compensate_delay=False, block_size=2**20):
+    """
+    Filters a whole signal with an FIR filter.
+
+    Args:
+        signal (np.array): Input signal, shape (samples,) or (samples, channels).
+        taps (np.array): Filter coefficients.
+        method (str): 'auto', 'direct' or 'fft' (see fir_method).
+        compensate_delay (bool): Remove the (n_taps - 1) // 2 samples of delay.
+        block_size (int): Samples convolved at once.
+
+    Returns:
+        np.array: Filtered signal, same shape as the input.
+    """
+    signal = as_real(signal)
+    fir = StreamingFIR(taps, method, compensate_delay)
+    out = np.empty(signal.shape, dtype=signal.dtype)
+    pos = 0
+    for block in fir.filter_chunks(iter_blocks(signal, block_size)):
+        out[pos:pos + len(block)] = block
+        pos += len(block)
+    return out
+
+@profiled()
+def apply_fir_lowpass(signal, fs, cutoff, transition_hz=None, attenuation_db=80):
+    """
+    Applies a linear-phase low-pass FIR filter without delay.
+
+    Args:
+        signal (np.array): Input signal, shape (samples,) or (samples, channels).
+        fs (int): Sampling rate.
+        cutoff (float): Cutoff frequency in Hz.
+        transition_hz (float): Width of the transition band (default 10% of the cutoff).
+        attenuation_db (float): Stop-band attenuation.
+
+    Returns:
+        np.array: Filtered signal.
+    """
+    return apply_fir(signal, design_fir_lowpass(fs, cutoff, transition_hz, attenuation_db), compensate_delay=True)
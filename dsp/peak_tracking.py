@@ -0,0 +1,263 @@
+import numpy as np
+from dsp.stft import stft
+from dsp.profiler import profiled
+
+def pick_peaks(power, n_peaks=5, floor=0.0):
+    """
+    Strongest local maxima along the last axis, refined to sub-bin accuracy.
+
+    Only bins higher than both neighbours count as peaks, so the bins on the
+    skirt of one peak are never reported as separate peaks. The n_peaks
+    largest are picked for every row at once, by sorting just the maxima
+    above the floor when they are sparse and with n_peaks argmax passes
+    (linear in the number of bins) otherwise; each is then refined by fitting a parabola
+    through the peak bin and its neighbours in dB. Only those three bins
+    per peak are ever converted to dB.
+
+    Args:
+        power (np.array): Power spectra, shape (..., bins).
+        n_peaks (int): Peaks to return per spectrum.
+        floor (float): Maxima at or below this power are ignored.
+
+    Returns:
+        np.array: Fractional bin positions, shape (..., n_peaks), strongest
+            first; NaN where a spectrum has fewer peaks.
+        np.array: Interpolated peak levels in dB (NaN where there is no peak).
+    """
+    x = np.asarray(power)
+    shape = x.shape[:-1] + (n_peaks,)
+    if x.shape[-1] < 3 or n_peaks <= 0:
+        return np.full(shape, np.nan), np.full(shape, np.nan)
+    rows = x.reshape(-1, x.shape[-1])
+    left, mid, right = rows[:, :-2], rows[:, 1:-1], rows[:, 2:]
+    is_peak = (mid > left) & (mid >= right) & (mid > floor)
+
+    n_rows = len(rows)
+    candidates = np.count_nonzero(is_peak)
+    if candidates <= 8 * n_peaks * n_rows:
+        # Few maxima above the floor (the usual case): rank just those.
+        row, col = np.nonzero(is_peak)
+        order = np.lexsort((-mid[row, col], row))
+        row, col = row[order], col[order]
+        rank = np.arange(len(row)) - np.searchsorted(row, np.arange(n_rows))[row]
+        keep = rank < n_peaks
+        idx = np.zeros((n_rows, n_peaks), dtype=np.intp)
+        valid = np.zeros((n_rows, n_peaks), dtype=bool)
+        idx[row[keep], rank[keep]] = col[keep]
+        valid[row[keep], rank[keep]] = True
+    else:
+        # Dense maxima (e.g. a noise floor above the floor level): n_peaks
+        # vectorized argmax passes, strongest first. Unlike np.argpartition
+        # this stays fast with the many tied non-peak bins.
+        score = np.where(is_peak, mid, -1.0)
+        all_rows = np.arange(n_rows)
+        idx = np.empty((n_rows, n_peaks), dtype=np.intp)
+        valid = np.empty((n_rows, n_peaks), dtype=bool)
+        for i in range(n_peaks):
+            best = np.argmax(score, axis=-1)
+            idx[:, i] = best
+            valid[:, i] = score[all_rows, best] >= 0
+            score[all_rows, best] = -1.0
+
+    a, b, c = (10 * np.log10(np.take_along_axis(v, idx, axis=-1) + 1e-20) for v in (left, mid, right))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        curvature = a - 2 * b + c
+        delta = np.where(valid & (curvature < 0), 0.5 * (a - c) / curvature, 0.0)
+    level = np.where(valid, b - 0.25 * (a - c) * delta, np.nan)
+    position = np.where(valid, idx + 1 + delta, np.nan)
+    return position.reshape(shape), level.reshape(shape)
+
+class PeakTracks:
+    """
+    Linked spectral peaks as a compact table of points.
+
+    Point i belongs to track[i] and lies at (time[i], frequency[i],
+    magnitude_db[i]); points are ordered by time.
+    """
+
+    def __init__(self, track, time, frequency, magnitude_db):
+        self.track = track
+        self.time = time
+        self.frequency = frequency
+        self.magnitude_db = magnitude_db
+
+    def __len__(self):
+        return len(self.track)
+
+    @property
+    def n_tracks(self):
+        return len(np.unique(self.track))
+
+    def to_arrays(self):
+        """
+        The table as a tuple of arrays (for the analysis cache).
+        """
+        return self.track, self.time, self.frequency, self.magnitude_db
+
+    @classmethod
+    def from_arrays(cls, track, time, frequency, magnitude_db):
+        return cls(track, time, frequency, magnitude_db)
+
+    def summary(self):
+        """
+        One row per track, longest first.
+
+        Returns:
+            list: Dicts with track, start_s, end_s, duration_s, points,
+            mean_hz, min_hz, max_hz and peak_db.
+        """
+        if len(self) == 0:
+            return []
+        order = np.argsort(self.track, kind='stable')
+        ids, starts, counts = np.unique(self.track[order], return_index=True, return_counts=True)
+        time, freq, mag = self.time[order], self.frequency[order], self.magnitude_db[order]
+        first = time[starts]
+        last = time[starts + counts - 1]
+        rows = [{
+            'track': int(i),
+            'start_s': float(t0),
+            'end_s': float(t1),
+            'duration_s': float(t1 - t0),
+            'points': int(n),
+            'mean_hz': float(f_mean),
+            'min_hz': float(f_min),
+            'max_hz': float(f_max),
+            'peak_db': float(m_max),
+        } for i, t0, t1, n, f_mean, f_min, f_max, m_max in zip(
+            ids, first, last, counts,
+            np.add.reduceat(freq, starts) / counts,
+            np.minimum.reduceat(freq, starts),
+            np.maximum.reduceat(freq, starts),
+            np.maximum.reduceat(mag, starts))]
+        return sorted(rows, key=lambda r: (-r['duration_s'], r['start_s']))
+
+class PeakTracker:
+    """
+    Links per-frame peaks into tracks, frame by frame.
+
+    Each peak continues the active track closest in frequency (nearest pairs
+    first) if it is within max_jump_hz; unmatched peaks start new tracks.
+    A track stays active through up to max_gap frames without a peak.
+    Frames can be fed in chunks of any size, so a whole recording is linked
+    with only the active tracks and the finished points in memory.
+    """
+
+    def __init__(self, max_jump_hz=20.0, max_gap=2):
+        """
+        Args:
+            max_jump_hz (float): Largest frequency change between linked peaks.
+            max_gap (int): Frames a track may miss before it ends.
+        """
+        self.max_jump_hz = max_jump_hz
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self._active = []  # [track id, last frequency, last frame]
+        self._next_id = 0
+        self._parts = []
+
+    def update(self, frames, frequency, magnitude_db):
+        """
+        Links the peaks of consecutive frames.
+
+        Args:
+            frames (np.array): Frame indices, shape (n_frames,).
+            frequency (np.array): Peak frequencies, shape (n_frames, n_peaks), NaN for none.
+            magnitude_db (np.array): Peak levels, same shape.
+        """
+        track_ids = np.full(frequency.shape, -1, dtype=np.int64)
+        max_jump, max_gap = self.max_jump_hz, self.max_gap
+        active = self._active
+        for row, frame in enumerate(frames.tolist()):
+            peaks = [(j, f) for j, f in enumerate(frequency[row].tolist()) if f == f]
+            active = [a for a in active if frame - a[2] <= max_gap + 1]
+            pairs = sorted((abs(a[1] - f), ai, j)
+                           for ai, a in enumerate(active) for j, f in peaks if abs(a[1] - f) <= max_jump)
+            used_tracks, used_peaks = set(), set()
+            for _, ai, j in pairs:
+                if ai in used_tracks or j in used_peaks:
+                    continue
+                used_tracks.add(ai)
+                used_peaks.add(j)
+                track_ids[row, j] = active[ai][0]
+                active[ai][1] = frequency[row, j]
+                active[ai][2] = frame
+            for j, f in peaks:
+                if j not in used_peaks:
+                    track_ids[row, j] = self._next_id
+                    active.append([self._next_id, f, frame])
+                    self._next_id += 1
+        self._active = active
+
+        valid = track_ids >= 0
+        self._parts.append((np.broadcast_to(frames[:, None], frequency.shape)[valid],
+                            track_ids[valid], frequency[valid], magnitude_db[valid]))
+
+    def result(self, frame_times, min_frames=3):
+        """
+        Returns the tracks found so far.
+
+        Args:
+            frame_times (callable): Maps frame indices to times in seconds.
+            min_frames (int): Shorter tracks are dropped.
+
+        Returns:
+            PeakTracks: The linked points.
+        """
+        if self._parts:
+            frames, track, freq, mag = (np.concatenate(p) for p in zip(*self._parts))
+        else:
+            frames = track = np.zeros(0, dtype=np.int64)
+            freq = mag = np.zeros(0)
+        if len(track):
+            keep = np.bincount(track)[track] >= min_frames
+            frames, track, freq, mag = frames[keep], track[keep], freq[keep], mag[keep]
+        # Ids are handed out in order of appearance; renumber the survivors 0, 1, ...
+        track = np.unique(track, return_inverse=True)[1].reshape(-1)
+        return PeakTracks(track.astype(np.int64), frame_times(frames), freq, mag)
+
+@profiled()
+def track_peaks(signal, fs, frame_size=4096, hop=None, n_peaks=5, floor_db=-60.0, max_jump_hz=None,
+                max_gap=2, min_frames=3, chunk_frames=512):
+    """
+    Tracks the dominant frequencies of a signal over time.
+
+    The STFT is computed chunk_frames frames at a time; peaks of all frames
+    in a chunk are picked in one vectorized pick_peaks call and linked by a
+    PeakTracker, so memory stays bounded for recordings of any length.
+
+    Args:
+        signal (np.array): Input signal (1-D).
+        fs (int): Sampling rate.
+        frame_size (int): Samples per STFT frame (Hann window).
+        hop (int): Samples between frames (default frame_size // 2).
+        n_peaks (int): Peaks picked per frame.
+        floor_db (float): Peaks at or below this level (dB re. a full-scale
+            sine) are ignored.
+        max_jump_hz (float): Largest frequency change between linked peaks
+            (default two bins).
+        max_gap (int): Frames a track may miss before it ends.
+        min_frames (int): Tracks with fewer points are dropped.
+        chunk_frames (int): Frames transformed per chunk.
+
+    Returns:
+        PeakTracks: The tracks.
+    """
+    signal = np.asarray(signal)
+    hop = hop or frame_size // 2
+    if max_jump_hz is None:
+        max_jump_hz = 2 * fs / frame_size
+    # |X|^2 of a full-scale sinusoid, so levels read in dB relative to it.
+    full_scale = (np.sum(np.hanning(frame_size + 1)[:-1]) / 2) ** 2
+    floor = full_scale * 10 ** (floor_db / 10)
+    n_frames = max(1, (len(signal) - frame_size) // hop + 1)
+    tracker = PeakTracker(max_jump_hz, max_gap)
+    for first in range(0, n_frames, chunk_frames):
+        count = min(chunk_frames, n_frames - first)
+        start = first * hop
+        spectra = stft(signal[start:start + (count - 1) * hop + frame_size], frame_size, hop)
+        power = spectra.real ** 2 + spectra.imag ** 2
+        position, level = pick_peaks(power, n_peaks, floor)
+        tracker.update(np.arange(first, first + count), position * fs / frame_size, level - 10 * np.log10(full_scale))
+    return tracker.result(lambda frames: (frames * hop + frame_size / 2) / fs, min_frames)
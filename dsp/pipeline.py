@@ -0,0 +1,185 @@
+import numpy as np
+import soundfile as sf
+from dsp.audio_source import AudioSource
+from dsp.fft_engine import real_dtype
+from dsp.sampler import StreamingResampler, StreamingQuantizer, resample_ratio
+from dsp.filter_processor import StreamingFilter, SpectralDenoiser
+from dsp.fir import StreamingFIR
+from dsp.stft import iter_blocks
+from dsp.profiler import profiled
+
+class Pipeline:
+    """
+    Chain of streaming stages run block by block.
+
+    A stage is any object with process(chunk), flush() and reset(), where
+    process returns the output samples it has finalized so far (possibly
+    none) and flush returns the rest. StreamingResampler,
+    StreamingQuantizer, StreamingFilter, StreamingFIR and SpectralDenoiser all qualify.
+    Each stage keeps its own state, so the same pipeline runs offline over a
+    file or live over incoming blocks, and nothing longer than a stage's
+    internal block is ever materialized between stages.
+    """
+
+    def __init__(self, stages, fs=None, out_fs=None):
+        """
+        Args:
+            stages (list): Stages, applied in order.
+            fs (float): Expected input sampling rate; process_file refuses files
+                at another rate (None skips the check).
+            out_fs (float): Output sampling rate (defaults to fs).
+        """
+        self.stages = list(stages)
+        self.fs = fs
+        self.out_fs = fs if out_fs is None else out_fs
+
+    @classmethod
+    def build(cls, fs, new_fs=None, n_bits=None, full_scale=1.0, cutoff=None, order=5, lowpass='iir',
+              denoise=None, noise_estimation_duration=0.5, quality='medium', block_size=4096):
+        """
+        Builds the resample -> quantize -> low-pass -> denoise chain; stages
+        whose parameter is None are left out.
+
+        Args:
+            fs (int): Input sampling rate.
+            new_fs (int): Resample to this rate.
+            n_bits (int): Quantize to this many bits.
+            full_scale (float or np.array): Quantizer full scale (see StreamingQuantizer).
+            cutoff (float): Low-pass cutoff in Hz (at the resampled rate).
+            order (int): Low-pass filter order (IIR only).
+            lowpass (str): 'iir' (Butterworth) or 'fir' (linear-phase, delay-compensated StreamingFIR).
+            denoise (str): 'subtraction' or 'wiener'.
+            noise_estimation_duration (float): Seconds of leading noise for the denoiser.
+            quality (str): Resampling filter quality.
+            block_size (int): Resampler block size in input samples.
+
+        Returns:
+            Pipeline: The composed pipeline.
+        """
+        stages = []
+        rate = fs
+        if new_fs is not None and new_fs != fs:
+            up, down = resample_ratio(fs, new_fs)
+            stages.append(StreamingResampler(up, down, quality, block_size))
+            rate = fs * up / down
+        if n_bits is not None:
+            stages.append(StreamingQuantizer(n_bits, full_scale))
+        if cutoff is not None:
+            if lowpass == 'fir':
+                stages.append(StreamingFIR.lowpass(rate, cutoff))
+            elif lowpass == 'iir':
+                stages.append(StreamingFilter.lowpass(rate, cutoff, order))
+            else:
+                raise ValueError(f"Unknown low-pass design '{lowpass}'. Use 'iir' or 'fir'.")
+        if denoise is not None:
+            stages.append(SpectralDenoiser(rate, denoise, noise_estimation_duration))
+        return cls(stages, fs, rate)
+
+    def reset(self):
+        """
+        Resets every stage, ready for a new stream.
+        """
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, chunk):
+        """
+        Pushes one block through all stages.
+
+        Returns:
+            np.array: Output samples finalized by this block (may be empty).
+        """
+        for stage in self.stages:
+            chunk = stage.process(chunk)
+            if len(chunk) == 0:
+                break
+        return chunk
+
+    def flush(self):
+        """
+        Drains every stage in order and returns the remaining output.
+        """
+        carry = None
+        for stage in self.stages:
+            parts = []
+            if carry is not None and len(carry):
+                parts.append(stage.process(carry))
+            parts.append(stage.flush())
+            parts = [p for p in parts if len(p)]
+            carry = np.concatenate(parts) if parts else None
+        return carry if carry is not None else np.zeros(0, dtype=real_dtype())
+
+    def run(self, chunks):
+        """
+        Runs the pipeline over an iterable of blocks, flushing at the end.
+
+        Yields:
+            np.array: Non-empty output blocks.
+        """
+        for chunk in chunks:
+            out = self.process(chunk)
+            if len(out):
+                yield out
+        out = self.flush()
+        if len(out):
+            yield out
+
+    @profiled()
+    def apply(self, signal, block_size=65536):
+        """
+        Runs a fresh pass over a whole array and returns the whole output.
+        """
+        self.reset()
+        blocks = list(self.run(iter_blocks(np.asarray(signal), block_size)))
+        if not blocks:
+            return np.zeros((0,) + np.shape(signal)[1:], dtype=real_dtype())
+        return np.concatenate(blocks)
+
+    @profiled()
+    def process_file(self, input_path, output_path, blocksize=65536, mono=False, subtype=None,
+                     on_input=None, on_output=None):
+        """
+        Streams an audio file through the pipeline into another file.
+
+        Only one block per stage is in memory at a time, so files of any
+        length can be processed.
+
+        Args:
+            input_path (str): Audio file to read.
+            output_path (str): File to write (format from the extension).
+            blocksize (int): Frames read per block.
+            mono (bool): Mix the channels down before processing.
+            subtype (str): soundfile subtype of the output (None for the format default).
+            on_input (callable): Called with every block read.
+            on_output (callable): Called with every block written.
+
+        Returns:
+            int: Number of frames written.
+
+        Raises:
+            ValueError: If the file's sampling rate is not the one the pipeline was built for.
+        """
+        source = AudioSource(input_path)
+        if self.fs is not None and source.samplerate != self.fs:
+            raise ValueError(f"{input_path} is sampled at {source.samplerate} Hz, "
+                             f"but the pipeline was built for {self.fs} Hz.")
+        self.reset()
+        channels = 1 if mono else source.channels
+        out_fs = int(round(self.out_fs if self.out_fs is not None else source.samplerate))
+        written = 0
+        blocks = source.blocks(blocksize, mono=mono)
+        if on_input is not None:
+            blocks = self._tap(blocks, on_input)
+        with sf.SoundFile(output_path, 'w', samplerate=out_fs, channels=channels, subtype=subtype) as out:
+            for block in self.run(blocks):
+                out.write(block)
+                written += len(block)
+                if on_output is not None:
+                    on_output(block)
+        return written
+
+    @staticmethod
+    def _tap(blocks, callback):
+        for block in blocks:
+            callback(block)
+            yield block
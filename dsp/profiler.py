@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from functools import wraps
+
+# Recording state is per thread, so concurrent reruns never pick up each
+# other's calls. Streamlit runs every rerun on a fresh thread, though, so
+# whether a session tracks memory has to outlive the thread: callers keep it
+# themselves and pass it to enable()/disable() as was_memory. Memory figures
+# are process-wide (see below).
+_local = threading.local()
+
+# tracemalloc is process-wide: it runs while any thread records memory, and is
+# stopped by the last one only if the profiler started it.
+_memory_lock = threading.Lock()
+_memory_users = 0
+_started_tracing = False
+
+def _acquire_memory():
+    global _memory_users, _started_tracing
+    with _memory_lock:
+        _memory_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+
+def _release_memory():
+    global _memory_users, _started_tracing
+    with _memory_lock:
+        _memory_users = max(0, _memory_users - 1)
+        if _memory_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+class _NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SECTION = _NullSection()
+
+def enable(memory=False, trace_path=None, was_memory=None):
+    """
+    Starts recording sections in the current thread.
+
+    Args:
+        memory (bool): Also record peak traced allocations per section
+            (uses tracemalloc, which slows everything down noticeably).
+            tracemalloc is process-wide, so the figures include allocations
+            made meanwhile by other threads (e.g. other sessions).
+        trace_path (str): Append every finished run to this JSON-lines file.
+        was_memory (bool): Whether this caller was already tracking memory
+            (defaults to the current thread's state). Pass it when successive
+            calls for one caller may come from different threads.
+    """
+    if was_memory is None:
+        was_memory = getattr(_local, 'memory', False)
+    if memory and not was_memory:
+        _acquire_memory()
+    elif was_memory and not memory:
+        _release_memory()
+    _local.enabled = True
+    _local.memory = memory
+    _local.trace_path = trace_path
+    _local.records = []
+    _local.stack = []
+
+def disable(was_memory=None):
+    """
+    Stops recording in the current thread and drops anything recorded.
+
+    Args:
+        was_memory (bool): Whether this caller was tracking memory (defaults
+            to the current thread's state, see enable()).
+    """
+    if was_memory is None:
+        was_memory = getattr(_local, 'memory', False)
+    if was_memory:
+        _release_memory()
+    _local.enabled = False
+    _local.memory = False
+    _local.records = []
+    _local.stack = []
+
+def is_enabled():
+    return getattr(_local, 'enabled', False)
+
+class _Section:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = _local.stack
+        self.depth = len(stack)
+        self.peak = 0
+        if _local.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Fold what the parent has seen so far in before resetting.
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        record = {'name': self.name, 'depth': self.depth, 'start': self.start, 'time_s': elapsed}
+        if _local.memory:
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record['peak_bytes'] = max(0, peak - self.start_memory)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+        _local.records.append(record)
+        return False
+
+def section(name):
+    """
+    Context manager timing the enclosed block as `name`.
+
+    A shared no-op object is returned while profiling is disabled.
+    """
+    if not getattr(_local, 'enabled', False):
+        return _NULL_SECTION
+    return _Section(name)
+
+def profiled(name=None):
+    """
+    Decorator recording every call of a function as a section.
+
+    Args:
+        name (str): Section name (defaults to module.qualname without the
+            package prefix, e.g. 'fft_processor.compute_fft').
+    """
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not getattr(_local, 'enabled', False):
+                return func(*args, **kwargs)
+            with _Section(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def finish_run(**context):
+    """
+    Returns the sections recorded since the last call and starts a new run.
+
+    If a trace path was given to enable(), the run is appended to it as one
+    JSON line together with `context` (e.g. the page that was rendered).
+
+    Returns:
+        list: One dict per section (name, depth, start, time_s[, peak_bytes]),
+        in the order the sections finished.
+    """
+    if not is_enabled():
+        return []
+    records = _local.records
+    _local.records = []
+    if _local.trace_path:
+        write_trace(_local.trace_path, records, **context)
+    return records
+
+def write_trace(path, records, **context):
+    """
+    Appends one run of records to a JSON-lines trace file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    entry = dict(context, timestamp=time.time(), records=records)
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry, default=str) + '\n')
+
+def summarize(records):
+    """
+    Aggregates records by section name, slowest total first.
+
+    Returns:
+        list: One dict per name with calls, total_s, max_s and, when memory was
+        recorded, peak_bytes (the largest over all calls).
+    """
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record['name'], {'name': record['name'], 'depth': record['depth'],
+                                                    'calls': 0, 'total_s': 0.0, 'max_s': 0.0})
+        entry['calls'] += 1
+        entry['total_s'] += record['time_s']
+        entry['max_s'] = max(entry['max_s'], record['time_s'])
+        entry['depth'] = min(entry['depth'], record['depth'])
+        if 'peak_bytes' in record:
+            entry['peak_bytes'] = max(entry.get('peak_bytes', 0), record['peak_bytes'])
+    return sorted(summary.values(), key=lambda e: e['total_s'], reverse=True)
@@ -0,0 +1,224 @@
+import numpy as np
+from dsp.fft_engine import real_dtype
+from dsp.profiler import profiled
+
+# Error-feedback filters for noise shaping: the quantization error e[n] is
+# shaped by 1 - sum(h[k] z^-(k+1)).
+NOISE_SHAPING = {
+    'first-order': (1.0,),
+    'second-order': (2.0, -1.0),
+}
+
+def integer_dtype(n_bits):
+    """
+    Smallest signed integer type holding n_bits codes (int8, int16 or int32).
+    """
+    if not 1 <= n_bits <= 32:
+        raise ValueError("n_bits must be between 1 and 32.")
+    if n_bits <= 8:
+        return np.int8
+    if n_bits <= 16:
+        return np.int16
+    return np.int32
+
+class Quantizer:
+    """
+    Uniform quantizer producing compact integer codes.
+
+    Uses the same 2**n_bits mid-rise levels as quantize_signal, but returns
+    the level index as a signed code (-2**(n_bits-1) ... 2**(n_bits-1) - 1)
+    in the smallest integer type, so 16-bit audio takes two bytes per sample
+    instead of eight. The input is converted in blocks into the output
+    array, so the float temporaries never exceed one block; dequantize() and
+    error() recover floats for any slice when they are needed. Calls can be
+    chained over consecutive chunks: dither and noise-shaping state carry
+    over, and the result is the same as for one call over the whole signal.
+
+    Signal and error energy are accumulated as the data passes, so snr() is
+    available without keeping the error signal.
+    """
+
+    def __init__(self, n_bits, full_scale=1.0, dither=None, noise_shaping=None, seed=None,
+                 block_size=2**20, shaping_segment=1024):
+        """
+        Args:
+            n_bits (int): Number of bits (1 to 32).
+            full_scale (float or np.array): Amplitude mapped to the outermost
+                levels (one value or one per channel); larger inputs are clipped.
+            dither (str): None or 'tpdf' (triangular dither of +-1 LSB).
+            noise_shaping (str or sequence): None, a NOISE_SHAPING name or
+                error-feedback coefficients h.
+            seed (int): Seed of the dither generator.
+            block_size (int): Samples converted per block.
+            shaping_segment (int): Noise shaping runs the error-feedback loop
+                over this many segments of a block at once (see _shape).
+        """
+        if dither not in (None, 'tpdf'):
+            raise ValueError(f"Unknown dither '{dither}'.")
+        self.n_bits = n_bits
+        self.dtype = integer_dtype(n_bits)
+        self.levels = 2 ** n_bits
+        self.full_scale = np.asarray(full_scale, dtype=np.float64)
+        self.dither = dither
+        if isinstance(noise_shaping, str):
+            noise_shaping = NOISE_SHAPING[noise_shaping]
+        self.feedback = np.asarray(noise_shaping, dtype=np.float64) if noise_shaping is not None else None
+        self.seed = seed
+        self.block_size = block_size
+        self.shaping_segment = shaping_segment
+        self.reset()
+
+    def reset(self):
+        """
+        Restarts the dither sequence, noise-shaping state and statistics.
+        """
+        self._rng = np.random.default_rng(self.seed)
+        self._position = 0
+        self._history = None
+        self.signal_energy = 0.0
+        self.error_energy = 0.0
+
+    def _scale(self):
+        # Full scale with silent channels mapped to 1, as quantize_signal does.
+        return np.where(self.full_scale == 0, 1.0, self.full_scale)
+
+    @profiled()
+    def quantize(self, signal, out=None, track_error=True):
+        """
+        Quantizes the next chunk of a signal into integer codes.
+
+        Args:
+            signal (np.array): Samples, shape (samples,) or (samples, channels).
+            out (np.array): Integer array of the same shape to write into
+                (allocated with self.dtype if None).
+            track_error (bool): Accumulate the energies behind snr().
+
+        Returns:
+            np.array: The codes (out).
+
+        Raises:
+            ValueError: If out has another shape or cannot hold the codes.
+        """
+        signal = np.asarray(signal)
+        if out is None:
+            out = np.empty(signal.shape, dtype=self.dtype)
+        elif out.shape != signal.shape:
+            raise ValueError("out must have the shape of signal.")
+        elif not np.can_cast(self.dtype, out.dtype):
+            raise ValueError(f"out must hold {np.dtype(self.dtype).name} codes, not {out.dtype}.")
+        scale = self._scale()
+        half_steps = (self.levels - 1) / 2
+        for start in range(0, len(signal), self.block_size):
+            block = signal[start:start + self.block_size]
+            # Level index: round((x / full_scale + 1) * (L - 1) / 2), like quantize_signal.
+            scaled = np.divide(block, scale, dtype=np.float64)
+            scaled += 1
+            scaled *= half_steps
+            dither = None
+            if self.dither == 'tpdf':
+                noise = self._rng.random(scaled.shape + (2,))
+                dither = noise[..., 0] - noise[..., 1]
+            if self.feedback is not None:
+                self._shape(scaled, dither)
+            else:
+                if dither is not None:
+                    scaled += dither
+                np.rint(scaled, out=scaled)
+                np.clip(scaled, 0, self.levels - 1, out=scaled)
+            scaled -= self.levels // 2
+            out[start:start + len(block)] = scaled
+            self._position += len(block)
+            if track_error:
+                self.signal_energy += float(np.sum(np.square(block, dtype=np.float64)))
+                error = self.dequantize(out[start:start + len(block)], out=scaled)
+                np.subtract(block, error, out=error)
+                self.error_energy += float(np.sum(np.square(error)))
+        return out
+
+    def _shape(self, scaled, dither=None):
+        """
+        Error-feedback quantization of one block of level values, in place.
+
+        The fed-back error includes the dither, so the dither noise is
+        shaped along with the rounding error.
+
+        The feedback loop is sequential, so the block is cut into segments of
+        shaping_segment samples (aligned to absolute sample positions) that
+        are run side by side, one sample of every segment per step. The
+        state carries over within a segment, also across calls, but each new
+        segment starts from zero feedback; this leaves a floor about
+        10 * log10(shaping_segment) dB below the unshaped noise where the
+        shaping would otherwise push the noise lower.
+        """
+        n, seg = len(scaled), self.shaping_segment
+        order = len(self.feedback)
+        offset = self._position % seg
+        n_segments = -(-(offset + n) // seg)
+        channels = scaled.shape[1:]
+        padded = np.zeros((n_segments * seg,) + channels)
+        padded[offset:offset + n] = scaled
+        padded = padded.reshape((n_segments, seg) + channels)
+        noise = np.zeros_like(padded)
+        if dither is not None:
+            noise.reshape((-1,) + channels)[offset:offset + n] = dither
+        valid = np.zeros(n_segments * seg, dtype=bool)
+        valid[offset:offset + n] = True
+        valid = valid.reshape(n_segments, seg)
+
+        history = np.zeros((n_segments, order) + channels)
+        if offset and self._history is not None:
+            history[0] = self._history
+        feedback = self.feedback.reshape((order,) + (1,) * len(channels))
+        top = self.levels - 1
+        for j in range(seg):
+            v = padded[:, j] - np.sum(feedback * history, axis=1)
+            q = np.clip(np.rint(v + noise[:, j]), 0, top)
+            # Without clipping |e| <= 1.5 (dither plus rounding); limiting it keeps
+            # the loop stable when the input clips.
+            e = np.clip(q - v, -1.5, 1.5)
+            padded[:, j] = q
+            active = valid[:, j]
+            if active.all():
+                history[:, 1:] = history[:, :-1]
+                history[:, 0] = e
+            else:
+                shifted = np.concatenate((e[:, None], history[:, :-1]), axis=1)
+                history[active] = shifted[active]
+        self._history = history[-1].copy()
+        scaled[...] = padded.reshape((-1,) + channels)[offset:offset + n]
+
+    def dequantize(self, codes, out=None, dtype=None):
+        """
+        Converts codes back to amplitudes.
+
+        Args:
+            codes (np.array): Codes from quantize(), or any slice of them.
+            out (np.array): Float array to write into (allocated if None).
+            dtype: Type of an allocated output (default fft_engine.real_dtype()).
+
+        Returns:
+            np.array: full_scale * (2 * code + 1) / (2**n_bits - 1).
+        """
+        if out is None:
+            out = np.empty(np.shape(codes), dtype=real_dtype() if dtype is None else dtype)
+        out[...] = codes
+        out *= 2
+        out += 1
+        out *= self.full_scale / (self.levels - 1)
+        return out
+
+    def error(self, signal, codes, out=None):
+        """
+        Quantization error signal - dequantize(codes), e.g. for just the samples on screen.
+        """
+        out = self.dequantize(codes, out=out)
+        np.subtract(signal, out, out=out)
+        return out
+
+    def snr(self):
+        """
+        Signal-to-quantization-noise ratio of everything quantized so far, in dB.
+        """
+        if self.error_energy == 0:
+            return float('inf')
+        return 10 * np.log10(self.signal_energy / self.error_energy)
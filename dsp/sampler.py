@@ -1,14 +1,260 @@
+import math
 import numpy as np
-from scipy.signal import resample
+from fractions import Fraction
+from functools import lru_cache
+from scipy.signal import resample, firwin, upfirdn
+from dsp.fft_engine import as_real
+from dsp.profiler import profiled
+from dsp.quantizer import Quantizer
 
-def sample_signal(signal, original_fs, new_fs):
+# Quality presets for the polyphase resampler: (taps per phase multiplier, Kaiser beta).
+# 'medium' matches scipy.signal.resample_poly's default filter.
+RESAMPLE_QUALITY = {
+    'low': (4, 5.0),
+    'medium': (10, 5.0),
+    'high': (32, 8.6),
+}
+
+# Designs longer than this (ratios close to 1, e.g. 44100 -> 44099 needs
+# about 882k taps) are not cached, so the cache stays within a few MB.
+MAX_CACHED_TAPS = 2**16
+
+def resample_ratio(original_fs, new_fs, max_denominator=1000):
+    """
+    Reduces new_fs / original_fs to an (up, down) integer pair.
+    
+    Args:
+        original_fs (float): Original sampling rate.
+        new_fs (float): Target sampling rate.
+        max_denominator (int): Largest allowed down factor for non-integer rates.
+        
+    Returns:
+        tuple: (up, down) in lowest terms.
+    """
+    if float(original_fs).is_integer() and float(new_fs).is_integer():
+        ratio = Fraction(int(new_fs), int(original_fs))
+    else:
+        ratio = Fraction(new_fs / original_fs).limit_denominator(max_denominator)
+    return ratio.numerator, ratio.denominator
+
+def _design_resample_filter(up, down, quality):
+    """
+    Designs (and caches, up to MAX_CACHED_TAPS taps) the anti-aliasing FIR filter for an up/down ratio.
+    
+    Returns:
+        np.array: Read-only filter taps, pre-padded so the output delay is a multiple of down.
+        int: Number of leading output samples to discard.
+    """
+    if quality not in RESAMPLE_QUALITY:
+        raise ValueError(f"Unknown resampling quality '{quality}'. Use one of {list(RESAMPLE_QUALITY)}.")
+    if 2 * RESAMPLE_QUALITY[quality][0] * max(up, down) + 1 > MAX_CACHED_TAPS:
+        return _design_resample_filter_uncached(up, down, quality)
+    return _cached_resample_filter(up, down, quality)
+
+def _design_resample_filter_uncached(up, down, quality):
+    multiplier, beta = RESAMPLE_QUALITY[quality]
+    
+    max_rate = max(up, down)
+    half_len = multiplier * max_rate
+    h = firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', beta)) * up
+    
+    n_pre_pad = down - half_len % down
+    h = np.concatenate((np.zeros(n_pre_pad), h))
+    h.setflags(write=False)
+    
+    n_pre_remove = (half_len + n_pre_pad) // down
+    return h, n_pre_remove
+
+_cached_resample_filter = lru_cache(maxsize=32)(_design_resample_filter_uncached)
+
+def _block_geometry(n_taps, n_pre_remove, up, down, block_size):
+    """
+    Block layout shared by the blocked and the streaming polyphase resamplers.
+    
+    Returns:
+        tuple: (block_in, block_out, pre, post, offset) where blocks of block_in
+        input samples map to block_out output samples, pre/post are the input
+        context needed around each block and offset is the first output sample
+        of a block inside upfirdn's result.
+    """
+    # Input blocks are whole multiples of `down` so each maps to exactly
+    # block_in * up / down output samples.
+    units = max(1, block_size // down)
+    block_in = units * down
+    block_out = units * up
+    
+    # Context before/after each block, in input samples. The leading context
+    # is a multiple of `down` so the output offset stays an integer.
+    support = -(-n_taps // up) + 1
+    pre = -(-support // down) * down
+    post = support
+    offset = n_pre_remove + pre * up // down
+    return block_in, block_out, pre, post, offset
+
+@profiled()
+def resample_polyphase(signal, up, down, quality='medium', block_size=65536):
+    """
+    Polyphase rational resampling by up/down, processed in blocks.
+    
+    Each block of input samples is filtered with upfirdn together with enough
+    neighbouring context to cover the filter support, so the output matches a
+    single-shot polyphase resample while only one block is expanded at a time.
+    
+    Args:
+        signal (np.array): Input signal, shape (samples,) or (samples, channels).
+        up (int): Upsampling factor.
+        down (int): Downsampling factor.
+        quality (str): Filter quality ('low', 'medium', 'high'); higher is slower but sharper.
+        block_size (int): Approximate number of input samples per block.
+        
+    Returns:
+        np.array: Resampled signal of length ceil(len(signal) * up / down) along axis 0.
+    """
+    signal = as_real(signal)
+    g = math.gcd(up, down)
+    up, down = up // g, down // g
+    if up == down:
+        return signal.copy()
+    N = len(signal)
+    n_out = -(-N * up // down)
+    
+    h, n_pre_remove = _design_resample_filter(up, down, quality)
+    h = h.astype(signal.dtype, copy=False)
+    
+    block_in, block_out, pre, post, offset = _block_geometry(len(h), n_pre_remove, up, down, block_size)
+    
+    out = np.empty((n_out,) + signal.shape[1:], dtype=signal.dtype)
+    
+    for i0 in range(0, N, block_in):
+        start = i0 - pre
+        stop = min(i0 + block_in + post, N)
+        segment = signal[max(start, 0):stop]
+        if start < 0:
+            segment = np.concatenate((np.zeros((-start,) + segment.shape[1:], dtype=segment.dtype), segment))
+            
+        y = upfirdn(h, segment, up, down, axis=0)
+        
+        m0 = i0 * up // down
+        m1 = min(m0 + block_out, n_out)
+        out[m0:m1] = y[offset:offset + (m1 - m0)]
+        
+    return out
+
+class StreamingResampler:
+    """
+    Polyphase rational resampler that carries its state between blocks.
+    
+    Input arrives in blocks of any size; each call returns the output samples
+    that are final so far and flush() returns the rest. The concatenated
+    output equals resample_polyphase (and scipy.signal.resample_poly) on the
+    whole signal. Latency is about block_size plus the filter half-length in
+    input samples, and memory is bounded by the same amount.
+    """
+    
+    def __init__(self, up, down, quality='medium', block_size=4096):
+        """
+        Args:
+            up (int): Upsampling factor.
+            down (int): Downsampling factor.
+            quality (str): Filter quality ('low', 'medium', 'high').
+            block_size (int): Approximate number of input samples per internal block.
+        """
+        g = math.gcd(up, down)
+        self.up, self.down = up // g, down // g
+        if self.up != self.down:
+            self.h, n_pre_remove = _design_resample_filter(self.up, self.down, quality)
+            (self._block_in, self._block_out, self._pre,
+             self._post, self._offset) = _block_geometry(len(self.h), n_pre_remove, self.up, self.down, block_size)
+        self.reset()
+        
+    @classmethod
+    def from_rates(cls, original_fs, new_fs, quality='medium', block_size=4096):
+        """
+        Creates a resampler from original_fs to new_fs.
+        """
+        up, down = resample_ratio(original_fs, new_fs)
+        return cls(up, down, quality, block_size)
+        
+    def reset(self):
+        """
+        Discards all buffered input.
+        """
+        self._buffer = None
+        self._received = 0
+        self._emitted = 0
+        
+    def _blocks(self, final):
+        parts = []
+        window = self._pre + self._block_in + self._post
+        n_out = -(-self._received * self.up // self.down)
+        while len(self._buffer) >= window or (final and self._emitted < n_out):
+            y = upfirdn(self._h, self._buffer[:window], self.up, self.down, axis=0)
+            count = self._block_out if not final else min(self._block_out, n_out - self._emitted)
+            parts.append(y[self._offset:self._offset + count])
+            self._emitted += count
+            self._buffer = self._buffer[self._block_in:]
+        if not parts:
+            return self._buffer[:0].copy()
+        return np.concatenate(parts)
+        
+    def process(self, chunk):
+        """
+        Feeds one block of input.
+        
+        Args:
+            chunk (np.array): Next block, shape (samples,) or (samples, channels).
+            
+        Returns:
+            np.array: Resampled samples finalized by this block (may be empty).
+        """
+        chunk = as_real(chunk)
+        if self.up == self.down:
+            return chunk.copy()
+        if self._buffer is None:
+            # Leading zeros stand in for the context before the first sample;
+            # the precision is fixed per stream, by the first block.
+            self._buffer = np.zeros((self._pre,) + chunk.shape[1:], dtype=chunk.dtype)
+            self._h = self.h.astype(chunk.dtype, copy=False)
+        self._buffer = np.concatenate((self._buffer, chunk))
+        self._received += len(chunk)
+        return self._blocks(final=False)
+    
+    def flush(self):
+        """
+        Returns the remaining output; the total is ceil(n_in * up / down) samples.
+        """
+        if self.up == self.down or self._buffer is None:
+            return np.zeros(0)
+        out = self._blocks(final=True)
+        self.reset()
+        return out
+    
+    def filter_chunks(self, chunks):
+        """
+        Resamples an iterable of blocks.
+        
+        Yields:
+            np.array: Resampled blocks.
+        """
+        for chunk in chunks:
+            out = self.process(chunk)
+            if len(out):
+                yield out
+        out = self.flush()
+        if len(out):
+            yield out
+
+@profiled()
+def sample_signal(signal, original_fs, new_fs, method='polyphase', quality='medium'):
     """
     Resamples the signal from original_fs to new_fs.
     
     Args:
-        signal (np.array): The input signal.
+        signal (np.array): The input signal, shape (samples,) or (samples, channels).
         original_fs (int): Original sampling rate.
         new_fs (int): Target sampling rate.
+        method (str): 'polyphase' (blocked rational resampler) or 'fft' (whole-signal scipy.signal.resample).
+        quality (str): Polyphase filter quality ('low', 'medium', 'high').
         
     Returns:
         np.array: Resampled signal.
@@ -20,43 +266,108 @@ def sample_signal(signal, original_fs, new_fs):
     
     num_samples = int(len(signal) * new_fs / original_fs)
     
-    resampled_signal = resample(signal, num_samples)
+    signal = as_real(signal)
+    if method == 'fft':
+        resampled_signal = resample(signal, num_samples, axis=0).astype(signal.dtype, copy=False)
+    elif method == 'polyphase':
+        up, down = resample_ratio(original_fs, new_fs)
+        resampled_signal = resample_polyphase(signal, up, down, quality=quality)
+        if len(resampled_signal) >= num_samples:
+            resampled_signal = resampled_signal[:num_samples]
+        else:
+            pad = [(0, num_samples - len(resampled_signal))] + [(0, 0)] * (resampled_signal.ndim - 1)
+            resampled_signal = np.pad(resampled_signal, pad)
+    else:
+        raise ValueError(f"Unknown resampling method '{method}'. Use 'polyphase' or 'fft'.")
     
     t = np.arange(num_samples) / new_fs
     
     return resampled_signal, t
 
-def quantize_signal(signal, n_bits):
+@profiled()
+def quantize_signal(signal, n_bits, dither=None, noise_shaping=None, seed=None):
     """
     Quantizes the signal to n_bits.
     
+    Each channel of a (samples, channels) array is scaled by its own peak.
+    The work is done by Quantizer (integer codes, block-sized temporaries);
+    use it directly to keep the compact codes instead of float arrays.
+    
     Args:
         signal (np.array): Input signal (assumed to be normalized between -1 and 1 or similar).
         n_bits (int): Number of bits for quantization.
+        dither (str): None or 'tpdf'.
+        noise_shaping (str): None, 'first-order' or 'second-order'.
+        seed (int): Seed of the dither generator.
         
     Returns:
         np.array: Quantized signal.
         np.array: Quantization error.
     """
-    L = 2 ** n_bits
-    
-    max_val = np.max(np.abs(signal))
-    if max_val == 0:
+    signal = as_real(signal)
+    max_val = np.max(np.abs(signal), axis=0)
+    if not np.any(max_val):
         return signal, np.zeros_like(signal)
-        
-    norm_signal = signal / max_val
     
+    quantizer = Quantizer(n_bits, max_val, dither, noise_shaping, seed)
+    quantized_signal = quantizer.dequantize(quantizer.quantize(signal, track_error=False))
+    error = np.subtract(signal, quantized_signal)
     
+    return quantized_signal, error
+
+class StreamingQuantizer:
+    """
+    Block-wise uniform quantizer with a fixed full-scale value.
     
-    scaled = (norm_signal + 1) * (L - 1) / 2
-    quantized_levels = np.round(scaled)
-    
-    quantized_levels = np.clip(quantized_levels, 0, L - 1)
+    quantize_signal scales by the peak of the whole signal, which a stream
+    does not know in advance; here the full scale is given up front (one
+    value or one per channel). With full_scale equal to the signal's peak
+    the output matches quantize_signal exactly. Signal and error energy are
+    accumulated so the SNR of everything quantized so far is available.
+    """
     
-    quantized_norm = (quantized_levels * 2 / (L - 1)) - 1
+    def __init__(self, n_bits, full_scale=1.0, dither=None, noise_shaping=None, seed=None):
+        """
+        Args:
+            n_bits (int): Number of bits for quantization.
+            full_scale (float or np.array): Amplitude mapped to the outermost levels;
+                larger inputs are clipped.
+            dither (str): None or 'tpdf'.
+            noise_shaping (str): None, 'first-order' or 'second-order'.
+            seed (int): Seed of the dither generator.
+        """
+        self.n_bits = n_bits
+        self.full_scale = np.asarray(full_scale, dtype=np.float64)
+        self.quantizer = Quantizer(n_bits, self.full_scale, dither, noise_shaping, seed)
+        
+    def reset(self):
+        """
+        Clears the accumulated signal and error energy (and the dither/shaping state).
+        """
+        self.quantizer.reset()
+        
+    @property
+    def signal_energy(self):
+        return self.quantizer.signal_energy
     
-    quantized_signal = quantized_norm * max_val
+    @property
+    def error_energy(self):
+        return self.quantizer.error_energy
+        
+    def process(self, chunk):
+        """
+        Quantizes one block.
+        
+        Returns:
+            np.array: Quantized block, same shape as the input.
+        """
+        return self.quantizer.dequantize(self.quantizer.quantize(chunk))
     
-    error = signal - quantized_signal
+    def flush(self):
+        return np.zeros(0)
     
-    return quantized_signal, error
+    def snr(self):
+        """
+        Signal-to-quantization-noise ratio of everything processed so far, in dB.
+        """
+        return self.quantizer.snr()
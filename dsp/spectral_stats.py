@@ -0,0 +1,163 @@
+import numpy as np
+from dsp.analysis import SpectralAnalysis
+from dsp.fft_processor import WelchAccumulator
+from dsp.profiler import profiled
+
+class StreamingSpectralStats:
+    """
+    One-pass estimates of the 95% energy cutoff, f_max (and Nyquist rate) and SNR.
+
+    Chunks are fed through update() into a Welch accumulator whose segment
+    length is the smallest power of two giving bins no wider than
+    resolution_hz, so memory is bounded by one segment and the spectrum
+    regardless of the signal length. The figures are those of
+    SpectralAnalysis on the averaged spectrum and agree with the
+    full-resolution FFT the tabs use within:
+
+    - energy_cutoff: about 2 * resolution_hz.
+    - f_max / nyquist_rate: about 2 * resolution_hz (4 * for the rate) for
+      spectral lines standing well clear of the noise floor. A broadband
+      floor within 40 dB of the peak (threshold_ratio 0.01) rises above the
+      threshold once averaged, and f_max is then overestimated.
+    - snr: about 1.5 dB when the peak is a spectral line (the Welch processing
+      gain is added back, see SpectralAnalysis.snr). The SNR of a broadband
+      peak depends on the transform length and is not reproduced.
+    """
+
+    def __init__(self, fs, resolution_hz=1.0, window_type='Hann', max_nperseg=2**18):
+        """
+        Args:
+            fs (int): Sampling rate.
+            resolution_hz (float): Largest acceptable bin width in Hz.
+            window_type (str): Window function ('None', 'Hann', 'Hamming').
+            max_nperseg (int): Upper bound on the segment length (memory cap).
+        """
+        if resolution_hz <= 0:
+            raise ValueError("resolution_hz must be positive.")
+        nperseg = 1 << max(int(np.ceil(np.log2(fs / resolution_hz))), 1)
+        self.nperseg = min(nperseg, max_nperseg)
+        self.fs = fs
+        self.accumulator = WelchAccumulator(fs, window_type, self.nperseg)
+        self.n_samples = 0
+        self._analyses = None
+
+    @property
+    def resolution_hz(self):
+        """
+        Bin width actually used.
+        """
+        return self.fs / self.nperseg
+
+    def update(self, chunk):
+        """
+        Adds the next block of the signal, shape (samples,) or (samples, channels).
+        """
+        self.accumulator.update(chunk)
+        self.n_samples += len(chunk)
+        self._analyses = None
+        return self
+
+    def spectrum(self):
+        """
+        Returns the averaged spectrum of everything fed so far.
+
+        Returns:
+            np.array: Frequency bins.
+            np.array: Linear magnitude, shape (bins,) or (bins, channels).
+        """
+        freqs, magnitude, _ = self.accumulator.result()
+        return freqs, magnitude
+
+    def analyses(self):
+        """
+        Returns one SpectralAnalysis per channel of everything fed so far.
+
+        The averaged spectrum is built once and reused until the next update(),
+        so reading several statistics in a row averages it only once.
+        """
+        if self._analyses is None:
+            freqs, magnitude = self.spectrum()
+            if magnitude.ndim == 1:
+                self._analyses = [SpectralAnalysis(freqs, magnitude, 'welch', self.n_samples)]
+            else:
+                self._analyses = [SpectralAnalysis(freqs, magnitude[:, c], 'welch', self.n_samples)
+                                  for c in range(magnitude.shape[1])]
+        return list(self._analyses)
+
+    def analysis(self):
+        """
+        Returns the SpectralAnalysis of a single-channel stream.
+        """
+        analyses = self.analyses()
+        if len(analyses) != 1:
+            raise ValueError("analysis() needs a single-channel stream; use analyses().")
+        return analyses[0]
+
+    def energy_cutoff(self, fraction=0.95):
+        """
+        Lowest frequency below which `fraction` of the energy fed so far lies.
+
+        Args:
+            fraction (float): Share of the total spectral energy.
+
+        Returns:
+            float: Cutoff frequency in Hz.
+        """
+        return self.analysis().energy_cutoff(fraction)
+
+    def f_max(self, threshold_ratio=0.01):
+        """
+        Highest frequency whose averaged magnitude exceeds threshold_ratio * peak.
+
+        Args:
+            threshold_ratio (float): Threshold relative to the peak magnitude.
+
+        Returns:
+            float: f_max in Hz.
+        """
+        return self.analysis().f_max(threshold_ratio)
+
+    def nyquist_rate(self, threshold_ratio=0.01):
+        """
+        Minimum sampling rate (2 * f_max) that avoids aliasing.
+
+        Args:
+            threshold_ratio (float): Threshold relative to the peak magnitude.
+
+        Returns:
+            float: Nyquist rate in Hz.
+        """
+        return self.analysis().nyquist_rate(threshold_ratio)
+
+    def snr(self, guard_bins=2):
+        """
+        Peak power over the mean power of the rest of the averaged spectrum.
+
+        Args:
+            guard_bins (int): Bins on each side of the peak excluded from the noise.
+
+        Returns:
+            float: SNR in dB.
+        """
+        return self.analysis().snr(guard_bins)
+
+@profiled()
+def spectral_stats(chunks, fs, resolution_hz=1.0, window_type='Hann'):
+    """
+    Streams an iterable of chunks (e.g. AudioSource.blocks()) into the summary statistics.
+
+    Returns:
+        dict: energy_cutoff_95, f_max, nyquist_rate, snr_db and resolution_hz
+        of a single-channel stream.
+    """
+    stats = StreamingSpectralStats(fs, resolution_hz, window_type)
+    for chunk in chunks:
+        stats.update(chunk)
+    analysis = stats.analysis()
+    return {
+        'energy_cutoff_95': float(analysis.energy_cutoff(0.95)),
+        'f_max': float(analysis.f_max()),
+        'nyquist_rate': float(analysis.nyquist_rate()),
+        'snr_db': float(analysis.snr()),
+        'resolution_hz': stats.resolution_hz,
+    }
@@ -0,0 +1,126 @@
+import numpy as np
+from scipy.signal import spectrogram
+from dsp.fft_engine import as_real
+from dsp.profiler import profiled
+
+@profiled()
+def compute_spectrogram_db(signal, fs, nperseg=256, noverlap=None, chunk_frames=4096):
+    """
+    Computes a spectrogram in dB, chunk by chunk, stored as float32.
+
+    The result matches 10 * log10(scipy.signal.spectrogram(signal, fs, ...) + 1e-10)
+    but only chunk_frames frames of complex spectra exist at any time.
+
+    Args:
+        signal (np.array): Input signal.
+        fs (int): Sampling rate.
+        nperseg (int): Samples per segment.
+        noverlap (int): Overlapping samples (default nperseg // 8, as scipy).
+        chunk_frames (int): Frames computed per chunk.
+
+    Returns:
+        np.array: Frequency axis.
+        np.array: Time axis (segment centres).
+        np.array: Power in dB, shape (n_freqs, n_times), float32.
+    """
+    if noverlap is None:
+        noverlap = nperseg // 8
+    hop = nperseg - noverlap
+    N = len(signal)
+    if N < nperseg:
+        f, t, Sxx = spectrogram(as_real(signal), fs, nperseg=nperseg, noverlap=noverlap)
+        return f, t, (10 * np.log10(Sxx + 1e-10)).astype(np.float32)
+
+    n_frames = (N - noverlap) // hop
+    f = None
+    z = None
+    for first in range(0, n_frames, chunk_frames):
+        count = min(chunk_frames, n_frames - first)
+        start = first * hop
+        segment = as_real(signal[start:start + (count - 1) * hop + nperseg])
+        f, _, Sxx = spectrogram(segment, fs, nperseg=nperseg, noverlap=noverlap)
+        if z is None:
+            z = np.empty((len(f), n_frames), dtype=np.float32)
+        z[:, first:first + count] = 10 * np.log10(Sxx + 1e-10)
+
+    t = (np.arange(n_frames) * hop + nperseg / 2) / fs
+    return f, t, z
+
+def _pool(values, edges, axis, pooling):
+    if pooling == 'max':
+        return np.maximum.reduceat(values, edges, axis=axis)
+    counts = np.diff(np.append(edges, values.shape[axis]))
+    shape = [1, 1]
+    shape[axis] = -1
+    return np.add.reduceat(values, edges, axis=axis) / counts.reshape(shape)
+
+class SpectrogramPyramid:
+    """
+    Multi-resolution dB spectrogram for bounded-size heatmaps.
+
+    Level k pools 2**k consecutive time frames (max or mean in the dB
+    domain). A view is served from the coarsest level that still has enough
+    columns, and frequency rows are pooled on the fly if there are more than
+    requested, so the returned matrix never exceeds the requested size
+    regardless of the recording length.
+    """
+
+    @profiled()
+    def __init__(self, f, t, z, pooling='max'):
+        """
+        Args:
+            f (np.array): Frequency axis.
+            t (np.array): Time axis.
+            z (np.array): Power in dB, shape (len(f), len(t)).
+            pooling (str): 'max' or 'mean'.
+        """
+        if pooling not in ('max', 'mean'):
+            raise ValueError("pooling must be 'max' or 'mean'.")
+        self.f = f
+        self.pooling = pooling
+        self.levels = [(t, z)]
+        while len(t) > 1:
+            edges = np.arange(0, len(t), 2)
+            t = _pool(t[np.newaxis, :], edges, 1, 'mean')[0]
+            z = _pool(z, edges, 1, pooling).astype(z.dtype, copy=False)
+            self.levels.append((t, z))
+
+    @property
+    def t(self):
+        return self.levels[0][0]
+
+    @profiled()
+    def query(self, t_range=None, max_time_bins=600, max_freq_bins=256):
+        """
+        Returns a heatmap of the requested time range at bounded resolution.
+
+        Args:
+            t_range (tuple): (start, end) in seconds; None for the whole signal.
+            max_time_bins (int): Maximum number of columns.
+            max_freq_bins (int): Maximum number of rows.
+
+        Returns:
+            np.array: Frequency axis.
+            np.array: Time axis.
+            np.array: Power in dB, shape (len(f), len(t)).
+        """
+        t0 = self.levels[0][0]
+        if t_range is None:
+            lo, hi = 0, len(t0)
+        else:
+            lo, hi = np.searchsorted(t0, t_range[0]), np.searchsorted(t0, t_range[1], side='right')
+
+        level = 0
+        while level + 1 < len(self.levels) and (hi - lo) / 2 ** level > max_time_bins:
+            level += 1
+        t, z = self.levels[level]
+        scale = 2 ** level
+        t = t[lo // scale:-(-hi // scale)]
+        z = z[:, lo // scale:-(-hi // scale)]
+
+        f = self.f
+        if len(f) > max_freq_bins:
+            edges = np.arange(0, len(f), -(-len(f) // max_freq_bins))
+            f = _pool(f[np.newaxis, :], edges, 1, 'mean')[0]
+            z = _pool(z, edges, 0, self.pooling)
+        return f, t, z
@@ -0,0 +1,192 @@
+import numpy as np
+from dsp.fft_engine import rfft, irfft, as_real
+from scipy.signal import get_window
+from dsp.profiler import profiled
+
+def iter_blocks(signal, block_size):
+    """
+    Splits an array into consecutive blocks (views, no copies).
+
+    Args:
+        signal (np.array): Input signal.
+        block_size (int): Samples per block; the last block may be shorter.
+
+    Yields:
+        np.array: Blocks of the signal, in order.
+    """
+    for start in range(0, len(signal), block_size):
+        yield signal[start:start + block_size]
+
+@profiled()
+def stft(signal, frame_size=2048, hop=512, window='hann'):
+    """
+    Real-FFT short-time Fourier transform of the frames fully inside the signal.
+
+    A signal shorter than one frame is zero-padded to a single frame.
+
+    Args:
+        signal (np.array): Input signal, shape (samples,) or (samples, channels).
+        frame_size (int): Samples per frame.
+        hop (int): Samples between frame starts.
+        window (str or tuple): Window specification for scipy.signal.get_window.
+
+    Returns:
+        np.array: Complex spectra, shape (n_frames, [channels,] frame_size // 2 + 1).
+    """
+    signal = as_real(signal)
+    w = get_window(window, frame_size, fftbins=True).astype(signal.dtype)
+    if len(signal) < frame_size:
+        signal = np.pad(signal, [(0, frame_size - len(signal))] + [(0, 0)] * (signal.ndim - 1))
+    frames = np.lib.stride_tricks.sliding_window_view(signal, frame_size, axis=0)[::hop]
+    return rfft(frames * w, axis=-1)
+
+class StreamingSTFT:
+    """
+    Streaming STFT -> spectral modifier -> ISTFT with weighted overlap-add.
+
+    Blocks of any size go in through process(); each call returns the output
+    samples that are final so far, and flush() returns the rest. The output is
+    aligned with the input (no added latency in the concatenated result) and,
+    with an identity modifier, reconstructs the input exactly. Working memory
+    is bounded by the block size, not the signal length. Blocks may be
+    (samples, channels) arrays; all channels go through the same transforms.
+    """
+
+    def __init__(self, modifier=None, frame_size=2048, hop=512, window='hann'):
+        """
+        Args:
+            modifier (callable): Function mapping a (n_frames, channels, n_bins)
+                complex spectrum array to a modified array of the same shape.
+                None leaves the spectra untouched.
+            frame_size (int): Samples per frame.
+            hop (int): Samples between frame starts; must divide frame_size.
+            window (str or tuple): Window specification for scipy.signal.get_window.
+        """
+        if frame_size % hop != 0:
+            raise ValueError("hop must divide frame_size.")
+        self.modifier = modifier
+        self.frame_size = frame_size
+        self.hop = hop
+        self.window = get_window(window, frame_size, fftbins=True)
+
+        # Per-position sum of the squared analysis*synthesis windows over all
+        # overlapping frames; dividing by it makes the overlap-add exact.
+        norm = np.sum((self.window ** 2).reshape(-1, hop), axis=0)
+        if np.any(norm <= 1e-12):
+            raise ValueError("Window and hop do not cover every sample.")
+        self._norm = norm
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all buffered input and output.
+        """
+        self._buffer = None
+        self._ola = None
+        self._window = None
+        self._to_skip = self.frame_size - self.hop
+        self._pending = 0
+        self._squeeze = False
+
+    def process(self, chunk):
+        """
+        Feeds one block of input.
+
+        Args:
+            chunk (np.array): Next block of the input signal, shape (samples,)
+                or (samples, channels).
+
+        Returns:
+            np.array: Output samples finalized by this block (may be empty).
+        """
+        chunk = as_real(chunk)
+        if self._buffer is None:
+            # Work on (samples, channels) internally; 1-D input comes back 1-D.
+            self._squeeze = chunk.ndim == 1
+            channels = chunk.shape[1:] or (1,)
+            delay = self.frame_size - self.hop
+            # The precision is fixed per stream, by the first block.
+            self._window = self.window.astype(chunk.dtype)
+            self._buffer = np.zeros((delay,) + channels, dtype=chunk.dtype)
+            self._ola = np.zeros((delay,) + channels, dtype=chunk.dtype)
+        if self._squeeze:
+            chunk = chunk[:, np.newaxis]
+        self._pending += len(chunk)
+        self._buffer = np.concatenate((self._buffer, chunk))
+        return self._run()
+
+    def flush(self):
+        """
+        Processes the remaining buffered input and returns the final samples.
+
+        Returns:
+            np.array: Remaining output; together with earlier outputs it has
+            exactly as many samples as were fed in.
+        """
+        if self._buffer is None:
+            return np.zeros(0)
+        pad = self.frame_size - self.hop
+        pad += (-(len(self._buffer) + pad)) % self.hop
+        tail = np.zeros((pad,) + self._buffer.shape[1:], dtype=self._buffer.dtype)
+        self._buffer = np.concatenate((self._buffer, tail))
+        out = self._run()
+        self.reset()
+        return out
+
+    def filter_chunks(self, chunks):
+        """
+        Runs the engine over an iterable of blocks.
+
+        Args:
+            chunks (iterable): Blocks of the input signal, in order.
+
+        Yields:
+            np.array: Output blocks.
+        """
+        for chunk in chunks:
+            out = self.process(chunk)
+            if len(out):
+                yield out
+        out = self.flush()
+        if len(out):
+            yield out
+
+    def _run(self):
+        frame_size, hop = self.frame_size, self.hop
+        n_frames = (len(self._buffer) - frame_size) // hop + 1
+        if n_frames <= 0:
+            return self._output(self._buffer[:0])
+
+        # Frames have shape (n_frames, channels, frame_size).
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer, frame_size, axis=0)[::hop][:n_frames]
+        spec = rfft(frames * self._window, axis=-1)
+        if self.modifier is not None:
+            spec = self.modifier(spec)
+        y = irfft(spec, n=frame_size, axis=-1) * self._window
+
+        # Overlap-add: frame k contributes its j-th hop-sized piece to output
+        # segment k + j. Segments before index n_frames are complete.
+        r = frame_size // hop
+        channels = self._buffer.shape[1]
+        y = y.reshape(n_frames, channels, r, hop).transpose(0, 2, 3, 1)
+        acc = np.zeros((n_frames + r - 1, hop, channels), dtype=self._buffer.dtype)
+        for j in range(r):
+            acc[j:j + n_frames] += y[:, j]
+        acc = acc.reshape(-1, channels)
+        acc[:len(self._ola)] += self._ola
+
+        n_done = n_frames * hop
+        out = acc[:n_done] / np.tile(self._norm.astype(acc.dtype), n_frames)[:, np.newaxis]
+        self._ola = acc[n_done:]
+        self._buffer = self._buffer[n_done:]
+
+        skip = min(self._to_skip, len(out))
+        out = out[skip:]
+        self._to_skip -= skip
+
+        out = out[:self._pending]
+        self._pending -= len(out)
+        return self._output(out)
+
+    def _output(self, out):
+        return out[:, 0] if self._squeeze else out
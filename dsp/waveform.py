@@ -0,0 +1,151 @@
+import numpy as np
+from dsp.profiler import profiled
+
+@profiled()
+def minmax_envelope(signal, max_points=5000):
+    """
+    Downsamples a signal for plotting while keeping every peak.
+
+    The signal is split into max_points // 2 buckets and each bucket is
+    represented by its minimum and maximum, in the order they occur. NaN
+    samples are ignored (a bucket of only NaN is represented by its first sample).
+
+    Args:
+        signal (np.array): Input signal.
+        max_points (int): Maximum number of points to return.
+
+    Returns:
+        np.array: Sample indices of the returned points.
+        np.array: Signal values at those indices.
+    """
+    N = len(signal)
+    if N <= max_points:
+        idx = np.arange(N)
+        return idx, signal[idx]
+
+    n_buckets = max(1, max_points // 2)
+    edges = np.linspace(0, N, n_buckets + 1).astype(int)[:-1]
+    lengths = np.diff(np.append(edges, N))
+    # Position of the min/max inside each bucket, via reduceat on the values
+    # and a search for the first sample that attains them.
+    mins = np.fmin.reduceat(signal, edges)
+    maxs = np.fmax.reduceat(signal, edges)
+    bucket = np.repeat(np.arange(n_buckets), lengths)
+    first_min = _first_index(signal == mins[bucket], bucket, edges)
+    first_max = _first_index(signal == maxs[bucket], bucket, edges)
+
+    idx = np.sort(np.stack((first_min, first_max), axis=1), axis=1).ravel()
+    return idx, signal[idx]
+
+def _first_index(hits, bucket, edges):
+    positions = np.flatnonzero(hits)
+    first = np.full(len(edges), len(hits))
+    np.minimum.at(first, bucket[positions], positions)
+    # No hit (every sample NaN): fall back to the bucket's first sample.
+    return np.where(first < len(hits), first, edges)
+
+class WaveformPyramid:
+    """
+    Multi-resolution min/max summary of a signal for zoomable plots.
+
+    Level k stores the minimum and maximum of every block of
+    base_block * factor**k samples. A zoom range is served from the coarsest
+    level that still gives enough points, so the cost of a query depends on
+    the number of points shown rather than on the length of the range, and
+    no clip or spike is ever dropped from the envelope.
+    """
+
+    @profiled()
+    def __init__(self, signal, base_block=64, factor=4, chunk_size=2**22):
+        """
+        Args:
+            signal (np.array): Input signal (an array, memmap or anything sliceable).
+            base_block (int): Samples per block at the finest level.
+            factor (int): Block size ratio between consecutive levels.
+            chunk_size (int): Samples read at a time while building the first level.
+        """
+        self.signal = signal
+        self.length = len(signal)
+        self.levels = []
+
+        chunk_size = max(base_block, chunk_size // base_block * base_block)
+        mins, maxs = [], []
+        for start in range(0, self.length, chunk_size):
+            chunk = np.asarray(signal[start:start + chunk_size])
+            edges = np.arange(0, len(chunk), base_block)
+            mins.append(np.minimum.reduceat(chunk, edges))
+            maxs.append(np.maximum.reduceat(chunk, edges))
+        if not mins:
+            return
+
+        block = base_block
+        mins, maxs = np.concatenate(mins), np.concatenate(maxs)
+        self.levels.append((block, mins, maxs))
+        while len(mins) > 1:
+            edges = np.arange(0, len(mins), factor)
+            mins = np.minimum.reduceat(mins, edges)
+            maxs = np.maximum.reduceat(maxs, edges)
+            block *= factor
+            self.levels.append((block, mins, maxs))
+
+    def to_arrays(self):
+        """
+        Packs the levels into flat arrays for storage (see from_arrays).
+        
+        Returns:
+            tuple: (block sizes, level lengths, concatenated mins, concatenated maxs).
+        """
+        if not self.levels:
+            empty = np.zeros(0)
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int), empty, empty
+        blocks = np.array([block for block, _, _ in self.levels])
+        lengths = np.array([len(mins) for _, mins, _ in self.levels])
+        mins = np.concatenate([mins for _, mins, _ in self.levels])
+        maxs = np.concatenate([maxs for _, _, maxs in self.levels])
+        return blocks, lengths, mins, maxs
+    
+    @classmethod
+    def from_arrays(cls, signal, blocks, lengths, mins, maxs):
+        """
+        Rebuilds a pyramid from to_arrays() output without rescanning the signal.
+        """
+        pyramid = cls.__new__(cls)
+        pyramid.signal = signal
+        pyramid.length = len(signal)
+        edges = np.cumsum(lengths)[:-1]
+        pyramid.levels = [(int(block), lo, hi) for block, lo, hi
+                          in zip(blocks, np.split(mins, edges), np.split(maxs, edges))]
+        return pyramid
+    
+    @profiled()
+    def query(self, start, stop, max_points=5000):
+        """
+        Returns plot points for the sample range [start, stop).
+
+        Args:
+            start (int): First sample.
+            stop (int): Sample after the last one.
+            max_points (int): Maximum number of points to return.
+
+        Returns:
+            np.array: Sample positions of the points (block centres when summarised).
+            np.array: Values at those positions.
+            int: Samples represented per returned min/max pair (1 for raw samples).
+        """
+        start, stop = max(0, start), min(self.length, stop)
+        n = max(0, stop - start)
+        if n <= max_points or not self.levels:
+            return np.arange(start, start + n), np.asarray(self.signal[start:start + n]), 1
+
+        target = n / max(1, max_points // 2)
+        block, mins, maxs = self.levels[-1]
+        for level in self.levels:
+            if level[0] >= target:
+                block, mins, maxs = level
+                break
+
+        b0, b1 = start // block, -(-stop // block)
+        centres = (np.arange(b0, b1) * block + block / 2).clip(start, stop - 1)
+        x = np.repeat(centres, 2)
+        y = np.stack((mins[b0:b1], maxs[b0:b1]), axis=1).ravel()
+        return x, y, block
@@ -4,10 +4,11 @@ import sys
 
 
 
-from app.utils import load_css, render_header, save_to_history, get_recent_files
+from app.utils import load_css, render_header, save_upload, load_audio_source, start_profiling, render_performance_panel, render_preanalysis_status, TRACE_FILE
+from app.recent_files import get_recent_store
+from app.preanalysis import start_preanalysis
+from dsp import profiler
 from app.tabs import sampling_tab, fft_tab, denoise_tab
-import soundfile as sf
-import numpy as np
 
 st.set_page_config(
     page_title="DSP Processor App",
@@ -17,6 +18,7 @@ st.set_page_config(
 )
 
 load_css()
+start_profiling()
 
 with st.sidebar:
     st.title("🎛️ DSP Tools")
@@ -27,63 +29,81 @@ with st.sidebar:
         index=0
     )
     
+    source = st.session_state.get('audio_source')
+    if source is not None and source.channels > 1:
+        st.selectbox(
+            "Channel",
+            [None] + list(range(source.channels)),
+            format_func=lambda c: "Mix (mono)" if c is None else f"Channel {c + 1}",
+            key='channel'
+        )
+    
     st.markdown("---")
     st.markdown("### 📂 Recent Files")
     
-    recent_files = get_recent_files()
+    recent_store = get_recent_store()
+    recent_files = recent_store.entries()
     if not recent_files:
         st.caption("No recent files")
     else:
-        for file_path in recent_files:
-            filename = os.path.basename(file_path)
-            if st.button(f"📄 {filename}", key=file_path, use_container_width=True):
-                if os.path.exists(file_path):
-                    data, fs = sf.read(file_path)
-                    if len(data.shape) > 1:
-                        data = data.mean(axis=1)
-                    st.session_state['audio_data'] = data
-                    st.session_state['fs'] = fs
-                    st.session_state['current_file'] = filename
-                    st.success(f"Loaded: {filename}")
+        for entry in recent_files:
+            if st.button(f"📄 {entry['name']}", key=entry['hash'], use_container_width=True,
+                         help=f"{entry['duration']:.1f} s · {entry['samplerate']} Hz · {entry['channels']} ch"):
+                if os.path.exists(entry['path']):
+                    start_preanalysis(load_audio_source(entry['path'], entry['name'], entry['hash']))
+                    recent_store.touch(entry['hash'])
+                    st.success(f"Loaded: {entry['name']}")
                 else:
                     st.error("File not found.")
     
+    st.markdown("---")
+    st.checkbox("⏱️ Performance Panel", key='profiling')
+    perf_panel = st.container()
+    if st.session_state.get('profiling'):
+        st.checkbox("Track allocations (slower)", key='profile_memory',
+                    help="Peaks are process-wide and include other sessions running at the same time.")
+        st.checkbox("Write trace log", key='profile_trace',
+                    help=f"Appends one JSON line per rerun to {os.path.relpath(TRACE_FILE)}")
+    
     st.markdown("---")
     st.markdown("Created for DSP Course")
 
-if page == "Home":
-    render_header("DSP Processor App", "")
+with profiler.section(f"page.{page}"):
+    if page == "Home":
+        render_header("DSP Processor App", "")
     
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        st.markdown("### 📤 Upload Audio File")
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.markdown("### 📤 Upload Audio File")
         
-        uploaded_file = st.file_uploader("Upload Audio", type=['wav'], label_visibility="collapsed")
+            uploaded_file = st.file_uploader("Upload Audio", type=['wav'], label_visibility="collapsed")
         
-        if uploaded_file:
-            save_to_history(uploaded_file)
+            if uploaded_file:
+                if st.session_state.get('uploaded_file_id') != uploaded_file.file_id:
+                    entry = save_upload(uploaded_file)
+                    start_preanalysis(load_audio_source(entry['path'], uploaded_file.name, entry['hash']))
+                    st.session_state['uploaded_file_id'] = uploaded_file.file_id
             
-            st.session_state['uploaded_file'] = uploaded_file
-            st.success(f"Loaded: {uploaded_file.name}")
+                st.session_state['uploaded_file'] = uploaded_file
+                st.success(f"Loaded: {uploaded_file.name}")
             
-            data, fs = sf.read(uploaded_file)
-            if len(data.shape) > 1:
-                data = data.mean(axis=1)
-                
-            st.session_state['audio_data'] = data
-            st.session_state['fs'] = fs
-            st.session_state['current_file'] = uploaded_file.name
+                st.audio(uploaded_file)
             
-            st.audio(uploaded_file)
-            
-    if 'current_file' in st.session_state:
-        st.info(f"Currently analyzing: **{st.session_state['current_file']}**")
+        if 'current_file' in st.session_state:
+            source = st.session_state['audio_source']
+            st.info(f"Currently analyzing: **{st.session_state['current_file']}** "
+                    f"({source.duration:.1f} s, {source.samplerate} Hz, {source.channels} ch)")
+            render_preanalysis_status()
+
+    elif page == "Sampling & Quantization":
+        sampling_tab.render()
 
-elif page == "Sampling & Quantization":
-    sampling_tab.render()
+    elif page == "FFT Analysis":
+        fft_tab.render()
 
-elif page == "FFT Analysis":
-    fft_tab.render()
+    elif page == "Denoising":
+        denoise_tab.render()
 
-elif page == "Denoising":
-    denoise_tab.render()
+if profiler.is_enabled():
+    with perf_panel:
+        render_performance_panel(profiler.finish_run(page=page, file=st.session_state.get('current_file')))
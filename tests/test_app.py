@@ -0,0 +1,186 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import soundfile as sf
+import io
+
+from app.analysis_cache import AnalysisCache
+from app import recent_files, preanalysis
+from app.recent_files import RecentFiles
+from dsp.audio_source import AudioSource
+from dsp.fft_processor import compute_fft
+
+class TestAnalysisCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def test_get_or_compute_reuses_result(self):
+        cache = AnalysisCache(self.tmpdir.name)
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            return np.arange(4.0), None
+        
+        first = cache.get_or_compute('abc', 'fft', {'window_type': 'Hann'}, compute)
+        second = AnalysisCache(self.tmpdir.name).get_or_compute('abc', 'fft', {'window_type': 'Hann'}, compute)
+        
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_array_equal(second[0], first[0])
+        self.assertIsNone(second[1])
+        
+        cache.get_or_compute('abc', 'fft', {'window_type': 'Hamming'}, compute)
+        self.assertEqual(len(calls), 2)
+        
+    def test_lru_eviction_by_size(self):
+        cache = AnalysisCache(self.tmpdir.name, max_bytes=20000)
+        block = (np.zeros(1000),)  # ~8 kB per entry
+        
+        cache.put('a', 'x', {}, block)
+        cache.put('b', 'x', {}, block)
+        os.utime(cache._path(cache.key('a', 'x', {})), (0, 0))
+        cache.get('b', 'x', {})
+        cache.put('c', 'x', {}, block)
+        
+        self.assertIsNone(cache.get('a', 'x', {}))
+        self.assertIsNotNone(cache.get('b', 'x', {}))
+        self.assertIsNotNone(cache.get('c', 'x', {}))
+        self.assertLessEqual(cache.size(), 20000)
+
+    def test_cached_file_written_once_per_params(self):
+        cache = AnalysisCache(self.tmpdir.name)
+        writes = []
+        
+        def write(path):
+            writes.append(path)
+            with open(path, 'wb') as f:
+                f.write(b'audio')
+        
+        first = cache.get_or_write_file('abc', 'download', {'cutoff': 1000}, 'flac', write)
+        second = cache.get_or_write_file('abc', 'download', {'cutoff': 1000}, 'flac', write)
+        third = cache.get_or_write_file('abc', 'download', {'cutoff': 2000}, 'flac', write)
+        
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(first.endswith('.flac'))
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), b'audio')
+
+class TestRecentFiles(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def wav_bytes(self, seconds, fs=8000, channels=1, seed=0):
+        buffer = io.BytesIO()
+        data = np.random.default_rng(seed).standard_normal((int(seconds * fs), channels)) * 0.1
+        sf.write(buffer, data, fs, format='WAV', subtype='PCM_16')
+        return buffer.getvalue()
+        
+    def test_content_addressed_entries_with_metadata(self):
+        store = RecentFiles(self.tmpdir.name)
+        a = store.add('take.wav', self.wav_bytes(1, channels=2))
+        b = store.add('take.wav', self.wav_bytes(1, seed=1))
+        
+        self.assertNotEqual(a['path'], b['path'])
+        self.assertEqual([e['hash'] for e in store.entries()], [b['hash'], a['hash']])
+        self.assertEqual((a['samplerate'], a['channels'], a['duration']), (8000, 2, 1.0))
+        self.assertEqual(a['hash'], AudioSource(a['path']).content_hash())
+        
+        # Same bytes again: nothing rewritten, entry moves to the front.
+        mtime = os.path.getmtime(a['path'])
+        again = store.add('renamed.wav', self.wav_bytes(1, channels=2))
+        self.assertEqual(again['path'], a['path'])
+        self.assertEqual(os.path.getmtime(a['path']), mtime)
+        self.assertEqual(store.entries()[0]['name'], 'renamed.wav')
+        self.assertEqual(len(store.entries()), 2)
+        
+    def test_eviction_by_count_and_size(self):
+        store = RecentFiles(self.tmpdir.name, max_files=3, max_bytes=10**9)
+        paths = [store.add(f'{i}.wav', self.wav_bytes(0.1, seed=i))['path'] for i in range(5)]
+        self.assertEqual(len(store.entries()), 3)
+        self.assertFalse(os.path.exists(paths[0]))
+        
+        store.max_bytes = 2 * os.path.getsize(paths[-1]) + 100
+        store.add('big.wav', self.wav_bytes(0.1, seed=10))
+        self.assertEqual(len(store.entries()), 2)
+        wavs = [n for n in os.listdir(self.tmpdir.name) if n.endswith('.wav')]
+        self.assertEqual(len(wavs), 2)
+        self.assertLessEqual(store.size(), store.max_bytes)
+
+class TestPreanalysis(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.previous_store = recent_files._default_store
+        recent_files._default_store = RecentFiles(self.tmpdir.name)
+        
+    def tearDown(self):
+        recent_files._default_store = self.previous_store
+        self.tmpdir.cleanup()
+        
+    def test_job_fills_sidecar_once(self):
+        fs = 8000
+        t = np.arange(fs) / fs
+        buffer = io.BytesIO()
+        sf.write(buffer, np.column_stack((np.sin(2 * np.pi * 500 * t), np.sin(2 * np.pi * 1500 * t))) * 0.5,
+                 fs, format='WAV', subtype='FLOAT')
+        entry = recent_files._default_store.add('tones.wav', buffer.getvalue())
+        source = AudioSource(entry['path'], entry['hash'])
+        
+        job = preanalysis.start_preanalysis(source)
+        job.join(60)
+        
+        status = preanalysis.read_status(entry['hash'])
+        self.assertEqual(status['state'], 'done')
+        self.assertAlmostEqual(status['summary']['0']['f_max'], 500, delta=2)
+        self.assertAlmostEqual(status['summary']['1']['f_max'], 1500, delta=2)
+        
+        # The sidecar holds exactly what the tabs ask for.
+        sidecar = preanalysis.sidecar_cache(entry['hash'])
+        for request in (preanalysis.spectrum_request(source), preanalysis.spectrogram_request(source, 1),
+                        preanalysis.waveform_request(source, None)):
+            self.assertIsNotNone(sidecar.get(entry['hash'], request[0], request[1]))
+        self.assertIsNone(preanalysis.get_job(entry['hash']))
+        self.assertIsNone(preanalysis.start_preanalysis(source))
+        
+        # Evicting the file removes its sidecar.
+        recent_files._default_store.max_files = 1
+        recent_files._default_store.add('other.wav', buffer.getvalue()[:-400])
+        self.assertFalse(os.path.exists(preanalysis.sidecar_dir(entry['hash'])))
+
+    def test_long_files_stream_through_spectral_stats(self):
+        fs = 8000
+        x = np.random.default_rng(0).standard_normal((3 * fs, 2)) * 0.1
+        path = os.path.join(self.tmpdir.name, 'long.wav')
+        sf.write(path, x, fs, subtype='FLOAT')
+        source = AudioSource(path)
+        
+        previous = preanalysis.LONG_SIGNAL_SECONDS
+        preanalysis.LONG_SIGNAL_SECONDS = 1
+        try:
+            name, params, compute = preanalysis.spectrum_request(source)
+        finally:
+            preanalysis.LONG_SIGNAL_SECONDS = previous
+        freqs, magnitude = compute()
+        self.assertEqual((params['method'], params['nperseg']), ('welch', 4096))
+        mix_and_channels = np.column_stack((x.mean(axis=1), x))
+        expected = compute_fft(mix_and_channels, fs, window_type='Hann', method='welch', nperseg=4096)
+        np.testing.assert_allclose(freqs, expected[0])
+        np.testing.assert_allclose(magnitude, expected[1], rtol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,29 @@ import unittest
 import numpy as np
 import sys
 import os
+import tempfile
+import json
+import threading
+import tracemalloc
+import soundfile as sf
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from dsp.sampler import sample_signal, quantize_signal
-from dsp.fft_processor import compute_fft
-from dsp.filter_processor import apply_lowpass
+from dsp.sampler import sample_signal, quantize_signal, resample_polyphase, resample_ratio, StreamingResampler
+from dsp.quantizer import Quantizer
+from dsp.pipeline import Pipeline
+from dsp.batch import run_batch, load_manifest, find_inputs
+from dsp.fft_processor import compute_fft, compute_fft_batch
+from dsp.audio_source import AudioSource
+from dsp.analysis import SpectralAnalysis
+from dsp.spectral_stats import StreamingSpectralStats
+from dsp.peak_tracking import pick_peaks, track_peaks
+from dsp.waveform import WaveformPyramid, minmax_envelope
+from dsp.spectrogram import SpectrogramPyramid, compute_spectrogram_db
+from dsp.stft import stft, iter_blocks
+from dsp import fft_engine, profiler, sampler
+from dsp.fir import StreamingFIR, apply_fir_lowpass, design_fir_lowpass, fir_method, fir_cache_info, clear_fir_cache
+from dsp.filter_processor import apply_lowpass, apply_spectral_subtraction, apply_wiener_filter, SpectralDenoiser, StreamingFilter, design_filter, filter_cache_info, clear_filter_cache
 
 class TestDSP(unittest.TestCase):
     
@@ -24,6 +41,41 @@ class TestDSP(unittest.TestCase):
         expected_samples = int(len(self.signal) * new_fs / self.fs)
         self.assertEqual(len(resampled), expected_samples)
         
+    def test_polyphase_matches_fft_length_and_time_axis(self):
+        signal = np.random.default_rng(0).standard_normal(10007)
+        poly, t_poly = sample_signal(signal, 44100, 16000)
+        fft, t_fft = sample_signal(signal, 44100, 16000, method='fft')
+        
+        self.assertEqual(len(poly), len(fft))
+        np.testing.assert_array_equal(t_poly, t_fft)
+        
+    def test_polyphase_blocks_match_single_shot(self):
+        from scipy.signal import resample_poly
+        signal = np.random.default_rng(1).standard_normal(5003)
+        up, down = resample_ratio(44100, 16000)
+        self.assertEqual((up, down), (160, 441))
+        
+        blocked = resample_polyphase(signal, up, down, block_size=500)
+        np.testing.assert_allclose(blocked, resample_poly(signal, up, down), atol=1e-10)
+        
+    def test_multichannel_matches_per_channel(self):
+        stereo = np.column_stack((self.signal, 0.3 * np.cos(2 * np.pi * 40 * self.t)))
+        per_channel = lambda func: np.column_stack([func(stereo[:, c]) for c in range(2)])
+        
+        np.testing.assert_allclose(sample_signal(stereo, self.fs, 440)[0],
+                                   per_channel(lambda x: sample_signal(x, self.fs, 440)[0]))
+        np.testing.assert_allclose(quantize_signal(stereo, 4)[0],
+                                   per_channel(lambda x: quantize_signal(x, 4)[0]))
+        np.testing.assert_allclose(compute_fft(stereo, self.fs, window_type='Hann')[1],
+                                   per_channel(lambda x: compute_fft(x, self.fs, window_type='Hann')[1]))
+        np.testing.assert_allclose(compute_fft(stereo, self.fs, method='welch', nperseg=200)[1],
+                                   per_channel(lambda x: compute_fft(x, self.fs, method='welch', nperseg=200)[1]))
+        np.testing.assert_allclose(apply_lowpass(stereo, self.fs, 100),
+                                   per_channel(lambda x: apply_lowpass(x, self.fs, 100)))
+        np.testing.assert_allclose(apply_wiener_filter(stereo, self.fs, 0.2, frame_size=128, hop=32),
+                                   per_channel(lambda x: apply_wiener_filter(x, self.fs, 0.2, frame_size=128, hop=32)),
+                                   atol=1e-12)
+        
     def test_quantization(self):
         n_bits = 4
         quantized, error = quantize_signal(self.signal, n_bits)
@@ -34,6 +86,43 @@ class TestDSP(unittest.TestCase):
         unique_levels = len(np.unique(quantized))
         self.assertLessEqual(unique_levels, 2**n_bits)
         
+    def test_quantizer_integer_codes(self):
+        x = np.column_stack((self.signal, 0.3 * np.cos(2 * np.pi * 40 * self.t)))
+        full_scale = np.max(np.abs(x), axis=0)
+        quantizer = Quantizer(16, full_scale)
+        codes = quantizer.quantize(x)
+        self.assertEqual(codes.dtype, np.int16)
+        expected, error = quantize_signal(x, 16)
+        np.testing.assert_allclose(quantizer.dequantize(codes), expected, atol=1e-15)
+        np.testing.assert_allclose(quantizer.error(x, codes), error, atol=1e-15)
+        self.assertAlmostEqual(quantizer.snr(), 10 * np.log10(np.sum(x ** 2) / np.sum(error ** 2)))
+        
+        # Chunked calls into one out= buffer give the same codes, dither and shaping included.
+        for options in ({'dither': 'tpdf'}, {'dither': 'tpdf', 'noise_shaping': 'second-order'}):
+            whole = Quantizer(8, full_scale, seed=1, shaping_segment=64, **options).quantize(x)
+            chunked = Quantizer(8, full_scale, seed=1, block_size=97, shaping_segment=64, **options)
+            out = np.empty(x.shape, dtype=np.int8)
+            for start in range(0, len(x), 130):
+                chunked.quantize(x[start:start + 130], out=out[start:start + 130])
+            np.testing.assert_array_equal(out, whole)
+        # A buffer too narrow for the codes is refused instead of wrapping them.
+        with self.assertRaises(ValueError):
+            quantizer.quantize(x, out=np.empty(x.shape, dtype=np.int8))
+        
+    def test_noise_shaping_moves_noise_up(self):
+        fs = 48000
+        t = np.arange(fs) / fs
+        x = 0.5 * np.sin(2 * np.pi * 1000 * t)
+        freqs = np.fft.rfftfreq(len(x), 1 / fs)
+        low = (freqs > 50) & (freqs < 500)
+        
+        def low_noise(**options):
+            quantizer = Quantizer(8, dither='tpdf', seed=0, **options)
+            error = quantizer.error(x, quantizer.quantize(x))
+            return 10 * np.log10(np.mean(np.abs(np.fft.rfft(error)[low]) ** 2))
+        
+        self.assertLess(low_noise(noise_shaping='first-order'), low_noise() - 15)
+        
     def test_fft(self):
         freqs, mag, phase = compute_fft(self.signal, self.fs)
         
@@ -42,6 +131,183 @@ class TestDSP(unittest.TestCase):
         
         self.assertAlmostEqual(peak_freq, self.f_sig, delta=1)
         
+    def test_fft_batch_matches_single_frames(self):
+        frames = np.random.default_rng(10).standard_normal((300, 251))
+        
+        freqs, mag, phase = compute_fft_batch(frames, self.fs, window_type='Hann', scale='Log')
+        _, mag_iter, _ = compute_fft_batch(iter(frames), self.fs, window_type='Hann', scale='Log', batch_size=64)
+        self.assertEqual(mag.shape, (300, len(freqs)))
+        np.testing.assert_allclose(mag_iter, mag)
+        
+        for i in (0, 150, 299):
+            f_single, m_single, p_single = compute_fft(frames[i], self.fs, window_type='Hann', scale='Log')
+            np.testing.assert_allclose(f_single, freqs)
+            np.testing.assert_allclose(m_single, mag[i])
+            np.testing.assert_allclose(p_single, phase[i])
+            
+    def test_fft_engine_pads_prime_lengths(self):
+        info = fft_engine.describe_size(10007)
+        self.assertFalse(info['is_fast'])
+        self.assertEqual(info['largest_prime_factor'], 10007)
+        
+        signal = np.sin(2 * np.pi * 50 * np.arange(10007) / self.fs)
+        freqs, mag, _ = compute_fft(signal, self.fs, window_type='Hann', fast_len=True)
+        plan = fft_engine.recent_plans()[-1]
+        self.assertEqual((plan.n_input, plan.n_fft), (10007, info['fast_n']))
+        self.assertTrue(plan.is_fast)
+        self.assertEqual(len(freqs), info['fast_n'] // 2 + 1)
+        self.assertAlmostEqual(freqs[np.argmax(mag)], 50, delta=0.2)
+        
+        # Padding is opt-in: by default the grid is that of the signal length.
+        freqs, _, _ = compute_fft(signal, self.fs, window_type='Hann')
+        self.assertEqual(len(freqs), 10007 // 2 + 1)
+        
+    def test_fft_engine_single_precision(self):
+        fft_engine.configure(single_precision=True)
+        try:
+            spec = fft_engine.rfft(self.signal)
+        finally:
+            fft_engine.configure(single_precision=False)
+        self.assertEqual(spec.dtype, np.complex64)
+        np.testing.assert_allclose(spec, fft_engine.rfft(self.signal), atol=1e-3)
+        
+    def test_welch_spectrum_streams_chunks(self):
+        signal = np.random.default_rng(9).standard_normal(20000) * 0.01 + self.signal.repeat(20)
+        fs = self.fs * 20
+        freqs, mag, phase = compute_fft(signal, fs, window_type='Hann', method='welch', nperseg=2000)
+        
+        self.assertIsNone(phase)
+        self.assertEqual(len(freqs), len(mag))
+        self.assertAlmostEqual(freqs[np.argmax(mag)], self.f_sig, delta=fs / 2000)
+        
+        chunks = (signal[i:i + 999] for i in range(0, len(signal), 999))
+        _, mag_chunked, _ = compute_fft(chunks, fs, window_type='Hann', method='welch', nperseg=2000)
+        np.testing.assert_allclose(mag_chunked, mag)
+        
+        # A pure sine has the same peak height in both modes.
+        _, mag_full, _ = compute_fft(self.signal, self.fs, window_type='Hann')
+        _, mag_welch, _ = compute_fft(self.signal, self.fs, window_type='Hann', method='welch', nperseg=500)
+        self.assertAlmostEqual(mag_welch.max(), mag_full.max(), delta=0.02)
+        
+    def test_spectral_analysis_derived_values(self):
+        signal = self.signal + 0.5 * np.sin(2 * np.pi * 100 * self.t)
+        analysis = SpectralAnalysis.from_signal(signal, self.fs)
+        
+        freqs, peak_mags = analysis.peaks(1)
+        np.testing.assert_allclose(freqs, [10])
+        self.assertAlmostEqual(analysis.f_max(), 101, delta=1)
+        self.assertEqual(analysis.nyquist_rate(), 2 * analysis.f_max())
+        self.assertLessEqual(analysis.energy_cutoff(0.95), 101)
+        self.assertGreater(analysis.snr(), 0)
+        self.assertIs(analysis.log_magnitude, analysis.log_magnitude)
+        
+    def test_streaming_spectral_stats_match_full_fft(self):
+        fs = 8000
+        t = np.arange(60 * fs) / fs
+        noise = 0.01 * np.random.default_rng(7).standard_normal(len(t))
+        signal = np.sin(2 * np.pi * 440 * t) + 0.3 * np.sin(2 * np.pi * 1250.5 * t) + noise
+        full = SpectralAnalysis.from_signal(signal, fs)
+        
+        stats = StreamingSpectralStats(fs, resolution_hz=2.0)
+        for start in range(0, len(signal), 10007):
+            stats.update(signal[start:start + 10007])
+        self.assertLessEqual(stats.resolution_hz, 2.0)
+        self.assertEqual(stats.n_samples, len(signal))
+        tolerance = 2 * stats.resolution_hz
+        self.assertAlmostEqual(stats.energy_cutoff(0.95), full.energy_cutoff(0.95), delta=tolerance)
+        self.assertAlmostEqual(stats.f_max(), full.f_max(), delta=tolerance)
+        self.assertAlmostEqual(stats.snr(), full.snr(), delta=1.5)
+        # The averaged spectrum is built once and rebuilt only after more data arrives.
+        self.assertIs(stats.analysis(), stats.analysis())
+        before = stats.analysis()
+        stats.update(signal[:1000])
+        self.assertIsNot(stats.analysis(), before)
+        # The blockwise cutoff search matches the cumulative-sum one.
+        self.assertEqual(SpectralAnalysis(full.freqs, full.magnitude).energy_cutoff(0.5),
+                         full.freqs[np.searchsorted(full.cumulative_energy, 0.5 * full.cumulative_energy[-1])])
+        
+    def test_peak_tracking(self):
+        fs = 8000
+        t = np.arange(20 * fs) / fs
+        # A steady tone off the bin grid, a tone that starts halfway and a slow glide.
+        signal = 0.5 * np.sin(2 * np.pi * 1003.7 * t)
+        signal += np.where(t >= 10, 0.25 * np.sin(2 * np.pi * 2500 * t), 0)
+        signal += 0.1 * np.sin(2 * np.pi * (300 * t + 5 * t ** 2))
+        tracks = track_peaks(signal, fs, frame_size=1024, n_peaks=3, floor_db=-40)
+        
+        rows = {round(r['mean_hz'], -2): r for r in tracks.summary() if r['duration_s'] > 5}
+        self.assertEqual(sorted(rows), [400.0, 1000.0, 2500.0])
+        steady = rows[1000.0]
+        self.assertAlmostEqual(steady['min_hz'], 1003.7, delta=0.5)
+        self.assertAlmostEqual(steady['max_hz'], 1003.7, delta=0.5)
+        self.assertAlmostEqual(steady['peak_db'], 20 * np.log10(0.5), delta=0.5)
+        self.assertAlmostEqual(rows[2500.0]['start_s'], 10, delta=0.2)
+        glide = rows[400.0]
+        self.assertAlmostEqual(glide['min_hz'], 300, delta=10)
+        self.assertAlmostEqual(glide['max_hz'], 500, delta=10)
+        
+        # One peak spread over neighbouring bins is reported once.
+        position, level = pick_peaks(np.array([[0, 1, 8, 9, 2, 0, 3, 0]]), 3)
+        np.testing.assert_array_equal(np.isnan(position), [[False, False, True]])
+        self.assertGreater(position[0, 0], 2.5)
+        self.assertAlmostEqual(position[0, 1], 6)
+        
+    def test_minmax_envelope_ignores_nan(self):
+        signal = np.sin(np.linspace(0, 20 * np.pi, 100000))
+        signal[500] = np.nan
+        signal[1000:1040] = np.nan
+        signal[70000] = 3.0
+        idx, values = minmax_envelope(signal, max_points=5000)
+        self.assertEqual(len(idx), 5000)
+        self.assertTrue(np.all(idx < len(signal)))
+        self.assertEqual(np.nanmax(values), 3.0)
+        self.assertEqual(np.count_nonzero(np.isnan(values)), 2)  # the all-NaN bucket
+
+    def test_waveform_pyramid_keeps_spikes(self):
+        signal = np.random.default_rng(6).uniform(-0.1, 0.1, 1_000_003)
+        signal[123457] = 1.0
+        signal[876543] = -1.0
+        pyramid = WaveformPyramid(signal)
+        
+        x, y, block = pyramid.query(0, len(signal), max_points=1000)
+        self.assertLessEqual(len(y), 1002)
+        self.assertGreater(block, 1)
+        self.assertEqual(y.max(), 1.0)
+        self.assertEqual(y.min(), -1.0)
+        
+        x, y, block = pyramid.query(500, 900, max_points=1000)
+        self.assertEqual(block, 1)
+        np.testing.assert_array_equal(y, signal[500:900])
+        
+        restored = WaveformPyramid.from_arrays(signal, *pyramid.to_arrays())
+        for query in ((0, len(signal), 1000), (1000, 50000, 700)):
+            for a, b in zip(restored.query(*query), pyramid.query(*query)):
+                np.testing.assert_array_equal(a, b)
+        
+        idx, y = minmax_envelope(signal, 1000)
+        self.assertTrue(np.all(np.diff(idx) >= 0))
+        self.assertEqual((y.max(), y.min()), (1.0, -1.0))
+        
+    def test_chunked_spectrogram_matches_scipy(self):
+        from scipy.signal import spectrogram
+        signal = np.random.default_rng(7).standard_normal(50000)
+        f, t, z = compute_spectrogram_db(signal, self.fs, nperseg=256, chunk_frames=50)
+        f_ref, t_ref, Sxx = spectrogram(signal, self.fs, nperseg=256)
+        
+        np.testing.assert_allclose(t, t_ref)
+        np.testing.assert_allclose(z, 10 * np.log10(Sxx + 1e-10), atol=1e-4)
+        
+    def test_spectrogram_pyramid_bounded_view(self):
+        f, t, z = compute_spectrogram_db(np.random.default_rng(8).standard_normal(200000), self.fs)
+        z[10, 321] = 100.0
+        pyramid = SpectrogramPyramid(f, t, z)
+        
+        f_view, t_view, z_view = pyramid.query(max_time_bins=100, max_freq_bins=50)
+        self.assertLessEqual(z_view.shape[1], 101)
+        self.assertLessEqual(z_view.shape[0], 50)
+        self.assertEqual(z_view.shape, (len(f_view), len(t_view)))
+        self.assertEqual(z_view.max(), 100.0)
+        
     def test_lowpass(self):
         high_freq_sig = np.sin(2 * np.pi * 400 * self.t)
         mixed_sig = self.signal + high_freq_sig
@@ -57,6 +323,372 @@ class TestDSP(unittest.TestCase):
         mag_400 = mag[idx_400]
         
         self.assertGreater(mag_10, mag_400 * 10) # At least 10x attenuation
+        
+    def test_streaming_filter_matches_single_shot(self):
+        signal = np.random.default_rng(2).standard_normal(10000)
+        expected = apply_lowpass(signal, self.fs, cutoff=100, order=8)
+        
+        stream = StreamingFilter.lowpass(self.fs, cutoff=100, order=8)
+        chunks = (signal[i:i + 777] for i in range(0, len(signal), 777))
+        result = np.concatenate(list(stream.filter_chunks(chunks)))
+        
+        np.testing.assert_array_equal(result, expected)
+        
+    def test_filter_design_cache(self):
+        clear_filter_cache()
+        for _ in range(5):
+            apply_lowpass(self.signal, self.fs, cutoff=100)
+        apply_lowpass(self.signal, self.fs, cutoff=200)
+        
+        info = filter_cache_info()
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(info.hits, 4)
+        
+        b, a = design_filter('low', 4, 100, self.fs, output='ba')
+        self.assertFalse(b.flags.writeable)
+
+    def test_streaming_fir_matches_convolution(self):
+        rng = np.random.default_rng(7)
+        x = rng.standard_normal((10007, 2))
+        for n_taps in (1, 31, 1001):
+            taps = rng.standard_normal(n_taps)
+            expected = np.stack([np.convolve(x[:, c], taps)[:len(x)] for c in range(2)], axis=1)
+            for method in ('direct', 'fft', 'auto'):
+                fir = StreamingFIR(taps, method)
+                y = np.concatenate(list(fir.filter_chunks(np.array_split(x, [7, 1500, 1501, 9000]))))
+                np.testing.assert_allclose(y, expected, atol=1e-10, err_msg=f"{n_taps} {method}")
+
+            # Delay compensation drops the first outputs and flushes the tail.
+            fir = StreamingFIR(taps, compensate_delay=True)
+            y = np.concatenate(list(fir.filter_chunks(np.array_split(x[:, 0], 5))))
+            delay = (n_taps - 1) // 2
+            np.testing.assert_allclose(y, np.convolve(x[:, 0], taps)[delay:delay + len(x)], atol=1e-10)
+
+    def test_fir_method_selection_and_spectrum_cache(self):
+        self.assertEqual(fir_method(8, 2**20), 'direct')
+        self.assertEqual(fir_method(4096, 2**20), 'fft')
+        self.assertEqual(fir_method(4096, 64), 'direct')
+        clear_fir_cache()
+        fir = StreamingFIR(np.hanning(2049), 'fft')
+        for block in iter_blocks(np.ones(2**16), 8192):
+            fir.process(block)
+        info = fir_cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 7))
+
+    def test_fir_lowpass(self):
+        fs = 16000
+        t = np.arange(fs) / fs
+        low, high = np.sin(2 * np.pi * 500 * t), np.sin(2 * np.pi * 4000 * t)
+        taps = design_fir_lowpass(fs, 2000)
+        self.assertEqual(len(taps) % 2, 1)
+        self.assertFalse(taps.flags.writeable)
+        y = apply_fir_lowpass(low + high, fs, 2000)
+        self.assertEqual(y.shape, low.shape)
+        # Linear phase with the delay removed: the pass band comes out aligned.
+        inner = slice(len(taps), -len(taps))
+        np.testing.assert_allclose(y[inner], low[inner], atol=1e-3)
+
+        pipeline = Pipeline.build(fs, cutoff=2000, lowpass='fir')
+        streamed = np.concatenate(list(pipeline.run(np.array_split(low + high, 9))))
+        np.testing.assert_allclose(streamed, y, atol=1e-10)
+
+    def test_stft_denoisers_reduce_noise(self):
+        fs = 8000
+        rng = np.random.default_rng(3)
+        t = np.arange(3 * fs) / fs
+        clean = np.where(t >= 0.5, np.sin(2 * np.pi * 440 * t), 0.0)
+        noisy = clean + 0.1 * rng.standard_normal(len(t))
+        
+        for denoise in (apply_spectral_subtraction, apply_wiener_filter):
+            out = denoise(noisy, fs, frame_size=512, hop=128)
+            self.assertEqual(len(out), len(noisy))
+            self.assertLess(np.mean((out - clean) ** 2), np.mean((noisy - clean) ** 2))
+            
+    def test_streaming_denoiser_matches_offline(self):
+        fs = 8000
+        signal = np.random.default_rng(4).standard_normal(2 * fs)
+        expected = apply_wiener_filter(signal, fs, frame_size=512, hop=128)
+        
+        denoiser = SpectralDenoiser(fs, 'wiener', frame_size=512, hop=128)
+        chunks = (signal[i:i + 1000] for i in range(0, len(signal), 1000))
+        result = np.concatenate(list(denoiser.filter_chunks(chunks)))
+        
+        np.testing.assert_allclose(result, expected, atol=1e-12)
+
+    def test_streaming_resampler_matches_blocked(self):
+        rng = np.random.default_rng(3)
+        x = rng.standard_normal((20011, 2))
+        for up, down in [(1, 2), (160, 147), (3, 1)]:
+            resampler = StreamingResampler(up, down, block_size=1000)
+            chunks = np.array_split(x, [7, 1500, 1501, 9000, 15000])
+            y = np.concatenate(list(resampler.filter_chunks(chunks)))
+            np.testing.assert_allclose(y, resample_polyphase(x, up, down), atol=1e-12)
+
+    def test_resample_filter_cache_skips_huge_designs(self):
+        sampler._cached_resample_filter.cache_clear()
+        up, down = resample_ratio(44100, 44099)
+        h, _ = sampler._design_resample_filter(up, down, 'medium')
+        self.assertGreater(len(h), sampler.MAX_CACHED_TAPS)
+        self.assertEqual(sampler._cached_resample_filter.cache_info().currsize, 0)
+        sampler._design_resample_filter(160, 147, 'medium')
+        sampler._design_resample_filter(160, 147, 'medium')
+        self.assertEqual(sampler._cached_resample_filter.cache_info()[:2], (1, 1))
+
+    def test_pipeline_matches_whole_array_chain(self):
+        fs, new_fs = 16000, 11025
+        rng = np.random.default_rng(4)
+        t = np.arange(3 * fs) / fs
+        x = 0.5 * np.sin(2 * np.pi * 440 * t) + 0.1 * rng.standard_normal(len(t))
+        full_scale = np.max(np.abs(x))
+
+        pipeline = Pipeline.build(fs, new_fs=new_fs, n_bits=8, full_scale=full_scale, cutoff=3000)
+        chunks = np.array_split(x, 37)
+        streamed = np.concatenate(list(pipeline.run(chunks)))
+
+        up, down = resample_ratio(fs, new_fs)
+        expected = resample_polyphase(x, up, down)
+        expected = quantize_signal(np.append(expected, full_scale), 8)[0][:-1]
+        expected = apply_lowpass(expected, new_fs, 3000)
+        self.assertEqual(pipeline.out_fs, new_fs)
+        np.testing.assert_allclose(streamed, expected, atol=1e-12)
+        np.testing.assert_allclose(pipeline.apply(x, block_size=5000), expected, atol=1e-12)
+
+    def test_single_precision_end_to_end(self):
+        fs = 16000
+        rng = np.random.default_rng(6)
+        t = np.arange(2 * fs) / fs
+        x = np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(len(t))
+
+        def run():
+            return {
+                'fft': compute_fft(x, fs, window_type='Hann')[1],
+                'welch': compute_fft(x, fs, window_type='Hann', method='welch')[1],
+                'lowpass': apply_lowpass(x, fs, 2000),
+                'subtraction': apply_spectral_subtraction(x, fs),
+                'wiener': apply_wiener_filter(x, fs),
+                'resample': sample_signal(x, fs, 11025)[0],
+                'quantize': quantize_signal(x, 8)[0],
+                'stft': stft(x, 1024, 256),
+                'pipeline': Pipeline.build(fs, new_fs=8000, cutoff=3000, denoise='wiener').apply(x),
+            }
+
+        def stream():
+            chunks = np.array_split(x, 7)
+            return (np.concatenate(list(StreamingFilter.lowpass(fs, 2000).filter_chunks(chunks))),
+                    np.concatenate(list(StreamingResampler(2, 3).filter_chunks(chunks))))
+
+        expected, expected_streams = run(), stream()
+        fft_engine.configure(single_precision=True)
+        try:
+            single, streams = run(), stream()
+            quantize_error = quantize_signal(x, 8)[1]
+        finally:
+            fft_engine.configure(single_precision=False)
+        for name, value in single.items():
+            self.assertEqual(value.dtype, np.complex64 if name == 'stft' else np.float32, name)
+            scale = np.max(np.abs(expected[name]))
+            np.testing.assert_allclose(value, expected[name], atol=1e-5 * scale, err_msg=name)
+        self.assertEqual(quantize_error.dtype, np.float32)
+        for value, reference in zip(streams, expected_streams):
+            self.assertEqual(value.dtype, np.float32)
+            np.testing.assert_allclose(value, reference, atol=1e-5)
+
+    def test_pipeline_processes_files_in_blocks(self):
+        fs = 8000
+        x = np.random.default_rng(5).standard_normal((fs * 2, 2)) * 0.1
+        pipeline = Pipeline.build(fs, new_fs=4000, cutoff=1000, denoise='wiener')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src, dst = os.path.join(tmpdir, 'in.wav'), os.path.join(tmpdir, 'out.wav')
+            sf.write(src, x, fs, subtype='FLOAT')
+            written = pipeline.process_file(src, dst, blocksize=1000, subtype='FLOAT')
+            y, out_fs = sf.read(dst)
+        self.assertEqual((written, out_fs), (fs, 4000))
+        np.testing.assert_allclose(y, pipeline.apply(x), atol=1e-6)
+
+        # A file at another rate than the pipeline was built for is refused.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, 'in.wav')
+            sf.write(src, x, 2 * fs, subtype='FLOAT')
+            with self.assertRaises(ValueError):
+                pipeline.process_file(src, os.path.join(tmpdir, 'out.wav'))
+
+    def test_pipeline_without_fs_processes_files_at_their_rate(self):
+        fs = 8000
+        x = np.random.default_rng(6).standard_normal(fs) * 0.1
+        pipeline = Pipeline([StreamingFilter.lowpass(fs, 1000)])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src, dst = os.path.join(tmpdir, 'in.wav'), os.path.join(tmpdir, 'out.wav')
+            sf.write(src, x, fs, subtype='FLOAT')
+            written = pipeline.process_file(src, dst, blocksize=1000, subtype='FLOAT')
+            y, out_fs = sf.read(dst)
+        self.assertEqual((written, out_fs), (fs, fs))
+        np.testing.assert_allclose(y, pipeline.apply(x), atol=1e-6)
+
+    def test_batch_run_writes_manifest_and_resumes(self):
+        fs = 8000
+        recipe = {'new_fs': 4000, 'cutoff': 1500}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, 'in')
+            os.makedirs(os.path.join(src, 'sub'))
+            signals = {}
+            for name in ('a.wav', os.path.join('sub', 'b.wav')):
+                signals[name] = np.random.default_rng(len(name)).standard_normal((fs, 2)) * 0.1
+                sf.write(os.path.join(src, name), signals[name], fs, subtype='FLOAT')
+            out_dir = os.path.join(tmpdir, 'out')
+
+            entries = run_batch([src], out_dir, recipe, workers=1, blocksize=1000, subtype='FLOAT')
+            self.assertEqual(sorted(e['status'] for e in entries), ['ok', 'ok'])
+            y, out_fs = sf.read(os.path.join(out_dir, 'sub', 'b.wav'))
+            expected = Pipeline.build(fs, **recipe).apply(signals[os.path.join('sub', 'b.wav')])
+            self.assertEqual(out_fs, 4000)
+            np.testing.assert_allclose(y, expected, atol=1e-6)
+            self.assertEqual(len(load_manifest(os.path.join(out_dir, 'manifest.jsonl'))), 2)
+
+            self.assertEqual(run_batch([src], out_dir, recipe, workers=1, resume=True), [])
+            # Spelling out a later-added default keeps the recipe identity.
+            self.assertEqual(run_batch([src], out_dir, dict(recipe, lowpass='iir'), workers=1, resume=True), [])
+            # Float32 outputs differ, so they are not considered done either.
+            fft_engine.configure(single_precision=True)
+            try:
+                entries = run_batch([src], out_dir, recipe, workers=1, resume=True)
+            finally:
+                fft_engine.configure(single_precision=False)
+            self.assertEqual(len(entries), 2)
+            self.assertTrue(all(e['single_precision'] for e in entries))
+            self.assertEqual(len(run_batch([src], out_dir, recipe, workers=1, resume=True)), 2)
+            # A different recipe is not considered done.
+            self.assertEqual(len(run_batch([src], out_dir, dict(recipe, cutoff=1000), workers=1, resume=True)), 2)
+
+    def test_batch_globs_mirror_layout(self):
+        fs = 8000
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for folder in ('a', 'b'):
+                os.makedirs(os.path.join(tmpdir, 'data', folder))
+                sf.write(os.path.join(tmpdir, 'data', folder, 'take.wav'), np.zeros(fs), fs)
+            pattern = os.path.join(tmpdir, 'data', '**', '*.wav')
+            self.assertEqual([rel for _, rel in find_inputs([pattern])],
+                             [os.path.join('a', 'take.wav'), os.path.join('b', 'take.wav')])
+
+            out_dir = os.path.join(tmpdir, 'out')
+            entries = run_batch([pattern], out_dir, {'cutoff': 1000}, workers=1)
+            self.assertEqual([e['status'] for e in entries], ['ok', 'ok'])
+            for folder in ('a', 'b'):
+                self.assertTrue(os.path.exists(os.path.join(out_dir, folder, 'take.wav')))
+
+            # Two patterns that map different files onto one output are refused.
+            patterns = [os.path.join(tmpdir, 'data', folder, '*.wav') for folder in ('a', 'b')]
+            with self.assertRaises(ValueError):
+                run_batch(patterns, os.path.join(tmpdir, 'out2'), {'cutoff': 1000}, workers=1)
+
+class TestAudioSource(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = np.random.default_rng(5).uniform(-0.9, 0.9, (4000, 2))
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def _write(self, subtype):
+        path = os.path.join(self.tmpdir.name, f"{subtype}.wav")
+        sf.write(path, self.data, 8000, subtype=subtype)
+        return path
+        
+    def test_metadata_without_decoding(self):
+        source = AudioSource(self._write('PCM_16'))
+        self.assertEqual((len(source), source.samplerate, source.channels), (4000, 8000, 2))
+        self.assertAlmostEqual(source.duration, 0.5)
+        self.assertIsNone(source._samples)
+        
+    def test_windowed_read_matches_soundfile(self):
+        for subtype, memmapped in (('PCM_16', True), ('FLOAT', True), ('PCM_24', False)):
+            path = self._write(subtype)
+            source = AudioSource(path)
+            self.assertEqual(source.memmap() is not None, memmapped)
+            
+            expected, _ = sf.read(path)
+            np.testing.assert_array_equal(source.read(100, 900, mono=False), expected[100:900])
+            np.testing.assert_array_equal(source.read(), expected.mean(axis=1))
+            np.testing.assert_array_equal(np.concatenate(list(source.blocks(333))), expected.mean(axis=1))
+
+    def test_single_precision_read(self):
+        source = AudioSource(self._write('PCM_16'))
+        expected = source.samples()
+        fft_engine.configure(single_precision=True)
+        try:
+            samples = source.samples()
+            block = next(source.blocks(1000, mono=False))
+        finally:
+            fft_engine.configure(single_precision=False)
+        self.assertEqual((samples.dtype, block.dtype), (np.float32, np.float32))
+        np.testing.assert_allclose(samples, expected, atol=1e-7)
+        self.assertEqual(source.samples().dtype, np.float64)
+
+class TestProfiler(unittest.TestCase):
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_disabled_records_nothing(self):
+        quantize_signal(np.linspace(-1, 1, 100), 4)
+        self.assertFalse(profiler.is_enabled())
+        self.assertEqual(profiler.finish_run(), [])
+
+    def test_nested_sections_and_trace(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace = os.path.join(tmpdir, 'traces', 'profile.jsonl')
+            profiler.enable(memory=True, trace_path=trace)
+            with profiler.section('outer'):
+                sample_signal(np.random.randn(4000), 8000, 4000)
+                np.ones(10**6)
+            records = profiler.finish_run(page='test')
+
+            by_name = {r['name']: r for r in records}
+            self.assertEqual(by_name['outer']['depth'], 0)
+            self.assertEqual(by_name['sampler.sample_signal']['depth'], 1)
+            self.assertEqual(by_name['sampler.resample_polyphase']['depth'], 2)
+            # The outer section saw the 8 MB array allocated after the inner calls.
+            self.assertGreaterEqual(by_name['outer']['peak_bytes'], 8 * 10**6)
+            self.assertEqual(profiler.summarize(records)[0]['name'], 'outer')
+            self.assertEqual(profiler.finish_run(), [])
+
+            with open(trace) as f:
+                entry = json.loads(f.readline())
+            self.assertEqual(entry['page'], 'test')
+            self.assertEqual(len(entry['records']), len(records))
+
+    def test_memory_tracking_is_shared_between_threads(self):
+        profiler.enable(memory=True)
+        profiler.enable(memory=False)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        profiler.enable(memory=True)
+        other = threading.Thread(target=lambda: (profiler.enable(memory=True), profiler.disable()))
+        other.start()
+        other.join()
+        # Another session stopping does not stop this one's tracking.
+        self.assertTrue(tracemalloc.is_tracing())
+        profiler.disable()
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_memory_state_carried_across_threads(self):
+        # Each Streamlit rerun is a new thread; the caller carries was_memory over.
+        def rerun(func):
+            thread = threading.Thread(target=func)
+            thread.start()
+            thread.join()
+
+        for was_memory in (False, True, True):
+            rerun(lambda: profiler.enable(memory=True, was_memory=was_memory))
+            self.assertEqual(profiler._memory_users, 1)
+        self.assertTrue(tracemalloc.is_tracing())
+        rerun(lambda: profiler.enable(memory=False, was_memory=True))
+        self.assertFalse(tracemalloc.is_tracing())
+
+        rerun(lambda: profiler.enable(memory=True, was_memory=False))
+        rerun(lambda: profiler.disable(was_memory=True))
+        self.assertEqual(profiler._memory_users, 0)
+        self.assertFalse(tracemalloc.is_tracing())
 
 if __name__ == '__main__':
     unittest.main()